@@ -7,11 +7,30 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parser_cles_api(valeur: str, cle_principale: str) -> dict:
+    """
+    Lit API_KEYS ("frontend:cle1,batch:cle2", ou des clés seules) en {clé: nom du client}
+    La clé principale API_KEY est toujours acceptée (client "default").
+    """
+    cles = {cle_principale: "default"} if cle_principale else {}
+    for i, entree in enumerate(e.strip() for e in valeur.split(",")):
+        if not entree:
+            continue
+        nom, sep, cle = entree.partition(":")
+        if sep:
+            cles[cle.strip()] = nom.strip()
+        else:
+            cles[entree] = f"key{i + 1}"
+    return cles
+
+
 class Config:
     """Configuration de l'application"""
     
     # API Configuration
     API_KEY = os.getenv("API_KEY", "gaia_vision_api_key")
+    API_KEYS = _parser_cles_api(os.getenv("API_KEYS", ""), API_KEY)  # Clé -> client (file équitable)
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
     DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -33,6 +52,11 @@ class Config:
     CATBOOST_MODEL_FALLBACK = MODELS_BASE_DIR / "ml_model" / "model_catboost_best.joblib"
     VISION_MODEL_FALLBACK = MODELS_BASE_DIR / "dl_model" / "final_model.keras"
     
+    # Charger le format natif .cbm (mmap) s'il existe à côté du .joblib
+    CATBOOST_PREFER_CBM = os.getenv("CATBOOST_PREFER_CBM", "true").lower() == "true"
+    # Table de décision précalculée au déploiement (catboost_lookup.npz), repli sur le modèle hors grille
+    CATBOOST_LOOKUP_ENABLED = os.getenv("CATBOOST_LOOKUP_ENABLED", "true").lower() == "true"
+    
     # Model Configuration
     VISION_INPUT_SIZE = (640, 640)
     VISION_CLASS_NAMES = ["contamine", "sain"]
@@ -40,10 +64,82 @@ class Config:
     # Prediction Logic
     CATBOOST_CONFIDENCE_THRESHOLD = 0.8  # Seuil pour déclencher la vision
     VISION_CONFIDENCE_THRESHOLD = 0.5    # Seuil pour la classification vision
-    
+
+    # Décodage réduit des JPEG (draft DCT) et redimensionnement OpenCV pour l'entrée du modèle
+    IMAGE_FAST_DECODE = os.getenv("IMAGE_FAST_DECODE", "true").lower() == "true"
+
+    # Résolution de calcul des heatmaps (1.0 = pleine taille, 0.25 = 1/4 puis agrandie)
+    HEATMAP_RENDER_SCALE = float(os.getenv("HEATMAP_RENDER_SCALE", 1.0))
+
+    # Encodage par défaut des images de /heatmap et /heatmap-overlay (affichage web)
+    HEATMAP_FORMAT = os.getenv("HEATMAP_FORMAT", "jpeg").lower()  # png, jpeg ou webp
+    HEATMAP_QUALITY = int(os.getenv("HEATMAP_QUALITY", 85))
+    HEATMAP_MAX_SIDE = int(os.getenv("HEATMAP_MAX_SIDE", 1600))  # 0 = taille d'origine
+    HEATMAP_PNG_COMPRESS_LEVEL = int(os.getenv("HEATMAP_PNG_COMPRESS_LEVEL", 1))
+
+    # Résolution par défaut de la grille des iso-contours de /heatmap-data (plus grand côté)
+    HEATMAP_GRID_SIZE = int(os.getenv("HEATMAP_GRID_SIZE", 64))
+
+    # Backend du détecteur : "savedmodel" ou "tflite" (model_<variante>.tflite du dossier de version)
+    VISION_BACKEND = os.getenv("VISION_BACKEND", "savedmodel").lower()
+    VISION_TFLITE_VARIANT = os.getenv("VISION_TFLITE_VARIANT", "int8").lower()  # int8 ou fp16
+    VISION_TFLITE_THREADS = int(os.getenv("VISION_TFLITE_THREADS", 0))  # 0 = même partage que TF
+
+    # Démarrage : chargement parallèle des modèles et inférences de préchauffage
+    PARALLEL_MODEL_LOADING = os.getenv("PARALLEL_MODEL_LOADING", "true").lower() == "true"
+    MODEL_WARMUP_RUNS = int(os.getenv("MODEL_WARMUP_RUNS", 3))
+
+    # Inference Executor (0 = valeur calculée selon le nombre de cœurs)
+    INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 0))
+    TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", 0))
+    TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", 0))
+
+    # Micro-batching SSD (regroupement des requêtes concurrentes)
+    VISION_MICRO_BATCHING = os.getenv("VISION_MICRO_BATCHING", "true").lower() == "true"
+    VISION_BATCH_MAX_SIZE = int(os.getenv("VISION_BATCH_MAX_SIZE", 8))
+    VISION_BATCH_MAX_WAIT_MS = float(os.getenv("VISION_BATCH_MAX_WAIT_MS", 10))
+
+    # Cache des résultats de prédiction (LRU + TTL)
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1024))
+    RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", 3600))
+    RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", 64))
+
+    # Heatmaps renvoyées par /predict-image sous forme d'artefact
+    ARTIFACT_TTL_S = float(os.getenv("ARTIFACT_TTL_S", 600))
+    ARTIFACT_MAX_ENTRIES = int(os.getenv("ARTIFACT_MAX_ENTRIES", 256))
+    ARTIFACT_MAX_MB = float(os.getenv("ARTIFACT_MAX_MB", 64))
+
+    # Cache des rendus de /heatmap et /heatmap-overlay (mémoire puis disque, borné en taille)
+    HEATMAP_CACHE_ENABLED = os.getenv("HEATMAP_CACHE_ENABLED", "true").lower() == "true"
+    HEATMAP_CACHE_DIR = Path(os.getenv("HEATMAP_CACHE_DIR", BASE_DIR / "api" / "cache_heatmaps"))
+    HEATMAP_CACHE_MEMORY_MB = float(os.getenv("HEATMAP_CACHE_MEMORY_MB", 64))
+    HEATMAP_CACHE_DISK_MB = float(os.getenv("HEATMAP_CACHE_DISK_MB", 512))  # 0 = mémoire seule
+
+    # Intervalle minimal entre deux vérifications des liens 'current' (versions affichées)
+    VERSION_CHECK_INTERVAL_S = float(os.getenv("VERSION_CHECK_INTERVAL_S", 5))
+
+    # Logging (file non bloquante, résumé par requête, détails échantillonnés)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" ou "json"
+    LOG_DEBUG_SAMPLE_RATE = int(os.getenv("LOG_DEBUG_SAMPLE_RATE", 100))  # Détails pour 1 requête sur N (0 = jamais)
+    LOG_FILE = os.getenv("LOG_FILE", "")
+
+    # Contrôle d'admission des prédictions (0 = 2 x nombre de workers d'inférence)
+    ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", 0))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 32))
+    ADMISSION_MAX_QUEUE_PER_KEY = int(os.getenv("ADMISSION_MAX_QUEUE_PER_KEY", 16))
+    ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", 10))
+
+    # Endpoint /predict-batch
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+    BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 100 * 1024 * 1024))  # Total des images d'un lot (100MB)
+
     # File Management
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))  # 10MB, vérifié pendant la lecture de l'upload
     ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff"}
+    LAZY_IMAGE_PREDICTION = os.getenv("LAZY_IMAGE_PREDICTION", "true").lower() == "true"  # CatBoost d'abord, image lue seulement si risque élevé
+    PERSIST_UPLOADS = os.getenv("PERSIST_UPLOADS", "true").lower() == "true"  # Copie des uploads dans images_a_traiter
     
     @classmethod
     def create_directories(cls):
@@ -0,0 +1,200 @@
+"""
+Logging structuré et non bloquant pour le chemin d'inférence
+
+- Les records passent par une file (QueueHandler) : le thread de la requête
+  ne fait ni formatage ni écriture, c'est le QueueListener qui s'en charge.
+- Une seule ligne de résumé par requête (méthode, route, statut, durée,
+  décision, modèles utilisés...), complétée au fil de la requête.
+- Les détails DEBUG des loggers de l'API ne sont émis que pour 1 requête
+  sur LOG_DEBUG_SAMPLE_RATE (échantillonnage), en plus du niveau de base.
+- Les appels utilisent le formatage paresseux (`logger.debug("%s", x)`) :
+  le message n'est construit que si le record est réellement émis.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+# Loggers de l'application (les détails échantillonnés ne concernent qu'eux)
+APP_LOGGER = "api"
+
+_contexte_requete: contextvars.ContextVar = contextvars.ContextVar("contexte_requete", default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+_niveau_base = logging.INFO
+_taux_echantillonnage = 0
+
+
+class _FiltreEchantillonnage(logging.Filter):
+    """Laisse passer le niveau de base, et le DEBUG des requêtes échantillonnées"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= _niveau_base:
+            return True
+        contexte = _contexte_requete.get()
+        return contexte is not None and contexte["sampled"]
+
+
+class _FiltreContexte(logging.Filter):
+    """Ajoute l'identifiant de la requête courante au record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        contexte = _contexte_requete.get()
+        record.request_id = contexte["request_id"] if contexte else None
+        return True
+
+
+class _QueueHandlerParesseux(logging.handlers.QueueHandler):
+    """
+    QueueHandler qui ne formate pas dans le thread appelant
+
+    Le QueueHandler standard appelle getMessage() avant la mise en file ;
+    ici on garde msg/args tels quels, le formatage se fait dans le listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class FormateurJSON(logging.Formatter):
+    """Une ligne JSON par record, avec les champs structurés (`summary`)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entree = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entree["request_id"] = record.request_id
+        if isinstance(getattr(record, "summary", None), dict):
+            entree.update(record.summary)
+        if record.exc_info:
+            entree["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entree, ensure_ascii=False, default=str)
+
+
+class FormateurTexte(logging.Formatter):
+    """Format texte habituel, avec les champs structurés en clé=valeur"""
+
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        ligne = super().format(record)
+        if isinstance(getattr(record, "summary", None), dict):
+            ligne += " " + " ".join(f"{cle}={valeur}" for cle, valeur in record.summary.items())
+        return ligne
+
+
+def configurer_logging(niveau: str = "INFO", format_sortie: str = "text",
+                       taux_echantillonnage: int = 0, fichier: Optional[str] = None):
+    """
+    Installe le handler à file sur le logger racine (idempotent)
+
+    Args:
+        niveau: Niveau de base (INFO, WARNING...)
+        format_sortie: "json" ou "text"
+        taux_echantillonnage: Détails DEBUG pour 1 requête sur N (0 = jamais)
+        fichier: Fichier de log en plus de la sortie standard (optionnel)
+    """
+    global _listener, _niveau_base, _taux_echantillonnage
+    if _listener is not None:
+        return
+
+    _niveau_base = logging.getLevelName(niveau.upper()) if isinstance(niveau, str) else niveau
+    if not isinstance(_niveau_base, int):
+        _niveau_base = logging.INFO
+    _taux_echantillonnage = max(0, taux_echantillonnage)
+
+    formateur = FormateurJSON() if format_sortie == "json" else FormateurTexte()
+    sorties = [logging.StreamHandler(sys.stdout)]
+    if fichier:
+        sorties.append(logging.FileHandler(fichier, encoding="utf-8"))
+    for sortie in sorties:
+        sortie.setFormatter(formateur)
+
+    file_records = queue.SimpleQueue()
+    handler = _QueueHandlerParesseux(file_records)
+    handler.addFilter(_FiltreEchantillonnage())
+    handler.addFilter(_FiltreContexte())
+
+    racine = logging.getLogger()
+    for ancien in list(racine.handlers):
+        racine.removeHandler(ancien)
+    racine.addHandler(handler)
+    racine.setLevel(_niveau_base)
+
+    # Le DEBUG des loggers de l'API doit pouvoir atteindre le filtre d'échantillonnage
+    niveau_app = logging.DEBUG if _taux_echantillonnage else _niveau_base
+    logging.getLogger(APP_LOGGER).setLevel(min(niveau_app, _niveau_base))
+
+    _listener = logging.handlers.QueueListener(file_records, *sorties, respect_handler_level=True)
+    _listener.start()
+    atexit.register(arreter_logging)
+
+
+def arreter_logging():
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def debut_requete(**champs) -> contextvars.Token:
+    """
+    Ouvre le contexte de log d'une requête (identifiant, échantillonnage, résumé)
+
+    Returns:
+        Jeton à passer à fin_requete
+    """
+    echantillonne = _taux_echantillonnage > 0 and random.randrange(_taux_echantillonnage) == 0
+    contexte = {
+        "request_id": uuid4().hex[:12],
+        "sampled": echantillonne,
+        "started_at": time.perf_counter(),
+        "summary": dict(champs),
+    }
+    return _contexte_requete.set(contexte)
+
+
+def ajouter_au_resume(**champs):
+    """Ajoute des champs à la ligne de résumé de la requête courante"""
+    contexte = _contexte_requete.get()
+    if contexte is not None:
+        contexte["summary"].update(champs)
+
+
+def detail_actif() -> bool:
+    """
+    True si les détails DEBUG de la requête courante seront émis
+
+    À utiliser pour garder les calculs coûteux (DataFrames, listes de détections)
+    qui ne servent qu'au log : hors échantillon, ils ne sont même pas construits.
+    """
+    if _niveau_base <= logging.DEBUG:
+        return True
+    contexte = _contexte_requete.get()
+    return contexte is not None and contexte["sampled"]
+
+
+def fin_requete(token: contextvars.Token, logger: logging.Logger, **champs) -> Dict[str, Any]:
+    """Émet la ligne de résumé de la requête et ferme son contexte"""
+    contexte = _contexte_requete.get()
+    resume = {}
+    if contexte is not None:
+        resume = dict(contexte["summary"], **champs)
+        resume["duration_ms"] = round((time.perf_counter() - contexte["started_at"]) * 1000, 2)
+        if contexte["sampled"]:
+            resume["sampled"] = True
+        logger.info("requete", extra={"summary": resume})
+    _contexte_requete.reset(token)
+    return resume
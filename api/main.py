@@ -1,12 +1,18 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, BackgroundTasks, Request, Depends
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import os
+import asyncio
+import time
 import logging
 from dotenv import load_dotenv
 from uuid import uuid4
 from pathlib import Path
 import sys
+import base64
+import tempfile
+import threading
+from datetime import datetime
+from typing import List, Optional
 
 # Import des modules custom (j'ai organisé le code en modules)
 current_dir = Path(__file__).parent
@@ -14,14 +20,30 @@ parent_dir = current_dir.parent
 sys.path.insert(0, str(parent_dir))
 
 from api.utils.prediction_service import PredictionService
+from api.utils.inference_executor import InferenceExecutor
+from api.utils.batch_parameters import parser_parametres_lot, associer_images
+from api.models.model_registry import model_registry
+from api.utils.image_io import decoder_image, sauvegarder_image, taille_image
+from api.utils.artifact_store import ArtifactStore
+from api.utils.heatmap_cache import HeatmapCache, cle_heatmap
+from api.utils.result_cache import empreinte_image
+from api.utils.upload_reader import lire_upload, verifier_upload, BudgetUpload, LimiteTailleRequete, TYPES_MIME
+from api.utils.admission import AdmissionController, AdmissionRefusee
 from api.config import config
+from api.metrics import mesurer_etape, enregistrer_phase_demarrage, exposer as exposer_metriques
+from api.logging_config import configurer_logging, debut_requete, fin_requete, ajouter_au_resume
 
 # Chargement des variables d'environnement
 load_dotenv()
 
-# Configuration du logging (j'aime bien savoir ce qui se passe)
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Configuration du logging (j'aime bien savoir ce qui se passe, mais sans ralentir les requêtes)
+configurer_logging(
+    niveau=config.LOG_LEVEL,
+    format_sortie=config.LOG_FORMAT,
+    taux_echantillonnage=config.LOG_DEBUG_SAMPLE_RATE,
+    fichier=config.LOG_FILE or None
+)
+logger = logging.getLogger("api.main")
 
 # Variables globales
 API_KEY = config.API_KEY
@@ -44,11 +66,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Taille maximale du corps par route d'upload (image + champs du formulaire)
+MARGE_FORMULAIRE = 64 * 1024
+app.add_middleware(
+    LimiteTailleRequete,
+    limites={
+        "/predict-image": config.MAX_FILE_SIZE + MARGE_FORMULAIRE,
+        "/heatmap": config.MAX_FILE_SIZE + MARGE_FORMULAIRE,
+        "/heatmap-overlay": config.MAX_FILE_SIZE + MARGE_FORMULAIRE,
+        "/heatmap-data": config.MAX_FILE_SIZE + MARGE_FORMULAIRE,
+        "/predict-batch": config.BATCH_MAX_BYTES + 1024 * 1024,
+    }
+)
+
+@app.middleware("http")
+async def journal_requete(request: Request, call_next):
+    """Une ligne de résumé par requête (le contexte de log suit la requête jusque dans les workers)"""
+    token = debut_requete(method=request.method, path=request.url.path)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        fin_requete(token, logger, status=status)
+
+# Exécuteur d'inférence : les appels aux modèles sont bloquants, on les sort de la boucle asyncio
+inference_executor = InferenceExecutor(
+    max_workers=config.INFERENCE_WORKERS or None,
+    intra_op_threads=config.TF_INTRA_OP_THREADS or None,
+    inter_op_threads=config.TF_INTER_OP_THREADS or None
+)
+inference_executor.configure_tensorflow()
+
+# Contrôle d'admission : concurrence bornée, file équitable entre clés API, 429 si saturé
+admission_controller = AdmissionController(
+    max_inflight=config.ADMISSION_MAX_INFLIGHT or 2 * inference_executor.max_workers,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    max_queue_per_key=config.ADMISSION_MAX_QUEUE_PER_KEY,
+    max_wait_s=config.ADMISSION_MAX_WAIT_S
+)
+
+@app.exception_handler(AdmissionRefusee)
+async def admission_refusee_handler(request: Request, exc: AdmissionRefusee):
+    """Refus rapide quand la file est pleine, avec le délai conseillé"""
+    ajouter_au_resume(admission="rejected")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Heatmaps générées par /predict-image, récupérables via /artifacts/{id}
+artifact_store = ArtifactStore(
+    max_entries=config.ARTIFACT_MAX_ENTRIES,
+    ttl_s=config.ARTIFACT_TTL_S,
+    max_bytes=int(config.ARTIFACT_MAX_MB * 1024 * 1024)
+)
+
+# Rendus de /heatmap et /heatmap-overlay (mémoire + disque), clé = image + version vision + options
+heatmap_cache = HeatmapCache(
+    cache_dir=config.HEATMAP_CACHE_DIR if config.HEATMAP_CACHE_DISK_MB > 0 else None,
+    max_memory_bytes=int(config.HEATMAP_CACHE_MEMORY_MB * 1024 * 1024),
+    max_disk_bytes=int(config.HEATMAP_CACHE_DISK_MB * 1024 * 1024)
+) if config.HEATMAP_CACHE_ENABLED else None
+
+# Styles de rendu acceptés par /predict-image et modes de livraison
+HEATMAP_STYLES = {"none", "heatmap", "overlay"}
+HEATMAP_DELIVERIES = {"inline", "artifact"}
+
+# Formats de sortie de /heatmap et /heatmap-overlay
+HEATMAP_FORMATS = {"png", "jpeg", "webp"}
+TAILLE_MORCEAU_REPONSE = 64 * 1024
+
+# Bornes de la grille des iso-contours de /heatmap-data
+HEATMAP_GRID_MIN, HEATMAP_GRID_MAX = 8, 512
+
 # Initialisation du service de prédiction (le cœur du système)
 logger.info("🌱 Initialisation du service de prédiction...")
 prediction_service = PredictionService(
     catboost_model_path=str(config.CATBOOST_MODEL_PATH),
-    vision_model_path=str(config.VISION_MODEL_PATH)
+    vision_model_path=str(config.VISION_MODEL_PATH),
+    max_concurrence=inference_executor.max_workers
 )
 
 def check_api_key(auth: str):
@@ -58,6 +157,9 @@ def check_api_key(auth: str):
     Args:
         auth: Header d'autorisation
         
+    Returns:
+        Nom du client associé à la clé (voir Config.API_KEYS)
+        
     Raises:
         HTTPException: Si la clé est invalide
     """
@@ -67,12 +169,33 @@ def check_api_key(auth: str):
             detail="🚫 Header Authorization manquant ou invalide"
         )
     
-    key = auth.split("Bearer ")[-1]
-    if key != API_KEY:
+    client = identifier_client(auth)
+    if client is None:
         raise HTTPException(
             status_code=403, 
             detail="🔑 Clé API invalide"
         )
+    return client
+
+def identifier_client(auth: Optional[str]) -> Optional[str]:
+    """Nom du client associé à la clé API du header (None si clé absente ou inconnue)"""
+    if not auth or not auth.startswith("Bearer "):
+        return None
+    return config.API_KEYS.get(auth.split("Bearer ")[-1])
+
+async def admission_prediction(authorization: str = Header(None)):
+    """
+    Place de prédiction réservée pour la durée de l'endpoint, dans la file de la clé API
+    
+    Une clé invalide n'entre pas dans la file : l'endpoint la refuse via check_api_key.
+    """
+    client = identifier_client(authorization)
+    if client is None:
+        yield None
+        return
+    ajouter_au_resume(client=client)
+    async with admission_controller.slot(client):
+        yield client
 
 @app.get("/status")
 def status():
@@ -83,6 +206,20 @@ def status():
         "project": "Gaia Vision - Soutenance Alyra"
     }
 
+@app.get("/livez")
+def livez():
+    """Liveness : le processus répond (ne dépend pas des modèles)"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness : modèles chargés et préchauffés, l'API peut recevoir du trafic"""
+    pret = etat_demarrage["ready"] and prediction_service.models_loaded
+    return JSONResponse(
+        status_code=200 if pret else 503,
+        content={"status": "ready" if pret else "not_ready", "startup": etat_demarrage}
+    )
+
 @app.get("/health")
 def health():
     """Vérification complète de l'état du système"""
@@ -90,7 +227,11 @@ def health():
         health_status = prediction_service.health_check()
         return {
             "status": "healthy" if health_status["all_models_ready"] else "partial",
-            "models": health_status
+            "models": health_status,
+            "inference_executor": inference_executor.stats(),
+            "admission": admission_controller.stats(),
+            "heatmap_cache": heatmap_cache.stats() if heatmap_cache else None,
+            "startup": etat_demarrage
         }
     except Exception as e:
         logger.error(f"Erreur lors du health check: {e}")
@@ -98,114 +239,215 @@ def health():
 
 @app.post("/predict-image")
 async def predict_image(
+    background_tasks: BackgroundTasks,
     authorization: str = Header(None),
+    _admission: Optional[str] = Depends(admission_prediction),
     race_champignon: str = Form(..., description="Race du champignon"),
     type_substrat: str = Form(..., description="Type de substrat"),
     jours_inoculation: int = Form(..., description="Nombre de jours depuis l'inoculation"),
     hygrometrie: float = Form(..., description="Taux d'hygrométrie (%)"),
     co2_ppm: float = Form(..., description="Taux de CO2 en PPM"),
     commentaire: str = Form("", description="Commentaire optionnel"),
-    image: UploadFile = File(..., description="Image à analyser")
+    image: UploadFile = File(..., description="Image à analyser"),
+    heatmap: str = Form("none", description="Rendu des zones contaminées: none, heatmap ou overlay"),
+    heatmap_delivery: str = Form("inline", description="inline (PNG en base64) ou artifact (GET /artifacts/{id})")
 ):
     """
     Prédiction orchestrée utilisant CatBoost + Vision
+    
+    Optionnellement, la heatmap (ou l'overlay) est rendue à partir des détections
+    de cette même prédiction : pas de second envoi de l'image ni de seconde inférence.
+    
+    Avec LAZY_IMAGE_PREDICTION, CatBoost est évalué d'abord : si le risque est
+    faible, l'image n'est ni lue, ni décodée, ni sauvegardée (`image_processing`).
     """
-    logger.info("=== DÉBUT DE REQUÊTE PREDICT-IMAGE ===")
-    logger.info(f"Paramètres reçus: race_champignon={race_champignon}, type_substrat={type_substrat}, jours_inoculation={jours_inoculation}, hygrometrie={hygrometrie}, co2_ppm={co2_ppm}")
-    logger.info(f"Image reçue: {image.filename}, taille: {image.size if hasattr(image, 'size') else 'inconnue'}")
+    logger.debug(
+        "Paramètres reçus: race_champignon=%s, type_substrat=%s, jours_inoculation=%s, hygrometrie=%s, co2_ppm=%s",
+        race_champignon, type_substrat, jours_inoculation, hygrometrie, co2_ppm
+    )
     
     try:
-        logger.info("Vérification de la clé API...")
         check_api_key(authorization)
-        logger.info("✅ Clé API validée")
         
     except Exception as e:
-        logger.error(f"❌ Erreur de validation API Key: {e}")
+        logger.warning("❌ Erreur de validation API Key: %s", e)
         raise HTTPException(status_code=401, detail=f"Erreur d'autorisation: {str(e)}")
     
+    if heatmap not in HEATMAP_STYLES:
+        raise HTTPException(status_code=400, detail=f"heatmap doit valoir: {', '.join(sorted(HEATMAP_STYLES))}")
+    if heatmap_delivery not in HEATMAP_DELIVERIES:
+        raise HTTPException(status_code=400, detail=f"heatmap_delivery doit valoir: {', '.join(sorted(HEATMAP_DELIVERIES))}")
+    
+    parametres = {
+        "race_champignon": race_champignon,
+        "type_substrat": type_substrat,
+        "jours_inoculation": jours_inoculation,
+        "hygrometrie": hygrometrie,
+        "co2_ppm": co2_ppm,
+    }
+    
+    # Phase 1 : CatBoost seul. À risque faible la vision ne tourne pas, l'image est inutile
+    catboost_prealable = None
+    if config.LAZY_IMAGE_PREDICTION:
+        try:
+            catboost_prealable = await inference_executor.run(prediction_service.evaluer_catboost, **parametres)
+            if catboost_prealable[1]["risk_level"] != "high":
+                # Image non analysée, mais refusée comme sur le chemin complet (415/413) ;
+                # le corps est déjà reçu (multipart spoolé par Starlette) : on libère le fichier temporaire
+                await verifier_upload(image, config.MAX_FILE_SIZE, config.ALLOWED_EXTENSIONS)
+                await image.close()
+                ajouter_au_resume(image="skipped")
+                result = await inference_executor.run(
+                    prediction_service.predict, **parametres,
+                    catboost_prealable=catboost_prealable, image_ignoree=True
+                )
+                response = construire_reponse_prediction(result, parametres, commentaire, image_file=None)
+                response["image_processing"] = {"status": "skipped", "reason": "Risque CatBoost faible, analyse vision inutile"}
+                if heatmap != "none":
+                    response["heatmap"] = await rendre_heatmap(None, None, heatmap, heatmap_delivery)
+                return JSONResponse(response)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception("❌ ERREUR CRITIQUE dans predict-image: %s: %s", type(e).__name__, e)
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
+    
+    # Phase 2 : lecture bornée, format vérifié sur les premiers octets, taille plafonnée (415/413)
+    with mesurer_etape("upload_read"):
+        content, file_ext = await lire_upload(image, config.MAX_FILE_SIZE, config.ALLOWED_EXTENSIONS)
+    ajouter_au_resume(upload_bytes=len(content))
+    
     try:
-        logger.info("Début de sauvegarde de l'image...")
-        # Sauvegarde de l'image
         file_id = str(uuid4())
-        file_ext = Path(image.filename).suffix
         file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
         
-        logger.info(f"Chemin de sauvegarde: {file_path}")
+        # Sauvegarde optionnelle, écrite en tâche de fond après l'envoi de la réponse
+        if config.PERSIST_UPLOADS:
+            background_tasks.add_task(sauvegarder_image, file_path, content)
+            logger.debug("Sauvegarde planifiée: %s", file_path)
         
-        with open(file_path, "wb") as f:
-            content = await image.read()
-            f.write(content)
-        
-        logger.info(f"✅ Image sauvegardée: {file_path} ({len(content)} bytes)")
+        # Si une heatmap est demandée, l'image est décodée une fois pour l'inférence et le rendu ;
+        # l'empreinte du cache reste celle des octets (pas du tableau décodé, bien plus gros)
+        image_input, image_hash = content, None
+        if heatmap != "none":
+            image_input, image_hash = await inference_executor.run(decoder_upload, content)
         
         # Prédiction orchestrée
-        logger.info("Début de la prédiction orchestrée...")
-        result = prediction_service.predict(
-            race_champignon=race_champignon,
-            type_substrat=type_substrat,
-            jours_inoculation=jours_inoculation,
-            hygrometrie=hygrometrie,
-            co2_ppm=co2_ppm,
-            image_path=str(file_path)
+        result = await inference_executor.run(
+            prediction_service.predict,
+            **parametres,
+            image=image_input,
+            catboost_prealable=catboost_prealable,
+            image_hash=image_hash
         )
-        logger.info(f"✅ Prédiction terminée: {result.get('final_decision', 'N/A')}")
         
-        # Enrichissement de la réponse
-        logger.info("Construction de la réponse...")
-        response = {
-            "prediction": result["final_decision"],
-            "confidence": result["confidence_score"],
-            "confidence_source": result["confidence_source"],  # Source de la confiance
-            "multi_sac_count": result["multi_sac_count"],  # Nombre de sacs
-            "analysis_method": "Intelligence Artificielle",  # Texte pour l'interface
-            "details": {
-                "catboost_prediction": result["catboost_prediction"],
-                "vision_prediction": result["vision_prediction"],
-                "models_used": result["models_used"],
-                "analysis_steps": result["analysis_steps"],
-                "model_versions": result.get("model_versions", {})  # Ajouter les versions
-            },
-            "input_parameters": {
-                "race_champignon": race_champignon,
-                "type_substrat": type_substrat,
-                "jours_inoculation": jours_inoculation,
-                "hygrometrie": hygrometrie,
-                "co2_ppm": co2_ppm,
-                "commentaire": commentaire,
-                "image_file": file_path.name
-            }
-        }
+        response = construire_reponse_prediction(
+            result, parametres, commentaire, image_file=file_path.name if config.PERSIST_UPLOADS else None
+        )
+        response["image_processing"] = {"status": "processed"}
         
-        # Ajout d'éventuels warnings ou erreurs
-        if "warning" in result:
-            response["warning"] = result["warning"]
-        if "error" in result:
-            response["error"] = result["error"]
+        if heatmap != "none":
+            response["heatmap"] = await rendre_heatmap(
+                image_input, result.get("vision_prediction"), heatmap, heatmap_delivery
+            )
         
-        logger.info(f"✅ Réponse construite avec succès")
-        logger.info(f"Décision finale: {result['final_decision']}")
-        logger.info("=== FIN DE REQUÊTE PREDICT-IMAGE ===")
         return JSONResponse(response)
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        logger.error(f"❌ ERREUR CRITIQUE dans predict-image:")
-        logger.error(f"Type d'erreur: {type(e).__name__}")
-        logger.error(f"Message: {str(e)}")
-        logger.error(f"Traceback complet:\n{error_details}")
-        
-        # Nettoyer le fichier en cas d'erreur
-        if 'file_path' in locals() and file_path.exists():
-            logger.info(f"Nettoyage du fichier temporaire: {file_path}")
-            file_path.unlink()
-        
-        logger.error("=== FIN DE REQUÊTE PREDICT-IMAGE (ERREUR) ===")
+        logger.exception("❌ ERREUR CRITIQUE dans predict-image: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
 
+def construire_reponse_prediction(result: dict, parametres: dict, commentaire: str, image_file: Optional[str]) -> dict:
+    """Réponse de /predict-image à partir du résultat du service de prédiction"""
+    response = {
+        "prediction": result["final_decision"],
+        "confidence": result["confidence_score"],
+        "confidence_source": result["confidence_source"],  # Source de la confiance
+        "multi_sac_count": result["multi_sac_count"],  # Nombre de sacs
+        "analysis_method": "Intelligence Artificielle",  # Texte pour l'interface
+        "details": {
+            "catboost_prediction": result["catboost_prediction"],
+            "vision_prediction": result["vision_prediction"],
+            "models_used": result["models_used"],
+            "analysis_steps": result["analysis_steps"],
+            "model_versions": result.get("model_versions", {})  # Ajouter les versions
+        },
+        "input_parameters": {
+            **parametres,
+            "commentaire": commentaire,
+            "image_file": image_file
+        }
+    }
+    
+    # Ajout d'éventuels warnings ou erreurs
+    if "warning" in result:
+        response["warning"] = result["warning"]
+    if "error" in result:
+        response["error"] = result["error"]
+    return response
+
+def decoder_upload(content: bytes):
+    """Image décodée (inférence et rendu) et empreinte de ses octets (clé du cache des résultats)"""
+    return decoder_image(content), empreinte_image(content)
+
+async def rendre_heatmap(image_array, vision_result, style: str, delivery: str) -> dict:
+    """
+    Rend la heatmap à partir des détections déjà obtenues par la prédiction
+    
+    Returns:
+        Dict décrivant la heatmap (PNG en base64, ou identifiant d'artefact)
+    """
+    info = {"style": style, "available": False}
+    if not vision_result:
+        info["reason"] = "Analyse vision non effectuée (risque CatBoost faible)"
+        return info
+    
+    from api.utils.heatmap_generator import ContaminationHeatmapGenerator
+    generator = ContaminationHeatmapGenerator()
+    # PNG réduit à HEATMAP_MAX_SIDE comme les rendus de /heatmap : taille bornée en mémoire et en base64
+    rendu = await inference_executor.run(
+        generator.render, image_array, vision_result.get("detections", []), style,
+        format="png", max_side=config.HEATMAP_MAX_SIDE, compress_level=config.HEATMAP_PNG_COMPRESS_LEVEL
+    )
+    if rendu is None:
+        info["reason"] = "Aucune contamination détectée"
+        return info
+    png = rendu[0].getvalue()
+    
+    info.update({"available": True, "media_type": "image/png"})
+    artifact_id = artifact_store.ajouter(png, "image/png") if delivery == "artifact" else None
+    if artifact_id is not None:
+        info.update({"artifact_id": artifact_id, "url": f"/artifacts/{artifact_id}"})
+    else:
+        # Inline, ou artefact plus gros que ARTIFACT_MAX_MB
+        info["data"] = base64.b64encode(png).decode()
+    return info
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Métriques Prometheus : durée de chaque étape de la prédiction et
+    décisions par chemin (vision / CatBoost seul) et version de modèle
+    """
+    content, content_type = exposer_metriques()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, authorization: str = Header(None)):
+    """
+    Récupère une heatmap générée par /predict-image (heatmap_delivery=artifact)
+    """
+    check_api_key(authorization)
+    artifact = artifact_store.obtenir(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artefact introuvable ou expiré")
+    content, media_type = artifact
+    return Response(content=content, media_type=media_type)
+
 @app.post("/predict-parameters-only")
 async def predict_parameters_only(
     authorization: str = Header(None),
+    _admission: Optional[str] = Depends(admission_prediction),
     race_champignon: str = Form(...),
     type_substrat: str = Form(...),
     jours_inoculation: int = Form(...),
@@ -220,7 +462,8 @@ async def predict_parameters_only(
     
     try:
         # Prédiction sans image
-        result = prediction_service.predict(
+        result = await inference_executor.run(
+            prediction_service.predict,
             race_champignon=race_champignon,
             type_substrat=type_substrat,
             jours_inoculation=jours_inoculation,
@@ -243,33 +486,179 @@ async def predict_parameters_only(
             }
         }
         
-        logger.info(f"Prédiction paramètres seuls: {result['final_decision']}")
+        logger.debug("Prédiction paramètres seuls: %s", result['final_decision'])
         return JSONResponse(response)
         
     except Exception as e:
         logger.error(f"Erreur lors de la prédiction paramètres: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
 
+@app.post("/predict-batch")
+async def predict_batch(
+    authorization: str = Header(None),
+    _admission: Optional[str] = Depends(admission_prediction),
+    parameters: str = Form(..., description="Tableau des paramètres (JSON ou CSV), une ligne par image"),
+    images: List[UploadFile] = File(..., description="Images à analyser")
+):
+    """
+    Prédiction orchestrée sur plusieurs sacs en une seule requête.
+    
+    CatBoost est évalué sur toutes les lignes en un appel, la vision ne tourne
+    que sur les lignes à risque élevé, par lots.
+    """
+    check_api_key(authorization)
+    
+    try:
+        rows = parser_parametres_lot(parameters)
+        if len(rows) > config.BATCH_MAX_ITEMS:
+            raise ValueError(f"Trop de lignes ({len(rows)}), maximum {config.BATCH_MAX_ITEMS}")
+        image_indices = associer_images(rows, [image.filename for image in images])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Paramètres de lot invalides: {str(e)}")
+    
+    # Chaque image est vérifiée et plafonnée comme sur /predict-image, le total par
+    # BATCH_MAX_BYTES, puis écrite sur disque aussitôt lue : seule l'image en cours
+    # de lecture est en mémoire. Sans PERSIST_UPLOADS, le dossier est temporaire.
+    budget = BudgetUpload(config.BATCH_MAX_BYTES)
+    dossier_temporaire = None if config.PERSIST_UPLOADS else tempfile.TemporaryDirectory(prefix="predict-batch-")
+    dossier = UPLOAD_DIR if config.PERSIST_UPLOADS else Path(dossier_temporaire.name)
+    
+    file_paths = []
+    termine = False
+    try:
+        with mesurer_etape("upload_read"):
+            for image in images:
+                content, file_ext = await lire_upload(image, config.MAX_FILE_SIZE, config.ALLOWED_EXTENSIONS, budget)
+                file_path = dossier / f"{uuid4()}{file_ext}"
+                await asyncio.to_thread(file_path.write_bytes, content)
+                file_paths.append(file_path)
+        
+        items = [
+            {**row, "image_path": str(file_paths[image_index])}
+            for row, image_index in zip(rows, image_indices)
+        ]
+        
+        ajouter_au_resume(batch_rows=len(items), batch_images=len(images))
+        results = await inference_executor.run(prediction_service.predict_batch, items)
+        
+        response_items = []
+        for index, (row, image_index, result) in enumerate(zip(rows, image_indices, results)):
+            item = {
+                "index": index,
+                "prediction": result["final_decision"],
+                "confidence": result["confidence_score"],
+                "confidence_source": result["confidence_source"],
+                "multi_sac_count": result["multi_sac_count"],
+                "details": {
+                    "catboost_prediction": result["catboost_prediction"],
+                    "vision_prediction": result["vision_prediction"],
+                    "models_used": result["models_used"],
+                    "analysis_steps": result["analysis_steps"],
+                    "model_versions": result.get("model_versions", {})
+                },
+                "input_parameters": {
+                    **{key: row[key] for key in ("race_champignon", "type_substrat", "jours_inoculation",
+                                                 "hygrometrie", "co2_ppm", "commentaire")},
+                    "image_file": file_paths[image_index].name if config.PERSIST_UPLOADS else None,
+                    "original_filename": images[image_index].filename
+                }
+            }
+            for key in ("warning", "error", "note"):
+                if key in result:
+                    item[key] = result[key]
+            response_items.append(item)
+        
+        vision_count = sum(1 for result in results if "vision" in result["models_used"])
+        termine = True
+        return JSONResponse({
+            "count": len(response_items),
+            "summary": {
+                "vision_analyses": vision_count,
+                "catboost_only": len(response_items) - vision_count
+            },
+            "results": response_items
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la prédiction par lot: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction par lot: {str(e)}")
+    finally:
+        if dossier_temporaire is not None:
+            dossier_temporaire.cleanup()
+        elif not termine:
+            # Lot refusé ou en erreur : rien n'est gardé, comme avant l'écriture au fil de la lecture
+            for file_path in file_paths:
+                file_path.unlink(missing_ok=True)
+
+# Progression du démarrage, exposée par /readyz et /health
+etat_demarrage = {"phase": "starting", "ready": False, "phases": {}}
+_tache_demarrage: Optional[asyncio.Task] = None
+
+def _fin_phase(phase: str, started_at: float):
+    duration = round(time.perf_counter() - started_at, 3)
+    etat_demarrage["phases"][phase] = duration
+    enregistrer_phase_demarrage(phase, duration)
+
+async def _preparer_modeles():
+    """Chargement puis préchauffage des modèles, hors du démarrage du serveur"""
+    started_at = time.perf_counter()
+    try:
+        etat_demarrage["phase"] = "loading"
+        debut = time.perf_counter()
+        charge = await inference_executor.run(prediction_service.charger_modeles)
+        _fin_phase("model_load", debut)
+        for nom in ("catboost", "vision"):
+            if f"{nom}_load_s" in prediction_service.load_timings:
+                etat_demarrage["phases"][f"{nom}_load"] = prediction_service.load_timings[f"{nom}_load_s"]
+        
+        if not charge:
+            etat_demarrage["phase"] = "failed"
+            etat_demarrage["error"] = "Certains modèles n'ont pas pu être chargés"
+            logger.warning("Certains modèles n'ont pas pu être chargés")
+            return
+        
+        etat_demarrage["phase"] = "warming"
+        debut = time.perf_counter()
+        await inference_executor.run(prediction_service.prechauffer)
+        _fin_phase("warmup", debut)
+        
+        etat_demarrage["phase"] = "ready"
+        etat_demarrage["ready"] = True
+        _fin_phase("total", started_at)
+        logger.info(f"Modèles prêts: {etat_demarrage['phases']}")
+    except Exception as e:
+        etat_demarrage["phase"] = "failed"
+        etat_demarrage["error"] = str(e)
+        logger.exception("Erreur lors du préchargement des modèles: %s", e)
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialisation au démarrage de l'API"""
+    """
+    Initialisation au démarrage de l'API
+    
+    Les modèles se chargent en tâche de fond : /livez répond tout de suite,
+    /readyz passe à 200 une fois les modèles chargés et préchauffés.
+    """
+    global _tache_demarrage
     logger.info("Démarrage de l'API Gaia Vision...")
     
     # Validation de la configuration
+    debut = time.perf_counter()
     config_errors = config.validate_config()
     if config_errors:
         logger.warning("Problèmes de configuration détectés:")
         for error in config_errors:
             logger.warning(f"  - {error}")
+    _fin_phase("config_validation", debut)
     
-    # Précharger les modèles
-    try:
-        if prediction_service.charger_modeles():
-            logger.info("Modèles préchargés avec succès")
-        else:
-            logger.warning("Certains modèles n'ont pas pu être chargés")
-    except Exception as e:
-        logger.error(f"Erreur lors du préchargement des modèles: {e}")
+    _tache_demarrage = asyncio.create_task(_preparer_modeles())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Arrêt propre de l'exécuteur d'inférence"""
+    inference_executor.shutdown(wait=False)
 
 @app.get("/")
 def root():
@@ -280,11 +669,18 @@ def root():
         "description": "API d'analyse de contamination de champignons utilisant CatBoost et Vision",
         "endpoints": {
             "/status": "Statut de l'API",
+            "/livez": "Liveness (le processus répond)",
+            "/readyz": "Readiness (modèles chargés et préchauffés, 503 sinon)",
             "/health": "État des modèles",
             "/predict-image": "Prédiction avec image (CatBoost + Vision)",
             "/predict-parameters-only": "Prédiction sans image (CatBoost seul)",
+            "/predict-batch": "Prédiction par lot (plusieurs images + tableau de paramètres)",
+            "/artifacts/{id}": "Récupération d'une heatmap générée par /predict-image",
+            "/metrics": "Métriques Prometheus (latence par étape, décisions)",
+            "/reload-models": "Rechargement à chaud des modèles (état via /reload-models/status)",
             "/heatmap": "Génération de heatmap de contamination",
             "/heatmap-overlay": "Génération d'overlay de contamination",
+            "/heatmap-data": "Boxes et iso-contours des zones contaminées (rendu côté client)",
             "/docs": "Documentation Swagger"
         },
         "models": {
@@ -295,6 +691,54 @@ def root():
 
 # ===== ENDPOINTS HEATMAP DE CONTAMINATION =====
 
+async def obtenir_modele_vision():
+    """Modèle de vision partagé avec le service de prédiction (chargé une seule fois via le registre)"""
+    model = prediction_service.vision_model
+    if not model.est_charge():
+        model = await inference_executor.run(
+            model_registry.obtenir_modele_vision, prediction_service.vision_model_path
+        )
+    return model
+
+def options_encodage(
+    format: Optional[str] = Form(None, description="png, jpeg ou webp (défaut: HEATMAP_FORMAT)"),
+    quality: Optional[int] = Form(None, description="Qualité JPEG/WebP, 1-100 (défaut: HEATMAP_QUALITY)"),
+    max_side: Optional[int] = Form(None, description="Plus grand côté en pixels, 0 = taille d'origine (défaut: HEATMAP_MAX_SIDE)"),
+    compress_level: Optional[int] = Form(None, description="Compression PNG, 0-9 (défaut: HEATMAP_PNG_COMPRESS_LEVEL)")
+) -> dict:
+    """
+    Paramètres d'encodage des images de heatmap, complétés par les valeurs
+    par défaut de la configuration (réglées pour l'affichage web)
+    """
+    options = {
+        "format": (format or config.HEATMAP_FORMAT).lower(),
+        "quality": config.HEATMAP_QUALITY if quality is None else quality,
+        "max_side": config.HEATMAP_MAX_SIDE if max_side is None else max_side,
+        "compress_level": config.HEATMAP_PNG_COMPRESS_LEVEL if compress_level is None else compress_level,
+    }
+    if options["format"] not in HEATMAP_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format doit valoir: {', '.join(sorted(HEATMAP_FORMATS))}")
+    if not 1 <= options["quality"] <= 100:
+        raise HTTPException(status_code=400, detail="quality doit être compris entre 1 et 100")
+    if options["max_side"] < 0:
+        raise HTTPException(status_code=400, detail="max_side doit être positif (0 = taille d'origine)")
+    if not 0 <= options["compress_level"] <= 9:
+        raise HTTPException(status_code=400, detail="compress_level doit être compris entre 0 et 9")
+    return options
+
+async def _morceaux(buffer):
+    """Parcourt le buffer encodé par tranches, sans copie (memoryview)"""
+    vue = buffer.getbuffer()
+    for debut in range(0, len(vue), TAILLE_MORCEAU_REPONSE):
+        yield vue[debut:debut + TAILLE_MORCEAU_REPONSE]
+
+def reponse_image(buffer, media_type: str, headers: Optional[dict] = None) -> StreamingResponse:
+    """Diffuse l'image encodée directement depuis son buffer"""
+    return StreamingResponse(
+        _morceaux(buffer), media_type=media_type,
+        headers={**(headers or {}), "Content-Length": str(buffer.getbuffer().nbytes)}
+    )
+
 # Support OPTIONS pour CORS
 @app.options("/heatmap")
 async def heatmap_options():
@@ -306,203 +750,265 @@ async def heatmap_overlay_options():
     """Support CORS OPTIONS pour l'endpoint heatmap-overlay"""
     return {"message": "OK"}
 
+def version_vision(model) -> str:
+    """
+    Version du modèle de vision pour la clé du cache : version, dossier chargé
+    et backend effectif (SavedModel, TFLite fp16/int8 : détections différentes)
+    """
+    info = getattr(model, "version_info", None) or {}
+    return (f"{info.get('version', 'v1.0')}|{getattr(model, 'model_path', '')}"
+            f"|{getattr(model, 'model_type', None)}|{getattr(model, 'tflite_variant', None)}")
+
+def etag_correspond(if_none_match: Optional[str], etag: str) -> bool:
+    """Vrai si l'en-tête If-None-Match désigne cet ETag (`*` ne vaut pas pour un POST sans ressource stockée)"""
+    if not if_none_match:
+        return False
+    valeurs = {valeur.strip().removeprefix("W/") for valeur in if_none_match.split(",")}
+    return etag in valeurs
+
+async def servir_heatmap(file: UploadFile, style: str, encodage: dict, if_none_match: Optional[str]) -> Response:
+    """
+    Rend la heatmap ou l'overlay d'une image uploadée, via le cache des rendus
+    
+    Returns:
+        Image rendue (ou image d'origine sans contamination), avec ETag ;
+        304 si le client a déjà cette version (If-None-Match)
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="Le fichier doit être une image")
+    
+    with mesurer_etape("upload_read"):
+        content, extension = await lire_upload(file, config.MAX_FILE_SIZE, config.ALLOWED_EXTENSIONS)
+    
+    # Modèle partagé avec le service de prédiction (pas de rechargement par requête)
+    model = await obtenir_modele_vision()
+    if not model.est_charge():
+        raise HTTPException(status_code=500, detail="Impossible de charger le modèle de vision")
+    
+    cle, entetes = None, {}
+    if heatmap_cache is not None:
+        empreinte = await inference_executor.run(empreinte_image, content)
+        cle = cle_heatmap(empreinte, version_vision(model), style=style, **encodage)
+        entetes = {"ETag": f'"{cle[:32]}"', "Cache-Control": "private, no-cache"}
+        
+        if etag_correspond(if_none_match, entetes["ETag"]):
+            ajouter_au_resume(heatmap_cache="not_modified")
+            return Response(status_code=304, headers=entetes)
+        
+        cached = await inference_executor.run(heatmap_cache.obtenir, cle)
+        if cached is not None:
+            ajouter_au_resume(heatmap_cache="hit")
+            return Response(content=cached[0], media_type=cached[1], headers=entetes)
+        ajouter_au_resume(heatmap_cache="miss")
+    
+    from api.utils.heatmap_generator import ContaminationHeatmapGenerator
+    
+    # Décodage unique en mémoire, partagé entre inférence et rendu
+    image_array = await inference_executor.run(decoder_image, content)
+    
+    # Obtenir les détections
+    result = await inference_executor.run(model.predict, image_array)
+    
+    # Vérifier s'il y a des contaminations
+    contaminated_detections = [d for d in result.get('detections', []) if d.get('class_name') == 'contaminated']
+    
+    if not contaminated_detections:
+        logger.debug("⚠️ Aucune contamination détectée, retour image originale")
+        # Retourner l'image originale si pas de contamination
+        media_type = TYPES_MIME[extension]
+        if cle is not None:
+            await inference_executor.run(heatmap_cache.enregistrer, cle, content, media_type)
+        return Response(content=content, media_type=media_type, headers=entetes)
+    
+    # Générer le rendu, encodé selon les options demandées
+    generator = ContaminationHeatmapGenerator()
+    buffer, media_type = await inference_executor.run(
+        generator.render, image_array, result['detections'], style, **encodage
+    )
+    
+    ajouter_au_resume(contaminated_zones=len(contaminated_detections), heatmap_format=encodage["format"])
+    
+    if cle is not None:
+        await inference_executor.run(heatmap_cache.enregistrer, cle, buffer.getvalue(), media_type)
+    return reponse_image(buffer, media_type, entetes)
+
 @app.post("/heatmap")
 async def generate_heatmap(
     authorization: str = Header(None),
-    file: UploadFile = File(...)
+    if_none_match: Optional[str] = Header(None),
+    file: UploadFile = File(...),
+    encodage: dict = Depends(options_encodage),
+    _admission: Optional[str] = Depends(admission_prediction)
 ):
     """
     Génère une heatmap de contamination pour une image uploadée
     
     Returns:
-        Image PNG avec heatmap overlay des zones de contamination
+        Image (PNG, JPEG ou WebP selon `format`) avec heatmap overlay des zones de contamination
     """
     check_api_key(authorization)
-    
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="Le fichier doit être une image")
+    logger.debug("🔥 Génération heatmap pour: %s", file.filename)
     
     try:
-        import tempfile
-        from io import BytesIO
-        from PIL import Image
-        sys.path.append(str(current_dir / "utils"))
-        from heatmap_generator import ContaminationHeatmapGenerator
-        from models.vision_model import VisionModel
-        
-        # Sauvegarder temporairement le fichier uploadé
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_image_path = temp_file.name
-        
-        logger.info(f"🔥 Génération heatmap pour: {file.filename}")
-        
-        # Charger le modèle et faire la prédiction
-        model = VisionModel()
-        if not model.charger_modele():
-            raise HTTPException(status_code=500, detail="Impossible de charger le modèle de vision")
-        
-        # Obtenir les détections
-        result = model.predict(temp_image_path)
-        
-        # Vérifier s'il y a des contaminations
-        contaminated_detections = [d for d in result.get('detections', []) if d.get('class_name') == 'contaminated']
-        
-        if not contaminated_detections:
-            logger.info("⚠️ Aucune contamination détectée, retour image originale")
-            # Retourner l'image originale si pas de contamination
-            from fastapi.responses import Response
-            return Response(content=content, media_type="image/jpeg")
-        
-        # Générer la heatmap
-        generator = ContaminationHeatmapGenerator()
-        heatmap_img = generator.create_contamination_heatmap(temp_image_path, result['detections'])
-        
-        # Convertir en bytes pour la réponse
-        pil_img = Image.fromarray(heatmap_img)
-        img_buffer = BytesIO()
-        pil_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        logger.info(f"✅ Heatmap générée avec {len(contaminated_detections)} zone(s) de contamination")
-        
-        # Nettoyer le fichier temporaire
-        os.unlink(temp_image_path)
-        
-        from fastapi.responses import Response
-        return Response(content=img_buffer.getvalue(), media_type="image/png")
-        
+        return await servir_heatmap(file, "heatmap", encodage, if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Erreur génération heatmap: {e}")
-        # Nettoyer en cas d'erreur
-        if 'temp_image_path' in locals():
-            try:
-                os.unlink(temp_image_path)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de la heatmap: {str(e)}")
 
 
 @app.post("/heatmap-overlay")  
 async def generate_heatmap_overlay(
     authorization: str = Header(None),
-    file: UploadFile = File(...)
+    if_none_match: Optional[str] = Header(None),
+    file: UploadFile = File(...),
+    encodage: dict = Depends(options_encodage),
+    _admission: Optional[str] = Depends(admission_prediction)
 ):
     """
     Génère un overlay style PIL avec rectangles de contamination
     
     Returns:
-        Image PNG avec overlay rectangulaire des zones de contamination
+        Image (PNG, JPEG ou WebP selon `format`) avec overlay rectangulaire des zones de contamination
     """
     check_api_key(authorization)
+    logger.debug("🎯 Génération overlay pour: %s", file.filename)
     
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="Le fichier doit être une image")
+    try:
+        return await servir_heatmap(file, "overlay", encodage, if_none_match)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erreur génération overlay: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de l'overlay: {str(e)}")
+
+@app.options("/heatmap-data")
+async def heatmap_data_options():
+    """Support CORS OPTIONS pour l'endpoint heatmap-data"""
+    return {"message": "OK"}
+
+@app.post("/heatmap-data")
+async def generate_heatmap_data(
+    authorization: str = Header(None),
+    file: UploadFile = File(...),
+    contours: bool = Form(False, description="Ajouter les iso-contours de la heatmap accumulée"),
+    grid_size: int = Form(None, description="Plus grand côté de la grille des contours (défaut: HEATMAP_GRID_SIZE)"),
+    levels: str = Form("0.25,0.5,0.75", description="Niveaux des iso-contours, séparés par des virgules, dans ]0, 1]"),
+    _admission: Optional[str] = Depends(admission_prediction)
+):
+    """
+    Géométrie des zones détectées pour un rendu côté client
+    
+    Returns:
+        JSON avec les boxes normalisées, les scores et, si demandé, les
+        polygones des iso-contours (aucune image n'est encodée ni renvoyée)
+    """
+    check_api_key(authorization)
     
+    grid_size = config.HEATMAP_GRID_SIZE if grid_size is None else grid_size
+    if not HEATMAP_GRID_MIN <= grid_size <= HEATMAP_GRID_MAX:
+        raise HTTPException(status_code=400, detail=f"grid_size doit être compris entre {HEATMAP_GRID_MIN} et {HEATMAP_GRID_MAX}")
     try:
-        import tempfile
-        from io import BytesIO
-        from PIL import Image
-        sys.path.append(str(current_dir / "utils"))
-        from heatmap_generator import ContaminationHeatmapGenerator
-        from models.vision_model import VisionModel
-        
-        # Sauvegarder temporairement le fichier uploadé
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_image_path = temp_file.name
-        
-        logger.info(f"🎯 Génération overlay pour: {file.filename}")
-        
-        # Charger le modèle et faire la prédiction
-        model = VisionModel()
-        if not model.charger_modele():
-            raise HTTPException(status_code=500, detail="Impossible de charger le modèle de vision")
+        niveaux = tuple(sorted({float(niveau) for niveau in levels.split(",") if niveau.strip()}))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="levels doit être une liste de nombres séparés par des virgules")
+    if not niveaux or not all(0 < niveau <= 1 for niveau in niveaux):
+        raise HTTPException(status_code=400, detail="levels doit contenir des valeurs dans ]0, 1]")
+    
+    with mesurer_etape("upload_read"):
+        content, _ = await lire_upload(file, config.MAX_FILE_SIZE, config.ALLOWED_EXTENSIONS)
+    
+    try:
+        from api.utils.heatmap_generator import ContaminationHeatmapGenerator
         
-        # Obtenir les détections
-        result = model.predict(temp_image_path)
+        logger.debug("📐 Géométrie heatmap pour: %s", file.filename)
         
-        # Vérifier s'il y a des contaminations
-        contaminated_detections = [d for d in result.get('detections', []) if d.get('class_name') == 'contaminated']
+        model = await obtenir_modele_vision()
+        if not model.est_charge():
+            raise HTTPException(status_code=500, detail="Impossible de charger le modèle de vision")
         
-        if not contaminated_detections:
-            logger.info("⚠️ Aucune contamination détectée, retour image originale")
-            from fastapi.responses import Response
-            return Response(content=content, media_type="image/jpeg")
+        # Pas de décodage pleine taille : le modèle décode à sa taille d'entrée,
+        # et les dimensions viennent de l'en-tête de l'image
+        result = await inference_executor.run(model.predict, content)
+        image_size = await inference_executor.run(taille_image, content)
         
-        # Générer l'overlay
         generator = ContaminationHeatmapGenerator()
-        overlay_img = generator.create_contamination_overlay_pil(temp_image_path, result['detections'])
-        
-        # Convertir en bytes pour la réponse
-        img_buffer = BytesIO()
-        overlay_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        logger.info(f"✅ Overlay généré avec {len(contaminated_detections)} zone(s) de contamination")
+        data = await inference_executor.run(
+            generator.heatmap_data, result.get('detections', []), image_size,
+            contours=contours, grid_size=grid_size, levels=niveaux
+        )
+        data["prediction"] = result.get("prediction")
+        data["contamination_probability"] = result.get("contamination_probability")
         
-        # Nettoyer le fichier temporaire
-        os.unlink(temp_image_path)
+        ajouter_au_resume(contaminated_zones=sum(1 for d in data["detections"] if d["class_name"] == "contaminated"))
         
-        from fastapi.responses import Response
-        return Response(content=img_buffer.getvalue(), media_type="image/png")
+        return JSONResponse(data)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Erreur génération overlay: {e}")
-        # Nettoyer en cas d'erreur
-        if 'temp_image_path' in locals():
-            try:
-                os.unlink(temp_image_path)
-            except:
-                pass
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de l'overlay: {str(e)}")
+        logger.error(f"❌ Erreur génération heatmap-data: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération des données de heatmap: {str(e)}")
 
 @app.post("/reload-models")
-def reload_models(x_api_key: str = Header(None)):
+async def reload_models(wait: bool = False, x_api_key: str = Header(None)):
     """
-    Force le rechargement des modèles (utile après un changement de version)
+    Recharge les modèles à chaud (utile après un changement de version)
+    
+    Le chargement et le préchauffage se font en arrière-plan pendant que
+    l'ancienne version continue de servir ; l'échange est atomique.
+    Avec `wait=true`, la réponse attend la fin du rechargement.
     """
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Clé API invalide")
     
-    try:
-        logger.info("🔄 Demande de rechargement des modèles...")
-        
-        # Vérifier d'abord la synchronisation
-        sync_status = prediction_service.check_models_version_sync()
-        
-        # Recharger les modèles
-        reload_success = prediction_service.recharger_modeles()
-        
-        if reload_success:
-            # Récupérer les nouvelles versions
-            versions = prediction_service.get_model_versions()
-            logger.info(f"✅ Rechargement réussi. Nouvelles versions: {versions}")
-            
-            return {
-                "success": True,
-                "message": "Modèles rechargés avec succès",
-                "versions": versions,
-                "was_synchronized": sync_status,
-                "timestamp": "2025-07-16T20:35:00"
-            }
-        else:
-            logger.error("❌ Échec du rechargement des modèles")
-            return {
-                "success": False,
-                "message": "Échec du rechargement des modèles",
-                "error": "Impossible de recharger les modèles"
-            }
-            
-    except Exception as e:
-        logger.error(f"❌ Erreur lors du rechargement: {e}")
+    if prediction_service.statut_rechargement()["in_progress"]:
         return {
             "success": False,
-            "message": "Erreur lors du rechargement",
-            "error": str(e)
+            "message": "Rechargement déjà en cours",
+            "status": prediction_service.statut_rechargement()
+        }
+    
+    logger.info("🔄 Demande de rechargement des modèles...")
+    
+    # Vérifier d'abord la synchronisation
+    sync_status = prediction_service.check_models_version_sync()
+    
+    if not wait:
+        threading.Thread(target=prediction_service.recharger_modeles, name="model-reload", daemon=True).start()
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "message": "Rechargement lancé en arrière-plan, suivi via /reload-models/status",
+            "was_synchronized": sync_status,
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    reload_success = await inference_executor.run(prediction_service.recharger_modeles)
+    status = prediction_service.statut_rechargement()
+    
+    if reload_success:
+        return {
+            "success": True,
+            "message": "Modèles rechargés avec succès",
+            "versions": status.get("versions"),
+            "was_synchronized": sync_status,
+            "timestamp": datetime.now().isoformat(),
+            "status": status
         }
+    return {
+        "success": False,
+        "message": "Échec du rechargement des modèles, l'ancienne version reste servie",
+        "error": status.get("error", "Impossible de recharger les modèles"),
+        "status": status
+    }
+
+@app.get("/reload-models/status")
+def reload_models_status(x_api_key: str = Header(None)):
+    """État du dernier rechargement (chargement, préchauffage, échange, durées)"""
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Clé API invalide")
+    return prediction_service.statut_rechargement()
 
 @app.get("/models/versions")
 def get_model_versions(x_api_key: str = Header(None)):
@@ -530,6 +1036,19 @@ def get_model_versions(x_api_key: str = Header(None)):
             "error": str(e)
         }
 
+@app.get("/models/registry")
+def get_model_registry(x_api_key: str = Header(None)):
+    """
+    Modèles chargés en mémoire : nombre de chargements, durée, mémoire résidente
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Clé API invalide")
+    
+    return {
+        "success": True,
+        "registry": model_registry.stats()
+    }
+
 @app.get("/models/sync-check")
 def check_models_sync(x_api_key: str = Header(None)):
     """
@@ -0,0 +1,84 @@
+"""
+Métriques Prometheus de la chaîne de prédiction
+
+Histogrammes de durée par étape (lecture de l'upload, écriture disque,
+décodage, CatBoost, SSD, post-traitement, versions, rendu heatmap, encodage
+PNG), compteurs de décisions par chemin (vision ou CatBoost seul),
+étiquetés par version de modèle, et durée des phases de démarrage.
+Exposés par GET /metrics.
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Étapes mesurées (valeurs du label "stage")
+STAGES = (
+    "upload_read",
+    "disk_write",
+    "image_decode",
+    "catboost_inference",
+    "ssd_inference",
+    "postprocess",
+    "version_lookup",
+    "heatmap_render",
+    "png_encode",
+)
+
+# De la milliseconde (CatBoost, versions) à plusieurs secondes (SSD sur CPU)
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_DURATION = Histogram(
+    "gaia_stage_duration_seconds",
+    "Durée de chaque étape de la chaîne de prédiction",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+
+DECISIONS = Counter(
+    "gaia_decisions_total",
+    "Décisions rendues, par chemin (vision ou catboost_only) et version des modèles",
+    ["path", "decision", "catboost_version", "vision_version"],
+)
+
+STARTUP_PHASE_DURATION = Gauge(
+    "gaia_startup_phase_seconds",
+    "Durée de chaque phase du démarrage (validation config, chargement des modèles, préchauffage)",
+    ["phase"],
+)
+
+# Séries créées dès le démarrage pour que toutes les étapes apparaissent dans /metrics
+for _stage in STAGES:
+    STAGE_DURATION.labels(stage=_stage)
+
+
+@contextmanager
+def mesurer_etape(stage: str):
+    """Mesure la durée du bloc et l'ajoute à l'histogramme de l'étape"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - started_at)
+
+
+def enregistrer_phase_demarrage(phase: str, duration_s: float):
+    """Durée d'une phase du démarrage (dernière valeur)"""
+    STARTUP_PHASE_DURATION.labels(phase=phase).set(duration_s)
+
+
+def compter_decision(response: Dict[str, Any]):
+    """Compte une réponse de PredictionService selon le chemin suivi"""
+    versions = response.get("model_versions") or {}
+    DECISIONS.labels(
+        path="vision" if "vision" in response.get("models_used", []) else "catboost_only",
+        decision=str(response.get("final_decision")),
+        catboost_version=versions.get("catboost", "unknown"),
+        vision_version=versions.get("vision", "unknown"),
+    ).inc()
+
+
+def exposer() -> Tuple[bytes, str]:
+    """Métriques au format texte Prometheus, avec leur content-type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,4 +1,5 @@
 from .catboost_model import CatBoostModel
 from .vision_model import VisionModel
+from .model_registry import ModelRegistry, model_registry
 
-__all__ = ["CatBoostModel", "VisionModel"]
\ No newline at end of file
+__all__ = ["CatBoostModel", "VisionModel", "ModelRegistry", "model_registry"]
\ No newline at end of file
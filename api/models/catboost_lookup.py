@@ -0,0 +1,209 @@
+"""
+Table de décision précalculée du modèle CatBoost
+
+Les entrées du modèle vivent dans un espace presque discret : deux
+catégories (jsons/champignon_types.json, jsons/substrat_types.json) et trois
+valeurs numériques que CatBoost ne voit qu'à travers ses bordures : seul
+compte l'intervalle entre deux bordures où tombe la valeur. La table garde
+les probabilités du modèle pour chaque combinaison (catégorie, catégorie,
+intervalle, intervalle, intervalle), calculées au déploiement ; la
+prédiction devient une indexation en O(1).
+
+Une valeur v tombe dans l'intervalle k = nombre de bordures < v (CatBoost
+teste v > bordure, en float32). Le représentant évalué pour l'intervalle k
+est b[k], et b[-1] + 1 pour le dernier.
+
+Les entrées hors grille (catégorie inconnue, valeur non finie) sont
+renvoyées au modèle par l'appelant.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fichier de la table, dans le dossier de version du modèle
+LOOKUP_FILENAME = "catboost_lookup.npz"
+
+# Taille maximale de la grille (cellules) : au-delà la table n'est pas construite
+MAX_CELLS = 2_000_000
+
+# Lignes évaluées par appel au modèle pendant la construction
+TAILLE_LOT = 100_000
+
+
+def representants(bordures: np.ndarray) -> np.ndarray:
+    """Une valeur par intervalle : b[0], ..., b[-1], puis une valeur au-delà de b[-1]"""
+    bordures = np.asarray(bordures, dtype=np.float32)
+    if not len(bordures):
+        return np.zeros(1, dtype=np.float32)  # Variable jamais utilisée par les arbres
+    dernier = bordures[-1] + np.float32(1)
+    if dernier <= bordures[-1]:  # Bordure trop grande pour +1 en float32
+        dernier = np.nextafter(bordures[-1], np.float32(np.inf))
+    return np.append(bordures, dernier).astype(np.float32)
+
+
+class CatBoostLookupTable:
+    """Probabilités du modèle sur la grille catégories x intervalles des bordures"""
+
+    def __init__(self, feature_names: List[str], categories: Dict[str, List[str]],
+                 bordures: Dict[str, np.ndarray], probabilities: np.ndarray, classes: np.ndarray):
+        """
+        Args:
+            feature_names: Variables dans l'ordre du modèle (= axes de la table)
+            categories: Valeurs connues de chaque variable catégorielle
+            bordures: Bordures float32 de chaque variable numérique
+            probabilities: Tableau (*taille des axes, n_classes)
+            classes: Classes du modèle
+        """
+        self.feature_names = list(feature_names)
+        self.categories = {name: list(values) for name, values in categories.items()}
+        self.bordures = {name: np.asarray(values, dtype=np.float32) for name, values in bordures.items()}
+        self.probabilities = probabilities
+        self.classes = classes
+        self._index_categories = {
+            name: {value: i for i, value in enumerate(values)} for name, values in self.categories.items()
+        }
+
+    @property
+    def n_classes(self) -> int:
+        return self.probabilities.shape[-1]
+
+    @classmethod
+    def construire(cls, model: Any, categories: Dict[str, List[str]],
+                   max_cells: int = MAX_CELLS) -> "CatBoostLookupTable":
+        """
+        Évalue le modèle sur toute la grille
+
+        Args:
+            model: Modèle CatBoost natif (CatBoostClassifier)
+            categories: Valeurs de chaque variable catégorielle du modèle
+            max_cells: Taille maximale de la grille
+
+        Raises:
+            ValueError: Grille trop grande ou catégories manquantes
+        """
+        from catboost import Pool
+
+        feature_names = list(model.feature_names_)
+        cat_indices = sorted(model.get_cat_feature_indices())
+        bordures_par_index = model.get_borders()
+
+        axes, bordures = [], {}
+        for j, name in enumerate(feature_names):
+            if j in cat_indices:
+                if name not in categories:
+                    raise ValueError(f"Valeurs inconnues pour la variable catégorielle {name}")
+                axes.append(np.asarray(categories[name], dtype=object))
+            else:
+                bordures[name] = np.asarray(bordures_par_index.get(j, []), dtype=np.float32)
+                axes.append(representants(bordures[name]))
+
+        dims = tuple(len(axe) for axe in axes)
+        n_cells = int(np.prod(dims))
+        if n_cells > max_cells:
+            raise ValueError(f"Grille de {n_cells:,} cellules (max {max_cells:,}) : {dict(zip(feature_names, dims))}")
+
+        probabilities = None
+        for debut in range(0, n_cells, TAILLE_LOT):
+            fin = min(n_cells, debut + TAILLE_LOT)
+            indices = np.unravel_index(np.arange(debut, fin), dims)
+            matrix = np.empty((fin - debut, len(feature_names)), dtype=object)
+            for j, axe in enumerate(axes):
+                matrix[:, j] = axe[indices[j]]
+            lot = np.asarray(model.predict_proba(Pool(data=matrix, cat_features=cat_indices,
+                                                      feature_names=feature_names)), dtype=np.float64)
+            if probabilities is None:
+                probabilities = np.empty((n_cells, lot.shape[1]), dtype=np.float64)
+            probabilities[debut:fin] = lot
+
+        classes = np.asarray(getattr(model, "classes_", np.arange(probabilities.shape[1])))
+        return cls(feature_names, {feature_names[j]: categories[feature_names[j]] for j in cat_indices},
+                   bordures, probabilities.reshape(dims + (probabilities.shape[1],)), classes)
+
+    def sauvegarder(self, path: Union[str, Path]):
+        """Écrit la table (.npz non compressé, rechargé sans décompression)"""
+        arrays = {
+            "feature_names": np.asarray(self.feature_names, dtype=str),
+            "probabilities": self.probabilities,
+            "classes": self.classes,
+        }
+        for name, values in self.categories.items():
+            arrays[f"categories__{name}"] = np.asarray(values, dtype=str)
+        for name, values in self.bordures.items():
+            arrays[f"bordures__{name}"] = values
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def charger(cls, path: Union[str, Path]) -> "CatBoostLookupTable":
+        """Recharge une table écrite par `sauvegarder`"""
+        with np.load(path, allow_pickle=False) as data:
+            categories = {key.split("__", 1)[1]: data[key].tolist() for key in data.files if key.startswith("categories__")}
+            bordures = {key.split("__", 1)[1]: data[key] for key in data.files if key.startswith("bordures__")}
+            return cls(data["feature_names"].tolist(), categories, bordures, data["probabilities"], data["classes"])
+
+    def chercher(self, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probabilités des lignes qui tombent sur la grille
+
+        Args:
+            columns: {nom_colonne_modele: tableau}, comme pour le modèle
+
+        Returns:
+            (probabilités des lignes sur la grille (m, n_classes), masque booléen (n,))
+        """
+        n_rows = len(columns[self.feature_names[0]])
+        sur_grille = np.ones(n_rows, dtype=bool)
+        indices = []
+        for name in self.feature_names:
+            values = columns[name]
+            if name in self._index_categories:
+                index = self._index_categories[name]
+                idx = np.fromiter((index.get(value, -1) for value in values), dtype=np.intp, count=n_rows)
+                sur_grille &= idx >= 0
+            else:
+                # Même conversion float32 que CatBoost avant la comparaison aux bordures
+                values = np.asarray(values, dtype=np.float32)
+                sur_grille &= np.isfinite(values)
+                idx = np.searchsorted(self.bordures[name], values, side="left")
+            indices.append(idx)
+        return self.probabilities[tuple(idx[sur_grille] for idx in indices)], sur_grille
+
+    def stats(self) -> Dict[str, Any]:
+        """Dimensions de la table"""
+        return {
+            "cells": int(np.prod(self.probabilities.shape[:-1])),
+            "axes": dict(zip(self.feature_names, self.probabilities.shape[:-1])),
+            "size_bytes": int(self.probabilities.nbytes),
+        }
+
+
+def construire_et_sauvegarder(model: Any, categories: Dict[str, List[str]], version_dir: Path,
+                              max_cells: int = MAX_CELLS) -> Dict[str, Any]:
+    """
+    Construit la table d'un modèle déployé et l'écrit dans son dossier de version
+
+    Returns:
+        Métadonnées de la table (fichier, taille, durée), ou la raison de l'absence
+    """
+    debut = time.perf_counter()
+    try:
+        table = CatBoostLookupTable.construire(model, categories, max_cells)
+    except ValueError as e:
+        logger.warning(f"Table CatBoost non construite : {e}")
+        return {"file": None, "reason": str(e)}
+
+    path = Path(version_dir) / LOOKUP_FILENAME
+    table.sauvegarder(path)
+    info = {
+        "file": LOOKUP_FILENAME,
+        **table.stats(),
+        "file_size_bytes": path.stat().st_size,
+        "build_s": round(time.perf_counter() - debut, 2),
+    }
+    logger.info(f"Table CatBoost construite : {info['cells']:,} cellules en {info['build_s']}s")
+    return info
@@ -5,14 +5,61 @@ Modèle CatBoost pour la prédiction sur données tabulaires
 #je vais commenter correctement
 
 import logging 
+import mmap
 import joblib
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Optional, Union, List, Sequence
 from config import config
+from api.models.catboost_lookup import CatBoostLookupTable, LOOKUP_FILENAME
+
+try:
+    from catboost import CatBoost, CatBoostClassifier, Pool
+except ImportError:  # Modèle pickle d'un autre type (pipeline sklearn)
+    CatBoost = None
+    CatBoostClassifier = None
+    Pool = None
 
 logger = logging.getLogger(__name__)
 
+# Mapping des champs de l'API vers les colonnes de l'entraînement (avec valeur par défaut)
+API_TO_MODEL_COLUMNS = {
+    "race_champignon": ("champignon", ""),
+    "type_substrat": ("substrat", ""),
+    "jours_inoculation": ("Jour_inoculation", 0),
+    "hygrometrie": ("hygrometrie", 0.0),  # Minuscule pour correspondre au modèle
+    "co2_ppm": ("co2", 0.0),
+}
+FEATURE_COLUMNS = [model_column for model_column, _ in API_TO_MODEL_COLUMNS.values()]
+CATEGORICAL_COLUMNS = {"champignon", "substrat"}
+
+# Format binaire natif CatBoost, déployé à côté du .joblib (même nom, extension .cbm)
+NATIVE_SUFFIX = ".cbm"
+
+
+def chemin_natif(model_path: Union[str, Path]) -> Path:
+    """Chemin du .cbm associé à un modèle (les liens 'current' sont suivis)"""
+    return Path(model_path).resolve().with_suffix(NATIVE_SUFFIX)
+
+
+def charger_cbm(path: Union[str, Path]):
+    """
+    Charge un modèle CatBoost natif (.cbm) depuis un mmap du fichier
+    
+    Le fichier n'est pas lu dans un objet Python : CatBoost désérialise
+    directement depuis les pages mappées vers sa mémoire native.
+    """
+    model = CatBoostClassifier()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        try:
+            model.load_model(blob=mapped)
+        except TypeError:
+            # Version de CatBoost qui n'accepte que des bytes : lecture par son propre lecteur
+            model.load_model(str(path), format="cbm")
+    return model
+
+
 class CatBoostModel:
     """
     Classe pour charger et utiliser le modèle CatBoost entraîné.
@@ -22,7 +69,10 @@ class CatBoostModel:
       
         self.model_path = model_path
         self.model = None
+        self.model_format = None  # "cbm" (natif) ou "joblib"
+        self.lookup = None  # Table de décision précalculée (catboost_lookup.npz), si déployée
         self._loaded = False
+        self.version_info = None  # Version résolue au chargement par le service de prédiction
         
         # Charger automatiquement si un chemin est fourni
         if model_path:
@@ -42,8 +92,22 @@ class CatBoostModel:
                 logger.error(f"Fichier modèle CatBoost non trouvé : {model_path}")
                 return False
             
-            logger.info(f"Chargement du modèle CatBoost : {model_path}")
-            self.model = joblib.load(model_path)
+            # Préférer le format natif .cbm s'il a été déployé à côté du .joblib
+            native_path = chemin_natif(model_path)
+            if config.CATBOOST_PREFER_CBM and CatBoostClassifier is not None and native_path.exists():
+                try:
+                    logger.info(f"Chargement du modèle CatBoost natif : {native_path}")
+                    self.model = charger_cbm(native_path)
+                    self.model_format = "cbm"
+                except Exception as e:
+                    logger.warning(f"⚠️ Modèle natif illisible ({e}), repli sur {model_path.name}")
+                    self.model = None
+            
+            if self.model is None:
+                logger.info(f"Chargement du modèle CatBoost : {model_path}")
+                self.model = joblib.load(model_path)
+                self.model_format = "joblib"
+            self.lookup = self._charger_table(model_path)
             self._loaded = True
             
             logger.info("✅ Modèle CatBoost chargé avec succès")
@@ -55,13 +119,31 @@ class CatBoostModel:
             self._loaded = False
             return False
     
+    def _charger_table(self, model_path: Path) -> Optional[CatBoostLookupTable]:
+        """Table de décision du dossier de version, si elle existe et correspond au modèle"""
+        lookup_path = model_path.resolve().parent / LOOKUP_FILENAME
+        if not config.CATBOOST_LOOKUP_ENABLED or not lookup_path.exists():
+            return None
+        try:
+            table = CatBoostLookupTable.charger(lookup_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Table CatBoost illisible ({e}), prédictions par le modèle")
+            return None
+        
+        feature_names = list(getattr(self.model, "feature_names_", None) or FEATURE_COLUMNS)
+        if table.feature_names != feature_names:
+            logger.warning(f"⚠️ Table CatBoost pour {table.feature_names}, modèle sur {feature_names} : ignorée")
+            return None
+        logger.info(f"✅ Table CatBoost chargée : {table.stats()['cells']:,} cellules")
+        return table
+    
     def est_charge(self) -> bool:     
         return self._loaded and self.model is not None
     
     def predict(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
     
-        logger.info("=== DÉBUT PRÉDICTION CATBOOST ===")
-        logger.info(f"Données d'entrée reçues: {input_data}")
+        logger.debug("=== DÉBUT PRÉDICTION CATBOOST ===")
+        logger.debug("Données d'entrée reçues: %s", input_data)
         
         if not self.est_charge():
             logger.error("❌ Modèle CatBoost non chargé")
@@ -74,43 +156,12 @@ class CatBoostModel:
             }
         
         try:
-            # Préparer les données d'entrée
-            logger.info("Préparation des données d'entrée...")
-            df_input = self._preparer_donnees_entree(input_data)
-            logger.info(f"DataFrame préparé: {df_input}")
-            logger.info(f"Colonnes du DataFrame: {df_input.columns.tolist()}")
-            logger.info(f"Types des données: {df_input.dtypes.to_dict()}")
-            
-            # Prédiction et confiance
-            logger.info("Exécution de la prédiction...")
-            prediction = self.model.predict(df_input)[0]
-            logger.info(f"Prédiction brute: {prediction}")
+            # Même chemin que le lot : une seule passe sur les arbres
+            result = self.predict_many([input_data])[0]
             
-            probabilities = self.model.predict_proba(df_input)[0]
-            logger.info(f"Probabilités brutes: {probabilities}")
-            
-            # Calculer la confiance 
-            confidence = float(max(probabilities))
-            logger.info(f"Confiance calculée: {confidence}")
-            
-            # Déterminer le niveau de risque basé sur la prédiction
-            # Version pour les test qui laisse presque tout passer 
-            # si la probabilité de la classe 1 ("à analyser") > 0.10, c'est un risque élevé
-            valeur_de_risque = config.valeur_min_catboost
-            probability_class_1 = float(probabilities[1]) if len(probabilities) > 1 else float(probabilities[0])
-            risk_level = "high" if probability_class_1 > valeur_de_risque else "low"
-            logger.info(f"Niveau de risque: {risk_level} (seuil: 0.10, prob_classe_1: {probability_class_1:.3f})")
-            
-            result = {
-                "prediction": int(prediction),
-                "probability": probabilities.tolist(),
-                "confidence": confidence,
-                "risk_level": risk_level,
-                "prediction_label": "à analyser" if prediction == 1 else "inutilisable"
-            }
-            
-            logger.info(f"✅ Prédiction CatBoost : {result['prediction_label']} (confiance: {confidence:.3f})")
-            logger.info("=== FIN PRÉDICTION CATBOOST ===")
+            logger.debug("✅ Prédiction CatBoost : %s (confiance: %.3f, risque: %s)",
+                         result['prediction_label'], result['confidence'], result['risk_level'])
+            logger.debug("=== FIN PRÉDICTION CATBOOST ===")
             return result
             
         except Exception as e:
@@ -129,26 +180,158 @@ class CatBoostModel:
                 "error": str(e)
             }
     
-    def _preparer_donnees_entree(self, input_data: Dict[str, Any]) -> pd.DataFrame:
+    def predict_many(self, data: Union[List[Dict[str, Any]], Dict[str, Sequence]]) -> List[Dict[str, Any]]:
+        """
+        Prédiction sur plusieurs lignes en un seul appel au modèle.
+        
+        Args:
+            data: Liste de données d'entrée (même format que predict) ou
+                colonnes {champ_api: tableau} (ex: {"race_champignon": [...], ...})
+            
+        Returns:
+            Liste de résultats, dans le même ordre que les lignes
+        """
+        if not self.est_charge():
+            logger.error("❌ Modèle CatBoost non chargé")
+            n_rows = len(data) if isinstance(data, list) else len(next(iter(data.values()), []))
+            return [{
+                "prediction": 0,
+                "probability": 0.0,
+                "confidence": 0.0,
+                "risk_level": "low",
+                "error": "Modèle non chargé"
+            } for _ in range(n_rows)]
+        
+        arrays = self.predict_many_arrays(data)
+        if not len(arrays["prediction"]):
+            return []
+        
+        # Conversion en types Python natifs une seule fois pour tout le lot
+        predictions = arrays["prediction"].tolist()
+        probabilities = arrays["probability"].tolist()
+        confidences = arrays["confidence"].tolist()
+        risk_levels = arrays["risk_level"].tolist()
+        
+        return [
+            {
+                "prediction": int(prediction),
+                "probability": row_probabilities,
+                "confidence": confidence,
+                "risk_level": risk_level,
+                "prediction_label": "à analyser" if prediction == 1 else "inutilisable"
+            }
+            for prediction, row_probabilities, confidence, risk_level
+            in zip(predictions, probabilities, confidences, risk_levels)
+        ]
+    
+    def predict_many_arrays(self, data: Union[List[Dict[str, Any]], Dict[str, Sequence]]) -> Dict[str, np.ndarray]:
         """
-        Prépare les données d'entrée pour la prédiction.
+        Scoring vectorisé : probabilités calculées une seule fois, classe et
+        niveau de risque dérivés des probabilités.
         
         Args:
-            input_data: Données d'entrée brutes
+            data: Lignes (liste de dicts) ou colonnes {champ_api: tableau}
             
         Returns:
-            DataFrame formaté pour le modèle
+            Dict de tableaux numpy: prediction, probability (n, n_classes),
+            confidence, risk_level
         """
-        # Mapping des noms de colonnes selon l'entraînement
-        data = {
-            "champignon": input_data.get("race_champignon", ""),
-            "substrat": input_data.get("type_substrat", ""),
-            "Jour_inoculation": input_data.get("jours_inoculation", 0),
-            "hygrometrie": input_data.get("hygrometrie", 0.0),  # Minuscule pour correspondre au modèle
-            "co2": input_data.get("co2_ppm", 0.0)
+        columns = self._colonnes_entree(data)
+        n_rows = len(columns[FEATURE_COLUMNS[0]])
+        if n_rows == 0:
+            return {
+                "prediction": np.empty(0, dtype=np.int64),
+                "probability": np.empty((0, 2)),
+                "confidence": np.empty(0),
+                "risk_level": np.empty(0, dtype=object)
+            }
+        
+        if self.lookup is not None:
+            probabilities = self._probabilites_table(columns, n_rows)
+        else:
+            probabilities = np.asarray(self.model.predict_proba(self._preparer_pool(columns)), dtype=np.float64)
+        if probabilities.ndim == 1:
+            probabilities = probabilities.reshape(-1, 1)
+        
+        # Classe = argmax des probabilités (évite une deuxième traversée des arbres avec predict)
+        classes = np.asarray(getattr(self.model, "classes_", np.arange(probabilities.shape[1])))
+        predictions = classes[np.argmax(probabilities, axis=1)]
+        
+        # Niveau de risque : probabilité de la classe 1 ("à analyser") au-dessus du seuil
+        probability_class_1 = probabilities[:, 1] if probabilities.shape[1] > 1 else probabilities[:, 0]
+        risk_levels = np.where(probability_class_1 > config.valeur_min_catboost, "high", "low").astype(object)
+        
+        return {
+            "prediction": predictions,
+            "probability": probabilities,
+            "confidence": probabilities.max(axis=1),
+            "risk_level": risk_levels
         }
+    
+    def _probabilites_table(self, columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+        """
+        Probabilités lues dans la table précalculée ; seules les lignes hors
+        grille (catégorie inconnue, valeur non finie) passent par le modèle
+        """
+        trouvees, sur_grille = self.lookup.chercher(columns)
+        if sur_grille.all():
+            return trouvees
+        
+        probabilities = np.empty((n_rows, self.lookup.n_classes), dtype=np.float64)
+        probabilities[sur_grille] = trouvees
+        hors_grille = ~sur_grille
+        logger.debug("Table CatBoost : %s ligne(s) hors grille évaluées par le modèle", int(hors_grille.sum()))
+        probabilities[hors_grille] = self.model.predict_proba(
+            self._preparer_pool({name: values[hors_grille] for name, values in columns.items()})
+        )
+        return probabilities
+    
+    def _colonnes_entree(self, data: Union[List[Dict[str, Any]], Dict[str, Sequence]]) -> Dict[str, np.ndarray]:
+        """
+        Convertit les lignes ou colonnes de l'API en colonnes du modèle.
+        
+        Returns:
+            Dict {nom_colonne_modele: tableau numpy}
+        """
+        if isinstance(data, dict):
+            n_rows = len(next(iter(data.values()), []))
+            source = {
+                api_field: data.get(api_field, [default] * n_rows)
+                for api_field, (_, default) in API_TO_MODEL_COLUMNS.items()
+            }
+        else:
+            source = {
+                api_field: [row.get(api_field, default) for row in data]
+                for api_field, (_, default) in API_TO_MODEL_COLUMNS.items()
+            }
+        
+        columns = {}
+        for api_field, (model_column, _) in API_TO_MODEL_COLUMNS.items():
+            if model_column in CATEGORICAL_COLUMNS:
+                columns[model_column] = np.asarray(source[api_field], dtype=object).astype(str)
+            else:
+                columns[model_column] = np.asarray(source[api_field], dtype=np.float64)
+        return columns
+    
+    def _preparer_pool(self, columns: Dict[str, np.ndarray]):
+        """
+        Construit l'entrée du modèle pour un lot de colonnes.
+        
+        Un seul Pool CatBoost pour tout le lot. Si le modèle chargé n'est pas
+        un modèle CatBoost natif (ex: pipeline sklearn), on retombe sur un
+        DataFrame unique.
+        """
+        feature_names = list(getattr(self.model, "feature_names_", None) or FEATURE_COLUMNS)
+        
+        if Pool is not None and CatBoost is not None and isinstance(self.model, CatBoost):
+            n_rows = len(columns[FEATURE_COLUMNS[0]])
+            matrix = np.empty((n_rows, len(feature_names)), dtype=object)
+            for j, name in enumerate(feature_names):
+                matrix[:, j] = columns[name]
+            cat_features = [j for j, name in enumerate(feature_names) if name in CATEGORICAL_COLUMNS]
+            return Pool(data=matrix, cat_features=cat_features, feature_names=feature_names)
         
-        return pd.DataFrame([data])
+        return pd.DataFrame({name: columns[name] for name in feature_names})
     
     def obtenir_infos_modele(self) -> Dict[str, Any]:
         """
@@ -165,7 +348,9 @@ class CatBoostModel:
                 "loaded": True,
                 "model_type": str(type(self.model).__name__),
                 "model_path": str(self.model_path),
-                "features": ["champignon", "substrat", "Jour_inoculation", "hygrometrie", "co2"]  # Noms exacts du modèle
+                "model_format": self.model_format,
+                "lookup_table": self.lookup.stats() if self.lookup is not None else None,
+                "features": FEATURE_COLUMNS  # Noms exacts du modèle
             }
             
             # Ajouter des infos spécifiques CatBoost si disponibles
@@ -0,0 +1,180 @@
+"""
+Registre des modèles chargés, partagé par tout le processus
+
+Chaque version de modèle (identifiée par son chemin résolu) n'est chargée
+qu'une seule fois, puis réutilisée par le service de prédiction et par les
+endpoints heatmap. Le registre garde aussi des statistiques de chargement
+(nombre de chargements, durée, mémoire résidente).
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from api.config import config
+from api.models.catboost_model import CatBoostModel
+from api.models.vision_model import VisionModel
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_mb() -> Optional[float]:
+    """Mémoire résidente du processus en MB (None si non mesurable)"""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    try:
+        # Linux : /proc/self/statm donne la RSS en pages
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cle_chemin(model_path: Any) -> str:
+    """Identifiant d'une version : le chemin résolu (les symlinks 'current' sont suivis)"""
+    return str(Path(model_path).resolve())
+
+
+class ModelRegistry:
+    """Cache process-wide des modèles chargés, une instance par version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def _verrou_chargement(self, key: Tuple[str, str]) -> threading.Lock:
+        """Verrou par version : deux requêtes simultanées ne chargent pas deux fois"""
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _obtenir(self, key: Tuple[str, str], factory: Callable[[], Any],
+                 charger: Callable[[Any], bool], forcer: bool) -> Any:
+        """Retourne l'instance chargée pour cette clé, en la chargeant si besoin"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not forcer:
+                entry["hits"] += 1
+                return entry["model"]
+
+        with self._verrou_chargement(key):
+            # Un autre thread a peut-être chargé pendant l'attente du verrou
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and not forcer:
+                    entry["hits"] += 1
+                    return entry["model"]
+
+            model = factory()
+            rss_before = _rss_mb()
+            started_at = time.perf_counter()
+            success = charger(model)
+            load_time = time.perf_counter() - started_at
+            rss_after = _rss_mb()
+
+            if not success:
+                # Pas de mise en cache d'un modèle non chargé, on réessaiera
+                logger.error(f"Échec du chargement du modèle {key[0]}: {key[1]}")
+                return model
+
+            with self._lock:
+                previous = self._entries.get(key, {})
+                self._entries[key] = {
+                    "model": model,
+                    "load_count": previous.get("load_count", 0) + 1,
+                    "hits": previous.get("hits", 0),
+                    "load_time_s": round(load_time, 3),
+                    "total_load_time_s": round(previous.get("total_load_time_s", 0.0) + load_time, 3),
+                    "rss_delta_mb": round(rss_after - rss_before, 1)
+                    if rss_before is not None and rss_after is not None else None,
+                    "loaded_at": time.time()
+                }
+
+            logger.info(f"📦 Modèle {key[0]} chargé en {load_time:.2f}s: {key[1]}")
+            return model
+
+    def obtenir_modele_vision(self, model_path: Optional[str] = None, forcer: bool = False) -> VisionModel:
+        """
+        Retourne le modèle de vision chargé pour ce chemin (une instance par version)
+
+        Args:
+            model_path: Chemin du modèle (None = auto-détection de VisionModel)
+            forcer: Recharger depuis le disque même si la version est en cache
+        """
+        candidate = VisionModel(model_path)
+        key = ("vision", _cle_chemin(candidate.model_path))
+        return self._obtenir(key, lambda: candidate, lambda m: m.charger_modele(), forcer)
+
+    def obtenir_modele_catboost(self, model_path: Optional[str] = None, forcer: bool = False) -> CatBoostModel:
+        """
+        Retourne le modèle CatBoost chargé pour ce chemin (une instance par version)
+
+        Args:
+            model_path: Chemin du modèle (None = Config.CATBOOST_MODEL_PATH)
+            forcer: Recharger depuis le disque même si la version est en cache
+        """
+        path = model_path or str(config.CATBOOST_MODEL_PATH)
+        key = ("catboost", _cle_chemin(path))
+
+        def factory():
+            # Pas de chemin au constructeur pour que le chargement soit mesuré ici
+            model = CatBoostModel()
+            model.model_path = path
+            return model
+
+        return self._obtenir(key, factory, lambda m: m.charger_modele(), forcer)
+
+    def est_charge(self, kind: str, model_path: Any) -> bool:
+        """
+        Vrai si le modèle de ce chemin est déjà chargé (sans jamais le charger)
+
+        Args:
+            kind: "vision" ou "catboost"
+            model_path: Chemin du modèle
+        """
+        with self._lock:
+            return (kind, _cle_chemin(model_path)) in self._entries
+
+    def liberer(self, model: Any) -> bool:
+        """
+        Retire une instance du registre (ancienne version après rechargement)
+
+        Returns:
+            bool: True si l'instance était enregistrée
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["model"] is model:
+                    del self._entries[key]
+                    logger.info(f"🗑️ Modèle {key[0]} libéré: {key[1]}")
+                    return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques par modèle chargé"""
+        with self._lock:
+            models = [
+                {
+                    "kind": kind,
+                    "path": path,
+                    **{name: value for name, value in entry.items() if name != "model"}
+                }
+                for (kind, path), entry in self._entries.items()
+            ]
+        rss = _rss_mb()
+        return {
+            "process_rss_mb": round(rss, 1) if rss is not None else None,
+            "models": models
+        }
+
+
+# Instance globale partagée par le service de prédiction et les routes heatmap
+model_registry = ModelRegistry()
@@ -3,14 +3,44 @@ Gestionnaire de versions pour les modèles ML/DL
 Gère le versioning, les métadonnées et les déploiements
 """
 import json
+import os
 import shutil
 import logging
+import statistics
+import subprocess
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Nom du modèle CatBoost natif, écrit à côté du .joblib
+CATBOOST_NATIVE_FILENAME = "model_catboost_best.cbm"
+
+# Mesure du chargement d'un artefact CatBoost dans un processus neuf
+# (durée et RSS non faussées par les modèles déjà chargés)
+SCRIPT_MESURE_CHARGEMENT = """
+import json, mmap, sys, time
+import joblib, psutil
+from catboost import CatBoostClassifier
+chemin = sys.argv[1]
+process = psutil.Process()
+rss_avant = process.memory_info().rss
+debut = time.perf_counter()
+if chemin.endswith('.cbm'):
+    modele = CatBoostClassifier()
+    with open(chemin, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        try:
+            modele.load_model(blob=mapped)
+        except TypeError:
+            modele.load_model(chemin, format='cbm')
+else:
+    modele = joblib.load(chemin)
+duree = time.perf_counter() - debut
+print(json.dumps({"load_s": duree, "rss_mb": (process.memory_info().rss - rss_avant) / (1024 * 1024)}))
+"""
+
 class ModelVersionManager:
     """Gestionnaire de versions pour les modèles"""
     
@@ -124,6 +154,10 @@ class ModelVersionManager:
             version_info["deployed_path"] = str(dest_model_path)
             version_info["model_format"] = "SavedModel" if filename == "saved_model" else "Keras" if filename.endswith(".keras") else "Joblib"
             
+            # Format natif CatBoost (.cbm), chargé en priorité par l'API
+            if model_type == "ml":
+                version_info.update(self._exporter_catboost_natif(dest_model_path))
+            
             # Sauvegarder les métadonnées
             metadata_path = version_dir / "metadata.json"
             with open(metadata_path, 'w', encoding='utf-8') as f:
@@ -156,6 +190,103 @@ class ModelVersionManager:
                 "error": str(e)
             }
     
+    def _exporter_catboost_natif(self, joblib_path: Path) -> Dict:
+        """
+        Écrit le modèle CatBoost au format natif .cbm à côté du .joblib et
+        compare le chargement des deux artefacts
+        
+        Returns:
+            Métadonnées à ajouter à la version (vide si l'export est impossible)
+        """
+        try:
+            import joblib
+            from catboost import CatBoost
+        except ImportError:
+            logger.warning("CatBoost non installé : pas d'export .cbm")
+            return {}
+        
+        try:
+            model = joblib.load(joblib_path)
+            if not isinstance(model, CatBoost):
+                # Pipeline sklearn : le .cbm seul ne reproduirait pas les prétraitements
+                logger.warning(f"Modèle {type(model).__name__} non natif CatBoost : pas d'export .cbm")
+                return {"native_model_file": None}
+            
+            native_path = joblib_path.with_name(CATBOOST_NATIVE_FILENAME)
+            model.save_model(str(native_path), format="cbm")
+            native_size = native_path.stat().st_size
+            logger.info(f"Modèle CatBoost natif exporté : {native_path.name} ({native_size} octets)")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'export .cbm : {e}")
+            return {"native_model_file": None}
+        
+        info = {
+            "native_model_file": native_path.name,
+            "native_model_size_bytes": native_size,
+            "lookup_table": self._construire_table_catboost(model, joblib_path.parent),
+        }
+        benchmark = {
+            "joblib": self._mesurer_chargement(joblib_path),
+            "cbm": self._mesurer_chargement(native_path),
+        }
+        if benchmark["joblib"] and benchmark["cbm"]:
+            benchmark["speedup"] = round(benchmark["joblib"]["load_s"] / max(benchmark["cbm"]["load_s"], 1e-9), 1)
+            logger.info(f"Chargement joblib {benchmark['joblib']['load_s']:.3f}s / {benchmark['joblib']['rss_mb']:.1f} MB, "
+                        f"cbm {benchmark['cbm']['load_s']:.3f}s / {benchmark['cbm']['rss_mb']:.1f} MB")
+        info["load_benchmark"] = benchmark
+        return info
+    
+    def _construire_table_catboost(self, model, version_dir: Path) -> Dict:
+        """
+        Table de décision précalculée sur la grille catégories x bordures du modèle
+        
+        Returns:
+            Métadonnées de la table, ou la raison de son absence
+        """
+        from api.models.catboost_lookup import construire_et_sauvegarder
+        
+        # Valeurs catégorielles proposées par l'interface (jsons/ à la racine du projet)
+        jsons_dir = self.base_dir.parent.parent / "jsons"
+        categories = {}
+        for feature, (filename, key) in {"champignon": ("champignon_types.json", "champignon_types"),
+                                         "substrat": ("substrat_types.json", "substrat_types")}.items():
+            try:
+                with open(jsons_dir / filename, 'r', encoding='utf-8') as f:
+                    categories[feature] = [item["value"] for item in json.load(f)[key]]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Catégories {filename} illisibles : {e}")
+                return {"file": None, "reason": f"{filename} illisible"}
+        
+        try:
+            return construire_et_sauvegarder(model, categories, version_dir)
+        except Exception as e:
+            logger.error(f"Erreur lors de la construction de la table CatBoost : {e}")
+            return {"file": None, "reason": str(e)}
+    
+    def _mesurer_chargement(self, model_path: Path, repetitions: int = 3) -> Optional[Dict]:
+        """
+        Durée de chargement et RSS ajoutée (médianes), chaque essai dans un processus neuf
+        
+        Returns:
+            {"load_s", "rss_mb"} ou None si la mesure échoue
+        """
+        mesures = []
+        for _ in range(repetitions):
+            try:
+                resultat = subprocess.run(
+                    [sys.executable, "-c", SCRIPT_MESURE_CHARGEMENT, str(model_path)],
+                    capture_output=True, text=True, timeout=300, check=True
+                )
+                mesures.append(json.loads(resultat.stdout.strip().splitlines()[-1]))
+            except (subprocess.SubprocessError, ValueError, IndexError) as e:
+                logger.warning(f"Mesure du chargement impossible pour {model_path.name} : {e}")
+                return None
+        return {
+            "load_s": round(statistics.median(m["load_s"] for m in mesures), 4),
+            "rss_mb": round(statistics.median(m["rss_mb"] for m in mesures), 2),
+            "runs": repetitions,
+        }
+    
     def _mettre_a_jour_historique_deploiement(self, model_type: str, version_info: Dict):
         """Met à jour l'historique des déploiements"""
         if model_type == "ml":
@@ -293,6 +424,24 @@ class ModelVersionManager:
         
         return None
     
+    def signature_liens_actuels(self) -> Tuple:
+        """
+        Empreinte des liens 'current' : (cible, inode, mtime) de chaque lien
+        
+        Change à chaque déploiement ou rollback, ce qui permet de ne recalculer
+        les versions que lorsque c'est nécessaire (un stat par lien, pas de lecture).
+        """
+        signature = []
+        for current_link in (self.ml_model_dir / "current",
+                             self.dl_model_dir / "current",
+                             self.dl_model_dir / "versions" / "current"):
+            try:
+                target_stat = os.stat(current_link)
+                signature.append((os.readlink(current_link), target_stat.st_ino, target_stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
     def obtenir_version_actuelle(self, model_type: str) -> Optional[str]:
         """
         Récupère la version actuellement déployée
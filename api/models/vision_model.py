@@ -1,10 +1,112 @@
 import tensorflow as tf
 import numpy as np
-from PIL import Image
 import logging
 import json
+import os
+import threading
 from pathlib import Path
-from typing import Tuple, Dict, Any, Union
+from typing import Tuple, Dict, Any, Union, List, NamedTuple
+
+from api.config import config
+from api.metrics import mesurer_etape
+from api.logging_config import detail_actif
+
+try:
+    from ai_edge_litert.interpreter import Interpreter as TFLiteInterpreter
+except ImportError:  # LiteRT absent : interpréteur embarqué dans TensorFlow
+    TFLiteInterpreter = tf.lite.Interpreter
+
+# Noms des sorties SSD dans la signature serving_default
+SSD_OUTPUTS = ("detection_boxes", "detection_classes", "detection_scores", "num_detections")
+
+# Classes SSD et seuils de score du post-traitement
+CLASSE_SAIN = 1
+CLASSE_CONTAMINE = 2
+SEUIL_DETECTION = 0.08               # Détection retenue dans la réponse
+SEUIL_CONTAMINATION_FAIBLE = 0.1     # Traces de contamination parmi des détections saines
+SEUIL_DETECTION_FAIBLE = 0.15        # Sans détection valide : détections faibles
+SEUIL_DETECTION_TRES_FAIBLE = 0.05   # Sans détection valide : traces très faibles
+
+
+class Regle(NamedTuple):
+    """
+    Palier d'une table de décision, appliqué à partir de `seuil` (inclus)
+    
+    confiance = min(valeur * facteur + constante, plafond)
+    probabilité de contamination = min(valeur * proba_facteur + proba_constante, proba_plafond)
+    """
+    seuil: float
+    prediction: str
+    facteur: float
+    constante: float = 0.0
+    plafond: float = np.inf
+    proba_facteur: float = 0.0
+    proba_constante: float = 0.0
+    proba_plafond: float = np.inf
+
+
+# Tables de décision, paliers du seuil le plus haut au plus bas (le dernier couvre tout le reste)
+
+# Paliers sur le meilleur score contaminé
+REGLES_CONTAMINE = (
+    Regle(0.30, "contamine", 1.3),
+    Regle(0.20, "contamine", 1.5),
+    Regle(0.15, "incertain", 1.2),
+    Regle(-np.inf, "sain", 0.0, 0.6),
+)
+
+# Paliers sur le meilleur score sain
+REGLES_SAIN = (
+    Regle(0.7, "sain", 1.1),
+    Regle(0.3, "sain", 2.0),
+    Regle(0.15, "sain", 3.0),
+    Regle(-np.inf, "sain", 4.0),
+)
+
+# Seulement des détections contaminées : valeur = meilleur score contaminé
+REGLES_CONTAMINATION_SEULE = tuple(
+    regle._replace(plafond=0.85, proba_facteur=1.8, proba_plafond=0.90) for regle in REGLES_CONTAMINE
+)
+
+# Seulement des détections saines : valeur = meilleur score sain, probabilité = 1 - score
+REGLES_SAIN_SEUL = tuple(
+    regle._replace(plafond=0.85 if regle.seuil >= 0.7 else 0.75, proba_facteur=-1.0, proba_constante=1.0)
+    for regle in REGLES_SAIN
+)
+
+# Cas mixte : valeur = meilleur score contaminé ; le dernier palier départage
+# avec le meilleur score sain (REGLES_MIXTE_SAIN), sinon MIXTE_INCERTAIN
+REGLES_MIXTE = (
+    Regle(0.25, "contamine", 1.5, plafond=0.90, proba_facteur=1.3, proba_plafond=0.95),
+    Regle(0.15, "incertain", 1.2, proba_facteur=1.5),
+    Regle(-np.inf, None, 0.0),
+)
+REGLES_MIXTE_SAIN = (
+    Regle(0.2, "sain", 1.5, plafond=0.75),
+    Regle(-np.inf, "sain", 2.5, plafond=0.75),
+)
+MIXTE_INCERTAIN = (0.3, 0.4)  # (confiance, probabilité de contamination)
+
+
+def appliquer_regles(regles: Tuple[Regle, ...], valeurs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Applique une table de décision à un tableau de valeurs (une par image)
+    
+    Returns:
+        (index du palier retenu, confiances, probabilités de contamination)
+    """
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    seuils = np.array([regle.seuil for regle in regles])
+    # Premier palier atteint (seuils décroissants, le dernier vaut -inf)
+    index = np.argmax(valeurs[:, np.newaxis] >= seuils[np.newaxis, :], axis=1)
+    
+    def colonne(champ):
+        return np.array([getattr(regle, champ) for regle in regles], dtype=np.float64)[index]
+    
+    confiances = np.minimum(valeurs * colonne("facteur") + colonne("constante"), colonne("plafond"))
+    probabilites = np.minimum(valeurs * colonne("proba_facteur") + colonne("proba_constante"),
+                              colonne("proba_plafond"))
+    return index, confiances, probabilites
 
 # Logger pour suivre ce qui se passe
 logger = logging.getLogger(__name__)
@@ -13,9 +115,11 @@ class VisionModel:
     """
     Mon wrapper pour le modèle de vision.
     
-    Supporte maintenant deux types de modèles :
+    Supporte maintenant trois types de modèles :
     - EfficientNetB0 (ancien format Keras) pour la classification
     - SSD MobileNet V2 (nouveau format SavedModel) pour la détection d'objets
+    - SSD MobileNet V2 converti en TFLite (FP16 ou INT8, voir convert_tflite.py),
+      plus rapide et plus léger sur CPU grâce à XNNPACK
     
     Le modèle SSD détecte et classifie les champignons (sains/contaminés)
     avec des performances exceptionnelles !
@@ -29,8 +133,10 @@ class VisionModel:
             model_path: Chemin vers le modèle sauvegardé (optionnel)
         """
         self.model = None
-        self.model_type = None  # 'keras' ou 'savedmodel'
+        self.model_type = None  # 'keras', 'savedmodel' ou 'tflite'
         self.metadata = None
+        self.supports_batching = False  # True si la signature accepte un batch > 1
+        self.version_info = None  # Version résolue au chargement par le service de prédiction
         
         if model_path:
             # Chemin spécifique fourni
@@ -56,6 +162,15 @@ class VisionModel:
         self.class_names = ["contamine", "sain"]
         self.input_size = (640, 640)
         
+        # Backend TFLite : un interpréteur par thread (un interpréteur n'est pas thread-safe)
+        self._tflite_content = None
+        self._tflite_local = threading.local()
+        self._tflite_signature = False
+        self.tflite_variant = None
+        
+        # Buffers d'entrée réutilisés, un par thread d'inférence
+        self._buffers = threading.local()
+        
     def _find_latest_version(self, versions_path: Path) -> Path:
         """Trouve la version la plus récente dans le dossier versions"""
         
@@ -124,7 +239,10 @@ class VisionModel:
                 logger.info(f"Lien symbolique resolu vers: {model_path}")
             
             # Detecter le type de modele et charger
-            if self._is_savedmodel_format(model_path):
+            tflite_file = self._find_tflite_file(model_path)
+            if tflite_file is not None:
+                return self._load_tflite(tflite_file)
+            elif self._is_savedmodel_format(model_path):
                 return self._load_savedmodel(model_path)
             else:
                 return self._load_keras_model(model_path)
@@ -185,6 +303,13 @@ class VisionModel:
                 for name, spec in serving_fn.structured_input_signature[1].items():
                     logger.info(f"  Input {name}: {spec.shape} ({spec.dtype})")
                 
+                # Dimension batch libre (None) => on peut regrouper plusieurs images par appel
+                input_spec = serving_fn.structured_input_signature[1].get('input_tensor')
+                self.supports_batching = bool(
+                    input_spec is not None and input_spec.shape.rank and input_spec.shape[0] is None
+                )
+                logger.info(f"  Batching supporte: {self.supports_batching}")
+                
                 for name, spec in serving_fn.structured_outputs.items():
                     logger.info(f"  Output {name}: {spec.shape}")
             
@@ -195,6 +320,79 @@ class VisionModel:
             logger.error(f"❌ Erreur lors du chargement du SavedModel: {e}")
             return False
     
+    def _find_tflite_file(self, model_path: Path):
+        """
+        Fichier .tflite à utiliser, ou None pour le SavedModel / Keras
+        
+        Un chemin .tflite explicite est toujours utilisé ; sinon, avec
+        VISION_BACKEND=tflite, on cherche model_<variante>.tflite dans le dossier
+        de version (à côté de saved_model/).
+        """
+        if model_path.is_file() and model_path.suffix == ".tflite":
+            return model_path
+        if config.VISION_BACKEND != "tflite":
+            return None
+        
+        version_dir = model_path.parent if model_path.name == "saved_model" else model_path
+        candidate = version_dir / f"model_{config.VISION_TFLITE_VARIANT}.tflite"
+        if candidate.exists():
+            return candidate
+        logger.warning(f"VISION_BACKEND=tflite mais {candidate.name} absent de {version_dir}, "
+                       f"utilisation du SavedModel (lancer convert_tflite.py)")
+        return None
+    
+    def _load_tflite(self, tflite_file: Path) -> bool:
+        """Charge un SSD converti en TFLite (même contrat de sortie que le SavedModel)"""
+        try:
+            metadata_file = tflite_file.parent / "metadata.json"
+            if metadata_file.exists():
+                with open(metadata_file, 'r') as f:
+                    self.metadata = json.load(f)
+            
+            logger.info(f"Chargement du modèle TFLite depuis: {tflite_file}")
+            logger.info(f"Taille: {tflite_file.stat().st_size / 1024 / 1024:.1f} MB")
+            
+            # Contenu gardé en mémoire : chaque thread d'inférence crée son interpréteur
+            self._tflite_content = tflite_file.read_bytes()
+            self._tflite_local = threading.local()
+            interpreter = self._tflite_interpreter()
+            
+            input_detail = interpreter.get_input_details()[0]
+            _, height, width, _ = input_detail['shape']
+            self.input_size = (int(width), int(height))
+            self.class_names = ["background", "healthy", "contaminated"]
+            self.supports_batching = False  # Entrée de taille fixe (1, h, w, 3)
+            self.tflite_variant = tflite_file.stem.replace("model_", "")
+            self.model = interpreter
+            self.model_type = 'tflite'
+            
+            logger.info(f"  Input: {input_detail['shape']} ({np.dtype(input_detail['dtype']).name}), "
+                        f"signature: {self._tflite_signature}")
+            logger.info("Modèle TFLite chargé avec succès")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du chargement du modèle TFLite: {e}")
+            return False
+    
+    def _tflite_interpreter(self):
+        """Interpréteur TFLite du thread courant (créé au premier appel)"""
+        interpreter = getattr(self._tflite_local, "interpreter", None)
+        if interpreter is None:
+            # Même partage des cœurs que l'InferenceExecutor
+            cpu_count = os.cpu_count() or 1
+            workers = config.INFERENCE_WORKERS or max(1, min(4, cpu_count // 2))
+            num_threads = (config.VISION_TFLITE_THREADS or config.TF_INTRA_OP_THREADS
+                           or max(1, cpu_count // workers))
+            interpreter = TFLiteInterpreter(model_content=self._tflite_content, num_threads=num_threads)
+            interpreter.allocate_tensors()
+            self._tflite_signature = "serving_default" in interpreter.get_signature_list()
+            self._tflite_local.runner = (
+                interpreter.get_signature_runner("serving_default") if self._tflite_signature else None
+            )
+            self._tflite_local.interpreter = interpreter
+        return interpreter
+    
     def _load_keras_model(self, model_path: Path) -> bool:
         """Charge un modèle au format Keras (ancien EfficientNet)"""
         try:
@@ -242,33 +440,64 @@ class VisionModel:
         total_size = sum(f.stat().st_size for f in dir_path.rglob('*') if f.is_file())
         return total_size / 1024 / 1024
     
-    def preprocess_image(self, image_path: str) -> Union[np.ndarray, tf.Tensor]:
+    def _load_image_array(self, image: Any, out: np.ndarray = None) -> np.ndarray:
+        """
+        Charge et redimensionne une image en tableau uint8 (height, width, 3)
+        
+        Args:
+            image: Chemin, bytes/buffer de l'upload ou tableau RGB déjà décodé
+            out: Buffer (height, width, 3) à remplir, par ex. une ligne du batch
+        """
+        # Import local : api.utils importe le service, qui importe ce module
+        from api.utils.image_io import decoder_redimensionne
+        
+        with mesurer_etape("image_decode"):
+            return decoder_redimensionne(image, self.input_size, out)
+    
+    def preparer_image(self, image: Any) -> np.ndarray:
+        """
+        Décode une image à la taille d'entrée, dans un tableau propre à l'appelant
+        (utilisé par le micro-batcher pour décoder hors de son thread)
+        """
+        return self._load_image_array(image)
+    
+    def _input_buffer(self) -> np.ndarray:
+        """
+        Buffer d'entrée (1, height, width, 3) réutilisé par le thread courant
+        
+        Le tenseur d'entrée n'est utilisé que pendant l'appel au modèle, dans le
+        même thread : la requête suivante peut réécrire le même buffer.
+        """
+        width, height = self.input_size
+        buffer = getattr(self._buffers, "input", None)
+        if buffer is None or buffer.shape[1:3] != (height, width):
+            buffer = self._buffers.input = np.empty((1, height, width, 3), dtype=np.uint8)
+        return buffer
+    
+    def preprocess_image(self, image: Any) -> Union[np.ndarray, tf.Tensor]:
         """
         Préprocesse une image pour la prédiction selon le type de modèle
         
         Args:
-            image_path: Chemin vers l'image
+            image: Chemin vers l'image, bytes de l'upload ou tableau RGB décodé
             
         Returns:
             Image préprocessée (format dépend du type de modèle)
         """
         try:
-            # Charger l'image
-            img = Image.open(image_path)
-            img = img.convert('RGB')
-            img = img.resize(self.input_size)
-            
-            if self.model_type == 'savedmodel':
-                # Pour SSD: format uint8, pas de normalisation
-                img_array = np.array(img, dtype=np.uint8)
-                # SSD attend (1, height, width, 3)
-                img_tensor = tf.convert_to_tensor(img_array)
-                img_tensor = tf.expand_dims(img_tensor, 0)
-                return img_tensor
+            if self.model_type in ('tflite', 'savedmodel'):
+                # Pour SSD: format uint8, pas de normalisation, décodé directement
+                # dans le buffer (1, height, width, 3) attendu par le modèle
+                batch = self._input_buffer()
+                self._load_image_array(image, batch[0])
+                return batch if self.model_type == 'tflite' else tf.convert_to_tensor(batch)
                 
             else:
+                # Charger l'image
+                img_array = self._load_image_array(image)
+                
                 # Pour Keras/EfficientNet: normalisation float32
-                img_array = np.array(img, dtype=np.float32)
+                img_array = img_array.astype(np.float32)
                 img_array = img_array / 255.0  # Normalisation [0, 1]
                 # Ajouter la dimension batch
                 img_array = np.expand_dims(img_array, axis=0)
@@ -278,12 +507,12 @@ class VisionModel:
             logger.error(f"Erreur lors du préprocessing de l'image: {e}")
             raise
     
-    def predict(self, image_path: str) -> Dict[str, Any]:
+    def predict(self, image: Any) -> Dict[str, Any]:
         """
         Effectue une prédiction sur une image selon le type de modèle
         
         Args:
-            image_path: Chemin vers l'image à analyser
+            image: Chemin vers l'image, bytes de l'upload ou tableau RGB décodé
             
         Returns:
             Dict contenant la prédiction et la confiance
@@ -294,10 +523,12 @@ class VisionModel:
         
         try:
             # Préprocesser l'image
-            preprocessed_img = self.preprocess_image(image_path)
+            preprocessed_img = self.preprocess_image(image)
             
             if self.model_type == 'savedmodel':
                 return self._predict_savedmodel(preprocessed_img)
+            elif self.model_type == 'tflite':
+                return self._predict_tflite(preprocessed_img)
             else:
                 return self._predict_keras(preprocessed_img)
             
@@ -305,228 +536,342 @@ class VisionModel:
             logger.error(f"Erreur lors de la prédiction vision: {e}")
             raise
     
-    def _analyze_contamination_score(self, score: float, class_type: str) -> tuple:
-        """Analyse un score de contamination et retourne prediction et confidence"""
-        if class_type == "contaminated":
-            if score >= 0.30:
-                return "contamine", score * 1.3
-            elif score >= 0.20:
-                return "contamine", score * 1.5
-            elif score >= 0.15:
-                return "incertain", score * 1.2
-            else:
-                return "sain", 0.6
-        else:  # healthy
-            if score >= 0.7:
-                return "sain", score * 1.1
-            elif score < 0.15:
-                return "sain", score * 4.0
-            elif score < 0.3:
-                return "sain", score * 3.0
-            else:
-                return "sain", score * 2.0
-
-    def _analyze_mixed_detection(self, max_contaminated_score: float, max_healthy_score: float) -> dict:
-        """Analyse le cas mixte contamination + sain"""
-        if max_contaminated_score >= 0.25:
-            return {
-                "prediction": "contamine",
-                "confidence": min(max_contaminated_score * 1.5, 0.90),
-                "contamination_probability": min(max_contaminated_score * 1.3, 0.95)
-            }
-        elif max_contaminated_score >= 0.15:
-            logger.warning(f"Contamination possible detectee: score={max_contaminated_score:.3f}")
-            return {
-                "prediction": "incertain", 
-                "confidence": max_contaminated_score * 1.2,
-                "contamination_probability": max_contaminated_score * 1.5
-            }
-        else:
-            if max_healthy_score > max_contaminated_score:
-                confidence = max_healthy_score * (2.5 if max_healthy_score < 0.2 else 1.5)
-                return {
-                    "prediction": "sain",
-                    "confidence": min(confidence, 0.75),
-                    "contamination_probability": max_contaminated_score
-                }
+    def predict_batch(self, images: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Effectue les prédictions sur plusieurs images en un seul appel SSD
+        
+        Args:
+            images: Images à analyser (chemins, bytes ou tableaux RGB décodés)
+            
+        Returns:
+            Liste de résultats, dans le même ordre que les images
+        """
+        if self.model is None:
+            if not self.charger_modele():
+                raise RuntimeError("Impossible de charger le modèle de vision")
+        
+        if not images:
+            return []
+        
+        # Modèle sans dimension batch libre (ou Keras) : une image à la fois
+        if self.model_type != 'savedmodel' or not self.supports_batching or len(images) == 1:
+            return [self.predict(image) for image in images]
+        
+        try:
+            # Toutes les images ont la même taille après resize : décodées directement dans le batch
+            width, height = self.input_size
+            batch = np.empty((len(images), height, width, 3), dtype=np.uint8)
+            for i, image in enumerate(images):
+                self._load_image_array(image, batch[i])
+            boxes, classes, scores, num_detections = self._run_savedmodel(tf.convert_to_tensor(batch))
+            
+            # Post-traitement vectorisé sur tout le lot
+            with mesurer_etape("postprocess"):
+                return self._analyze_detections_batch(boxes, classes, scores, num_detections)
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la prédiction vision par lot: {e}")
+            raise
+    
+    def _decider_mixte(self, max_contamine: np.ndarray, max_sain: np.ndarray):
+        """Cas mixte (contamination + sain) sur tout un lot : (predictions, confiances, probabilités)"""
+        index, confidence, probability = appliquer_regles(REGLES_MIXTE, max_contamine)
+        prediction = self._predictions(REGLES_MIXTE, index)
+        for score in max_contamine[prediction == "incertain"]:
+            logger.warning(f"Contamination possible detectee: score={score:.3f}")
+        
+        # Dernier palier : contamination trop faible, on départage avec le meilleur score sain
+        departage = index == len(REGLES_MIXTE) - 1
+        sain_domine = max_sain > max_contamine
+        _, confidence_sain, _ = appliquer_regles(REGLES_MIXTE_SAIN, max_sain)
+        prediction = np.where(departage, np.where(sain_domine, "sain", "incertain"), prediction).astype(object)
+        confidence = np.where(departage, np.where(sain_domine, confidence_sain, MIXTE_INCERTAIN[0]), confidence)
+        probability = np.where(departage, np.where(sain_domine, max_contamine, MIXTE_INCERTAIN[1]), probability)
+        return prediction, confidence, probability
+    
+    def _run_savedmodel(self, batch_tensor: tf.Tensor) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Appel brut de la signature SSD sur un batch (N, height, width, 3)
+        
+        Returns:
+            (boxes, classes, scores, num_detections), chacun avec N en première dimension
+        """
+        # Obtenir la fonction d'inference
+        infer = self.model.signatures['serving_default']
+        
+        # Effectuer l'inference
+        with mesurer_etape("ssd_inference"):
+            predictions = infer(input_tensor=batch_tensor)
+            
+            return (
+                predictions['detection_boxes'].numpy(),
+                predictions['detection_classes'].numpy(),
+                predictions['detection_scores'].numpy(),
+                predictions['num_detections'].numpy()
+            )
+    
+    def _run_tflite(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Appel du SSD TFLite sur une image (1, height, width, 3)
+        
+        Returns:
+            (boxes, classes, scores, num_detections), au même format que _run_savedmodel
+        """
+        interpreter = self._tflite_interpreter()
+        input_detail = interpreter.get_input_details()[0]
+        
+        # Entrée quantifiée (INT8 complet) : mêmes pixels, ramenés à l'échelle de l'entrée
+        scale, zero_point = input_detail['quantization']
+        if input_detail['dtype'] == np.int8 and scale:
+            batch = np.clip(np.round(batch / scale + zero_point), -128, 127)
+        batch = batch.astype(input_detail['dtype'], copy=False)
+        
+        with mesurer_etape("ssd_inference"):
+            if self._tflite_signature:
+                # Conversion depuis la signature serving_default : sorties nommées
+                outputs = self._tflite_local.runner(input_tensor=batch)
+                boxes, classes, scores, num_detections = (np.asarray(outputs[name]) for name in SSD_OUTPUTS)
             else:
-                return {
-                    "prediction": "incertain",
-                    "confidence": 0.3,
-                    "contamination_probability": 0.4
-                }
-
+                # Graphe TFLite_Detection_PostProcess : classes sans le fond
+                # (0 = healthy), on remet le décalage du SavedModel
+                interpreter.set_tensor(input_detail['index'], batch)
+                interpreter.invoke()
+                boxes, classes, scores, num_detections = self._sorties_postprocess(interpreter)
+                classes = classes + 1
+        
+        return boxes, classes, scores, num_detections
+    
+    @classmethod
+    def _sorties_postprocess(cls, interpreter) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sorties du graphe TFLite_Detection_PostProcess, dans l'ordre
+        (boxes, classes, scores, count)
+        
+        L'ordre des sorties dépend du convertisseur : on les reconnaît par leur
+        nom quand il porte l'index du post-traitement (`TFLite_Detection_PostProcess:1`...),
+        sinon par leur forme (boxes en (1, N, 4), count à un seul élément),
+        classes et scores étant départagés par leurs valeurs (identifiants entiers).
+        """
+        details = interpreter.get_output_details()
+        par_index = {}
+        for detail in details:
+            nom = detail.get('name', '')
+            if nom.startswith('TFLite_Detection_PostProcess'):
+                par_index[nom.rpartition(':')[2] if ':' in nom else '0'] = detail
+        if all(index in par_index for index in '0123'):
+            return tuple(cls._tflite_output(interpreter, par_index[index]) for index in '0123')
+        
+        sorties = [cls._tflite_output(interpreter, detail) for detail in details]
+        boxes = [sortie for sortie in sorties if sortie.ndim == 3 and sortie.shape[-1] == 4]
+        counts = [sortie for sortie in sorties if sortie.size == 1]
+        autres = [sortie for sortie in sorties if sortie.ndim == 2 and sortie.size > 1]
+        if len(boxes) != 1 or len(counts) != 1 or len(autres) != 2:
+            raise ValueError(f"Sorties TFLite non reconnues: {[(d.get('name'), tuple(d['shape'])) for d in details]}")
+        
+        # Classes : valeurs entières, et au-delà de 1 dès qu'il y a plusieurs classes ;
+        # à égalité (aucune détection, tout à zéro) l'ordre n'a pas d'importance
+        def indice_classes(sortie: np.ndarray) -> Tuple[bool, float]:
+            return bool(np.all(sortie == np.round(sortie))), float(sortie.max(initial=0))
+        
+        classes, scores = sorted(autres, key=indice_classes, reverse=True)
+        return boxes[0], classes, scores, counts[0].reshape(1)
+    
+    @staticmethod
+    def _tflite_output(interpreter, detail) -> np.ndarray:
+        """Sortie TFLite déquantifiée si besoin"""
+        value = interpreter.get_tensor(detail['index'])
+        scale, zero_point = detail['quantization']
+        if scale and np.issubdtype(value.dtype, np.integer):
+            value = (value.astype(np.float32) - zero_point) * scale
+        return value
+    
+    def _predict_tflite(self, img_array: np.ndarray) -> Dict[str, Any]:
+        """Prediction avec le SSD TFLite (même contrat que _predict_savedmodel)"""
+        try:
+            boxes, classes, scores, num_detections = self._run_tflite(img_array)
+            with mesurer_etape("postprocess"):
+                return self._analyze_detections(boxes[0], classes[0], scores[0], int(num_detections[0]))
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la prediction TFLite: {e}")
+            raise
+    
     def _predict_savedmodel(self, img_tensor: tf.Tensor) -> Dict[str, Any]:
         """Prediction avec le modele SSD SavedModel"""
         try:
-            # Obtenir la fonction d'inference
-            infer = self.model.signatures['serving_default']
-            
-            # Effectuer l'inference
-            predictions = infer(input_tensor=img_tensor)
-            
-            # Extraire les resultats
-            detection_boxes = predictions['detection_boxes'].numpy()[0]
-            detection_classes = predictions['detection_classes'].numpy()[0]
-            detection_scores = predictions['detection_scores'].numpy()[0]
-            num_detections = int(predictions['num_detections'].numpy()[0])
-            
-            # Analyser les detections valides
-            valid_detections = []
-            contaminated_count = 0
-            healthy_count = 0
-            max_contaminated_score = 0.0
-            max_healthy_score = 0.0
-            
-            # Log pour debug
-            logger.info("=== ANALYSE DETAILLEE DES DETECTIONS ===")
-            for i in range(min(10, len(detection_scores))):
-                score = float(detection_scores[i])
-                class_id = int(detection_classes[i])
-                class_name = self.class_names[class_id] if class_id < len(self.class_names) else "unknown"
-                logger.info(f"  Detection {i}: classe={class_name} (id={class_id}), score={score:.4f}")
-            
-            for i in range(min(num_detections, len(detection_scores))):
-                score = float(detection_scores[i])
-                if score > 0.08:
-                    class_id = int(detection_classes[i])
-                    box = detection_boxes[i].tolist()
-                    
-                    valid_detections.append({
-                        "class_id": class_id,
-                        "class_name": self.class_names[class_id] if class_id < len(self.class_names) else "unknown",
-                        "score": score,
-                        "box": box
-                    })
-                    
-                    # Compter par type
-                    if class_id == 2:  # contaminated
-                        contaminated_count += 1
-                        max_contaminated_score = max(max_contaminated_score, score)
-                    elif class_id == 1:  # healthy
-                        healthy_count += 1
-                        max_healthy_score = max(max_healthy_score, score)
-            
-            # Determiner la prediction finale
-            if contaminated_count > 0 and healthy_count > 0:
-                # Cas mixte
-                contaminated_ratio = contaminated_count / (contaminated_count + healthy_count)
-                logger.info(f"Analyse mixte: {contaminated_count} contamine(s), {healthy_count} sain(s)")
-                logger.info(f"Ratio contamination: {contaminated_ratio:.3f}")
-                logger.info(f"Meilleur score contamine: {max_contaminated_score:.3f}")
-                logger.info(f"Meilleur score sain: {max_healthy_score:.3f}")
-                
-                result = self._analyze_mixed_detection(max_contaminated_score, max_healthy_score)
-                prediction = result["prediction"]
-                confidence = result["confidence"]
-                contamination_probability = result["contamination_probability"]
-                        
-            elif contaminated_count > 0:
-                # Seulement contamination
-                logger.info(f"Contamination pure detectee: score max {max_contaminated_score:.3f}")
-                prediction, confidence = self._analyze_contamination_score(max_contaminated_score, "contaminated")
-                confidence = min(confidence, 0.85)
-                contamination_probability = min(max_contaminated_score * 1.8, 0.90)
-                
-            elif healthy_count > 0:
-                # Seulement sain - verification supplementaire
-                if max_healthy_score < 0.7:
-                    # Chercher contamination faible
-                    low_contaminated_scores = [
-                        float(detection_scores[i]) for i in range(min(num_detections, len(detection_scores)))
-                        if int(detection_classes[i]) == 2 and float(detection_scores[i]) > 0.1
-                    ]
-                    
-                    if low_contaminated_scores:
-                        max_low_contaminated = max(low_contaminated_scores)
-                        logger.info(f"Detections contamination faibles trouvees: max={max_low_contaminated:.3f}")
-                        
-                        if healthy_count >= 3 and max_healthy_score < 0.65 and max_low_contaminated > 0.15:
-                            prediction = "incertain"
-                            confidence = max_healthy_score * 0.6
-                            contamination_probability = 0.4
-                            logger.warning("Detection ambigue: objets classes 'sains' mais scores moderes avec traces de contamination")
-                        else:
-                            prediction = "sain"
-                            confidence = max_healthy_score * 0.85
-                            contamination_probability = 1.0 - max_healthy_score
-                    else:
-                        prediction, confidence = self._analyze_contamination_score(max_healthy_score, "healthy")
-                        confidence = min(confidence, 0.75)
-                        contamination_probability = 1.0 - max_healthy_score
-                else:
-                    prediction, confidence = self._analyze_contamination_score(max_healthy_score, "healthy")
-                    confidence = min(confidence, 0.85)
-                    contamination_probability = 1.0 - max_healthy_score
-                
-            else:
-                # Aucune detection valide - analyser les faibles
-                weak_detections = []
-                very_weak_detections = []
+            boxes, classes, scores, num_detections = self._run_savedmodel(img_tensor)
+            with mesurer_etape("postprocess"):
+                return self._analyze_detections(boxes[0], classes[0], scores[0], int(num_detections[0]))
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la prediction SSD: {e}")
+            raise
+    
+    def _analyze_detections(self,
+                            detection_boxes: np.ndarray,
+                            detection_classes: np.ndarray,
+                            detection_scores: np.ndarray,
+                            num_detections: int) -> Dict[str, Any]:
+        """Transforme les sorties SSD d'une image en prediction finale"""
+        return self._analyze_detections_batch(
+            detection_boxes[np.newaxis], detection_classes[np.newaxis],
+            detection_scores[np.newaxis], np.array([num_detections])
+        )[0]
+    
+    def _analyze_detections_batch(self,
+                                  detection_boxes: np.ndarray,
+                                  detection_classes: np.ndarray,
+                                  detection_scores: np.ndarray,
+                                  num_detections: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Transforme les sorties SSD d'un lot (N, K) en predictions finales
+        
+        Toutes les analyses (détections valides, comptes et max par classe,
+        détections faibles) sont des masques sur les tableaux du lot ; les
+        seuils de décision viennent des tables REGLES_*.
+        """
+        try:
+            # float64 avant toute comparaison : mêmes valeurs que float() sur chaque score float32
+            scores = np.asarray(detection_scores, dtype=np.float64)
+            classes = np.asarray(detection_classes).astype(np.int64)
+            boxes = np.asarray(detection_boxes)
+            n_images, k = scores.shape
+            n = np.minimum(np.asarray(num_detections).astype(np.int64).reshape(-1), k)
+            
+            # Log pour debug (top 10 brut, construit seulement pour les requêtes échantillonnées)
+            if detail_actif():
+                logger.debug("=== ANALYSE DETAILLEE DES DETECTIONS ===")
+                for i in range(n_images):
+                    for rang, (class_id, score) in enumerate(zip(classes[i, :10].tolist(), scores[i, :10].tolist())):
+                        logger.debug("  Detection %s: classe=%s (id=%s), score=%.4f",
+                                     rang, self._class_name(class_id), class_id, score)
+            
+            # Détections parmi les num_detections premières, puis valides (score > seuil)
+            dans_n = np.arange(k)[np.newaxis, :] < n[:, np.newaxis]
+            valides = dans_n & (scores > SEUIL_DETECTION)
+            contamines = valides & (classes == CLASSE_CONTAMINE)
+            sains = valides & (classes == CLASSE_SAIN)
+            
+            contaminated_count = contamines.sum(axis=1)
+            healthy_count = sains.sum(axis=1)
+            max_contaminated = np.max(np.where(contamines, scores, 0.0), axis=1, initial=0.0)
+            max_healthy = np.max(np.where(sains, scores, 0.0), axis=1, initial=0.0)
+            
+            prediction = np.full(n_images, "incertain", dtype=object)
+            confidence = np.zeros(n_images)
+            probability = np.zeros(n_images)
+            
+            def affecter(masque, pred, conf, proba):
+                prediction[masque] = pred[masque] if isinstance(pred, np.ndarray) else pred
+                confidence[masque] = conf[masque] if isinstance(conf, np.ndarray) else conf
+                probability[masque] = proba[masque] if isinstance(proba, np.ndarray) else proba
+            
+            # Cas mixte : contamination + sain
+            mixte = (contaminated_count > 0) & (healthy_count > 0)
+            if mixte.any():
+                prediction[mixte], confidence[mixte], probability[mixte] = self._decider_mixte(
+                    max_contaminated[mixte], max_healthy[mixte]
+                )
+            
+            # Seulement contamination
+            contamination_seule = (contaminated_count > 0) & (healthy_count == 0)
+            if contamination_seule.any():
+                index, conf, proba = appliquer_regles(REGLES_CONTAMINATION_SEULE, max_contaminated)
+                affecter(contamination_seule, self._predictions(REGLES_CONTAMINATION_SEULE, index), conf, proba)
+            
+            # Seulement sain : table des scores sains, sauf traces de contamination faible
+            sain_seul = (contaminated_count == 0) & (healthy_count > 0)
+            if sain_seul.any():
+                index, conf, proba = appliquer_regles(REGLES_SAIN_SEUL, max_healthy)
+                affecter(sain_seul, self._predictions(REGLES_SAIN_SEUL, index), conf, proba)
                 
-                logger.info("=== ANALYSE DES DETECTIONS FAIBLES ===")
-                for i in range(min(num_detections, len(detection_scores))):
-                    score = float(detection_scores[i])
-                    class_id = int(detection_classes[i])
-                    class_name = self.class_names[class_id] if class_id < len(self.class_names) else "unknown"
-                    
-                    if score > 0.15:
-                        weak_detections.append((class_id, score, class_name))
-                        logger.info(f"  Detection faible: {class_name} score={score:.4f}")
-                    elif score > 0.05:
-                        very_weak_detections.append((class_id, score, class_name))
+                faibles = dans_n & (classes == CLASSE_CONTAMINE) & (scores > SEUIL_CONTAMINATION_FAIBLE)
+                max_faible = np.max(np.where(faibles, scores, -np.inf), axis=1, initial=-np.inf)
+                traces = sain_seul & (max_healthy < 0.7) & faibles.any(axis=1)
+                ambigu = traces & (healthy_count >= 3) & (max_healthy < 0.65) & (max_faible > 0.15)
+                affecter(traces & ~ambigu, "sain", max_healthy * 0.85, 1.0 - max_healthy)
+                affecter(ambigu, "incertain", max_healthy * 0.6, 0.4)
+                if ambigu.any():
+                    logger.warning("Detection ambigue: objets classes 'sains' mais scores moderes avec traces de contamination")
+            
+            # Aucune detection valide - analyser les faibles
+            aucune = (contaminated_count == 0) & (healthy_count == 0)
+            if aucune.any():
+                faibles = dans_n & (scores > SEUIL_DETECTION_FAIBLE)
+                tres_faibles = dans_n & (scores > SEUIL_DETECTION_TRES_FAIBLE) & ~faibles
+                faibles_contamines = faibles & (classes == CLASSE_CONTAMINE)
+                faibles_sains = faibles & (classes == CLASSE_SAIN)
+                best_contaminated = np.max(np.where(faibles_contamines, scores, -np.inf), axis=1, initial=-np.inf)
+                best_healthy = np.max(np.where(faibles_sains, scores, -np.inf), axis=1, initial=-np.inf)
                 
-                contaminated_weak = [d for d in weak_detections if d[0] == 2]
-                healthy_weak = [d for d in weak_detections if d[0] == 1]
+                contamination_faible = aucune & faibles_contamines.any(axis=1)
+                sain_faible = aucune & ~contamination_faible & faibles_sains.any(axis=1)
+                traces = (aucune & ~contamination_faible & ~sain_faible
+                          & (tres_faibles & (classes == CLASSE_CONTAMINE)).any(axis=1))
+                rien = aucune & ~contamination_faible & ~sain_faible & ~traces
                 
-                if contaminated_weak:
-                    best_contaminated = max(contaminated_weak, key=lambda x: x[1])
-                    prediction = "incertain"
-                    confidence = best_contaminated[1] * 0.5
-                    contamination_probability = best_contaminated[1] * 1.2
-                    logger.info(f"Contamination faible detectee: score={best_contaminated[1]:.4f}")
-                elif healthy_weak:
-                    best_healthy = max(healthy_weak, key=lambda x: x[1])
-                    prediction = "sain"
-                    confidence = best_healthy[1] * 0.7
-                    contamination_probability = 1.0 - best_healthy[1]
-                elif very_weak_detections and any(d[0] == 2 for d in very_weak_detections):
+                affecter(contamination_faible, "incertain", best_contaminated * 0.5, best_contaminated * 1.2)
+                affecter(sain_faible, "sain", best_healthy * 0.7, 1.0 - best_healthy)
+                affecter(traces, "incertain", 0.25, 0.6)
+                affecter(rien, "incertain", 0.2, 0.5)
+                if traces.any():
                     logger.warning("Traces tres faibles de contamination detectees")
-                    prediction = "incertain"
-                    confidence = 0.25
-                    contamination_probability = 0.6
-                else:
-                    prediction = "incertain"
-                    confidence = 0.2
-                    contamination_probability = 0.5
-            
-            logger.info(f"SSD Prediction: {prediction} (confiance: {confidence:.3f})")
-            logger.info(f"Detections: {contaminated_count} contamine(s), {healthy_count} sain(s)")
-            
-            return {
-                "prediction": prediction,
-                "confidence": float(confidence),
-                "model_type": "ssd_object_detection",
-                "contamination_probability": float(contamination_probability),
-                "detection_summary": {
-                    "total_detections": len(valid_detections),
-                    "contaminated_count": contaminated_count,
-                    "healthy_count": healthy_count,
-                    "max_contaminated_score": float(max_contaminated_score),
-                    "max_healthy_score": float(max_healthy_score)
-                },
-                "detections": valid_detections,
-                "model_info": {
-                    "architecture": self.metadata.get('architecture', 'SSD_MobileNet_V2') if self.metadata else 'SSD_MobileNet_V2',
-                    "version": self.metadata.get('version', 'unknown') if self.metadata else 'unknown',
-                    "input_size": self.input_size
-                }
+            
+            model_info = {
+                "architecture": self.metadata.get('architecture', 'SSD_MobileNet_V2') if self.metadata else 'SSD_MobileNet_V2',
+                "version": self.metadata.get('version', 'unknown') if self.metadata else 'unknown',
+                "input_size": self.input_size,
+                "backend": f"tflite_{self.tflite_variant}" if self.model_type == 'tflite' else self.model_type
             }
             
+            results = []
+            for i in range(n_images):
+                positions = np.flatnonzero(valides[i])
+                valid_detections = [
+                    {
+                        "class_id": class_id,
+                        "class_name": self._class_name(class_id),
+                        "score": score,
+                        "box": box
+                    }
+                    for class_id, score, box in zip(
+                        classes[i, positions].tolist(), scores[i, positions].tolist(), boxes[i, positions].tolist()
+                    )
+                ]
+                
+                logger.debug("SSD Prediction: %s (confiance: %.3f)", prediction[i], confidence[i])
+                logger.debug("Detections: %s contamine(s), %s sain(s)", contaminated_count[i], healthy_count[i])
+                
+                results.append({
+                    "prediction": str(prediction[i]),
+                    "confidence": float(confidence[i]),
+                    "model_type": "ssd_object_detection",
+                    "contamination_probability": float(probability[i]),
+                    "detection_summary": {
+                        "total_detections": len(valid_detections),
+                        "contaminated_count": int(contaminated_count[i]),
+                        "healthy_count": int(healthy_count[i]),
+                        "max_contaminated_score": float(max_contaminated[i]),
+                        "max_healthy_score": float(max_healthy[i])
+                    },
+                    "detections": valid_detections,
+                    "model_info": dict(model_info)
+                })
+            return results
+            
         except Exception as e:
-            logger.error(f"Erreur lors de la prediction SSD: {e}")
+            logger.error(f"Erreur lors de l'analyse des detections SSD: {e}")
             raise
     
+    def _class_name(self, class_id: int) -> str:
+        return self.class_names[class_id] if class_id < len(self.class_names) else "unknown"
+    
+    @staticmethod
+    def _predictions(regles, index: np.ndarray) -> np.ndarray:
+        """Prédiction du palier retenu pour chaque image"""
+        return np.array([regle.prediction for regle in regles], dtype=object)[index]
+    
+
     def _predict_keras(self, img_array: np.ndarray) -> Dict[str, Any]:
         """Prédiction avec le modèle Keras (EfficientNet)"""
         try:
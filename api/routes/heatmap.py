@@ -1,46 +1,52 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from fastapi.responses import Response
-import tempfile
 import os
 import sys
 import logging
 from io import BytesIO
 from PIL import Image
-from vision_model import VisionModel
-from heatmap_generator import ContaminationHeatmapGenerator
-
 
-# Ajouter le chemin des modèles
+# Ajouter le chemin des modèles (avant les imports qui en dépendent)
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'models'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
 
+from heatmap_generator import ContaminationHeatmapGenerator
+from api.models.model_registry import model_registry
+from api.config import config
+from api.utils.image_io import decoder_image
+
 
 logger = logging.getLogger(__name__)
 
+
+def obtenir_modele_vision():
+    """Modèle de vision partagé via le registre (chargé une seule fois par version)"""
+    return model_registry.obtenir_modele_vision(str(config.VISION_MODEL_PATH))
+
+# Handlers en `def` : décodage, chargement du modèle et inférence sont bloquants,
+# FastAPI les exécute dans son pool de threads plutôt que sur la boucle asyncio
 router = APIRouter()
 
 @router.post("/heatmap")
-async def generate_heatmap(file: UploadFile = File(...)):
+def generate_heatmap(file: UploadFile = File(...)):
        
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Le fichier doit être une image")
     
     try:
-        # Sauvegarder temporairement le fichier uploadé
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_image_path = temp_file.name
+        # Décodage unique en mémoire, partagé entre inférence et rendu
+        content = file.file.read()
+        image_array = decoder_image(content)
         
         logger.info(f"🔥 Génération heatmap pour: {file.filename}")
         
-        # Charger le modèle et faire la prédiction
-        model = VisionModel()
-        if not model.charger_modele():
+        # Modèle partagé (pas de rechargement du SavedModel à chaque requête)
+        model = obtenir_modele_vision()
+        if not model.est_charge():
             raise HTTPException(status_code=500, detail="Impossible de charger le modèle de vision")
         
         # Obtenir les détections
-        result = model.predict(temp_image_path)
+        result = model.predict(image_array)
         
         # Vérifier s'il y a des contaminations
         contaminated_detections = [d for d in result.get('detections', []) if d.get('class_name') == 'contaminated']
@@ -52,7 +58,7 @@ async def generate_heatmap(file: UploadFile = File(...)):
         
         # Générer la heatmap
         generator = ContaminationHeatmapGenerator()
-        heatmap_img = generator.create_contamination_heatmap(temp_image_path, result['detections'])
+        heatmap_img = generator.create_contamination_heatmap(image_array, result['detections'])
         
         # Convertir en bytes pour la réponse
         pil_img = Image.fromarray(heatmap_img)
@@ -62,44 +68,33 @@ async def generate_heatmap(file: UploadFile = File(...)):
         
         logger.info(f" Heatmap générée avec {len(contaminated_detections)} zone(s) de contamination")
         
-        # Nettoyer le fichier temporaire
-        os.unlink(temp_image_path)
-        
         return Response(content=img_buffer.getvalue(), media_type="image/png")
-        :smile: 
+        
     except Exception as e:
         logger.error(f"❌ Erreur génération heatmap: {e}")
-        # Nettoyer en cas d'erreur
-        if 'temp_image_path' in locals():
-            try:
-                os.unlink(temp_image_path)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de la heatmap: {str(e)}")
 
 
 @router.post("/heatmap-overlay") 
-async def generate_heatmap_overlay(file: UploadFile = File(...)):
+def generate_heatmap_overlay(file: UploadFile = File(...)):
        
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail= "❌ Le fichier doit être une image")
     
     try:
-        # Sauvegarder temporairement le fichier uploadé
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_image_path = temp_file.name
+        # Décodage unique en mémoire, partagé entre inférence et rendu
+        content = file.file.read()
+        image_array = decoder_image(content)
         
         logger.info(f" Génération overlay pour: {file.filename}")
         
-        # Charger le modèle et faire la prédiction
-        model = VisionModel()
-        if not model.charger_modele():
+        # Modèle partagé (pas de rechargement du SavedModel à chaque requête)
+        model = obtenir_modele_vision()
+        if not model.est_charge():
             raise HTTPException(status_code=500, detail="Impossible de charger le modèle de vision")
         
         # Obtenir les détections
-        result = model.predict(temp_image_path)
+        result = model.predict(image_array)
         
         # Vérifier s'il y a des contaminations
         contaminated_detections = [d for d in result.get('detections', []) if d.get('class_name') == 'contaminated']
@@ -110,7 +105,7 @@ async def generate_heatmap_overlay(file: UploadFile = File(...)):
         
         # Générer l'overlay
         generator = ContaminationHeatmapGenerator()
-        overlay_img = generator.create_contamination_overlay_pil(temp_image_path, result['detections'])
+        overlay_img = generator.create_contamination_overlay_pil(image_array, result['detections'])
         
         # Convertir en bytes pour la réponse
         img_buffer = BytesIO()
@@ -119,18 +114,10 @@ async def generate_heatmap_overlay(file: UploadFile = File(...)):
         
         logger.info(f"✅ Overlay généré avec {len(contaminated_detections)} zone(s) de contamination")
         
-        # Nettoyer le fichier temporaire
-        os.unlink(temp_image_path)
-        
         return Response(content=img_buffer.getvalue(), media_type="image/png")
         
     except Exception as e:
         logger.error(f"❌ Erreur génération overlay: {e}")
-        if 'temp_image_path' in locals():
-            try:
-                os.unlink(temp_image_path)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de l'overlay: {str(e)}")
 
 
@@ -138,13 +125,13 @@ async def generate_heatmap_overlay(file: UploadFile = File(...)):
 async def health_check_heatmap():
    
     try:
-        generator = ContaminationHeatmapGenerator()
-        model = VisionModel()
+        # État du registre seulement : un health check ne doit pas charger le SavedModel
+        charge = model_registry.est_charge("vision", str(config.VISION_MODEL_PATH))
         
         return {
             "status": "healthy",
             "heatmap_generator": "available",
-            "vision_model": "available"
+            "vision_model": "available" if charge else "unavailable"
         }
     except Exception as e:
         logger.error(f"❌ Health check heatmap échoué: {e}")
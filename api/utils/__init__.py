@@ -1,3 +1,4 @@
 from .prediction_service import PredictionService
+from .inference_executor import InferenceExecutor
 
-__all__ = ["PredictionService"]
\ No newline at end of file
+__all__ = ["PredictionService", "InferenceExecutor"]
\ No newline at end of file
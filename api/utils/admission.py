@@ -0,0 +1,167 @@
+"""
+Contrôle d'admission des endpoints de prédiction
+
+Au plus `max_inflight` prédictions en cours ; au-delà, les requêtes attendent
+dans une file bornée, servie en round-robin entre clés API (un client qui
+envoie des lots ne peut pas monopoliser la file devant le frontend). Quand
+la file est pleine, ou que l'attente dépasse `max_wait_s`, la requête est
+refusée tout de suite avec un délai de nouvelle tentative (429 + Retry-After).
+
+Tout se passe sur la boucle asyncio : pas de verrou nécessaire.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+
+class AdmissionRefusee(Exception):
+    """File d'attente pleine ou attente trop longue"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limite de concurrence avec file équitable par clé API"""
+
+    def __init__(self, max_inflight: int, max_queue: int = 32, max_queue_per_key: int = 16,
+                 max_wait_s: float = 10.0):
+        """
+        Args:
+            max_inflight: Nombre maximal de prédictions simultanées
+            max_queue: Nombre maximal de requêtes en attente (toutes clés confondues)
+            max_queue_per_key: Nombre maximal de requêtes en attente pour une même clé
+            max_wait_s: Attente maximale avant refus (secondes)
+        """
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_per_key = max(1, max_queue_per_key)
+        self.max_wait_s = max_wait_s
+
+        self._inflight = 0
+        self._files: "OrderedDict[str, deque]" = OrderedDict()  # Ordre = tour du round-robin
+        self._queued = 0
+        self._service_time_s = 1.0  # Moyenne glissante de la durée d'une prédiction
+
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {"queue_full": 0, "key_queue_full": 0, "timeout": 0}
+        self._per_key: Dict[str, Dict[str, int]] = {}
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        """Réserve une place de prédiction pour `client` pendant le bloc"""
+        await self.acquerir(client)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.liberer(time.perf_counter() - started_at)
+
+    async def acquerir(self, client: str):
+        """
+        Attend une place (dans l'ordre équitable entre clés)
+
+        Raises:
+            AdmissionRefusee: File pleine ou attente au-delà de max_wait_s
+        """
+        stats = self._per_key.setdefault(client, {"admitted": 0, "rejected": 0})
+
+        if self._inflight < self.max_inflight and self._queued == 0:
+            self._inflight += 1
+            self._admitted += 1
+            stats["admitted"] += 1
+            return
+
+        file_client = self._files.get(client)
+        if self._queued >= self.max_queue:
+            self._refuser(client, "queue_full")
+        if file_client is not None and len(file_client) >= self.max_queue_per_key:
+            self._refuser(client, "key_queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        if file_client is None:
+            file_client = self._files[client] = deque()
+        file_client.append(future)
+        self._queued += 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait_s)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Place accordée au moment du timeout : on la garde
+                pass
+            else:
+                self._retirer_de_la_file(client, future)
+                future.cancel()
+                self._refuser(client, "timeout")
+        except asyncio.CancelledError:
+            # Client parti pendant l'attente : rendre la place si elle venait d'être accordée
+            if future.done() and not future.cancelled():
+                self.liberer(None)
+            else:
+                self._retirer_de_la_file(client, future)
+                future.cancel()
+            raise
+
+        self._admitted += 1
+        stats["admitted"] += 1
+
+    def liberer(self, duration_s=None):
+        """Rend une place et la donne à la prochaine clé du round-robin"""
+        if duration_s is not None:
+            self._service_time_s = 0.8 * self._service_time_s + 0.2 * duration_s
+        self._inflight -= 1
+
+        while self._files and self._inflight < self.max_inflight:
+            client, file_client = next(iter(self._files.items()))
+            future = file_client.popleft()
+            self._queued -= 1
+            # La clé servie passe en fin de tour
+            if file_client:
+                self._files.move_to_end(client)
+            else:
+                del self._files[client]
+            if not future.done():
+                self._inflight += 1
+                future.set_result(True)
+
+    def _retirer_de_la_file(self, client: str, future):
+        file_client = self._files.get(client)
+        if file_client is not None and future in file_client:
+            file_client.remove(future)
+            self._queued -= 1
+            if not file_client:
+                del self._files[client]
+
+    def _refuser(self, client: str, raison: str):
+        self._rejected[raison] += 1
+        self._per_key[client]["rejected"] += 1
+        raise AdmissionRefusee(
+            "Serveur saturé, réessayez plus tard" if raison != "key_queue_full"
+            else "Trop de requêtes en attente pour cette clé API",
+            self.retry_after()
+        )
+
+    def retry_after(self) -> int:
+        """Délai conseillé (secondes) : temps estimé pour écouler la file actuelle"""
+        tours = (self._queued + 1) / self.max_inflight
+        return max(1, math.ceil(tours * self._service_time_s))
+
+    def stats(self) -> Dict[str, Any]:
+        """État courant et compteurs d'admission"""
+        return {
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "max_queue_per_key": self.max_queue_per_key,
+            "inflight": self._inflight,
+            "queued": self._queued,
+            "queued_per_key": {client: len(file_client) for client, file_client in self._files.items()},
+            "avg_service_time_s": round(self._service_time_s, 3),
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "per_key": {client: dict(stats) for client, stats in self._per_key.items()},
+        }
@@ -0,0 +1,95 @@
+"""
+Stockage temporaire des artefacts générés (heatmaps, overlays)
+
+/predict-image peut renvoyer un identifiant au lieu des bytes de l'image :
+le frontend récupère ensuite l'artefact via GET /artifacts/{id}. Les
+artefacts restent en mémoire, avec une durée de vie, un nombre et une taille
+totale limités.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+
+class ArtifactStore:
+    """Artefacts en mémoire, évincés par ancienneté (LRU), par taille totale et par TTL"""
+
+    def __init__(self, max_entries: int = 256, ttl_s: float = 600.0, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Nombre maximal d'artefacts gardés
+            ttl_s: Durée de vie d'un artefact (secondes)
+            max_bytes: Taille totale maximale des artefacts gardés
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._stored = 0
+        self._served = 0
+        self._expired = 0
+        self._evictions = {"lru": 0, "memory": 0}
+
+    def ajouter(self, content: bytes, media_type: str = "image/png") -> Optional[str]:
+        """Enregistre un artefact et retourne son identifiant (None s'il dépasse la limite mémoire)"""
+        if len(content) > self.max_bytes:
+            return None
+        artifact_id = uuid4().hex
+        with self._lock:
+            self._purger()
+            self._entries[artifact_id] = (time.monotonic() + self.ttl_s, content, media_type)
+            self._bytes += len(content)
+            self._stored += 1
+            while len(self._entries) > self.max_entries:
+                self._evincer_plus_ancien("lru")
+            while self._bytes > self.max_bytes:
+                self._evincer_plus_ancien("memory")
+        return artifact_id
+
+    def obtenir(self, artifact_id: str) -> Optional[Tuple[bytes, str]]:
+        """Retourne (contenu, media_type), ou None si inconnu ou expiré"""
+        with self._lock:
+            entry = self._entries.get(artifact_id)
+            if entry is None:
+                return None
+            expires_at, content, media_type = entry
+            if expires_at < time.monotonic():
+                self._retirer(artifact_id)
+                self._expired += 1
+                return None
+            self._entries.move_to_end(artifact_id)
+            self._served += 1
+            return content, media_type
+
+    def _purger(self):
+        """Retire les artefacts expirés (appelé sous verrou)"""
+        now = time.monotonic()
+        for artifact_id in [key for key, (expires_at, _, _) in self._entries.items() if expires_at < now]:
+            self._retirer(artifact_id)
+            self._expired += 1
+
+    def _retirer(self, artifact_id: str):
+        _, content, _ = self._entries.pop(artifact_id)
+        self._bytes -= len(content)
+
+    def _evincer_plus_ancien(self, raison: str):
+        _, (_, content, _) = self._entries.popitem(last=False)
+        self._bytes -= len(content)
+        self._evictions[raison] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Nombre et taille des artefacts gardés, servis, expirés et évincés"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "stored": self._stored,
+                "served": self._served,
+                "expired": self._expired,
+                "evictions": dict(self._evictions),
+            }
@@ -0,0 +1,112 @@
+"""
+Lecture du tableau de paramètres pour l'endpoint /predict-batch
+
+Le tableau peut être envoyé en JSON (liste d'objets) ou en CSV (avec en-tête),
+une ligne par image. Les colonnes reprennent les champs de /predict-image.
+"""
+import csv
+import io
+import json
+from typing import Any, Dict, List
+
+# Champs attendus et leur conversion (mêmes types que les Form de /predict-image)
+CHAMPS_PARAMETRES = {
+    "race_champignon": str,
+    "type_substrat": str,
+    "jours_inoculation": int,
+    "hygrometrie": float,
+    "co2_ppm": float,
+}
+
+# Colonnes optionnelles permettant d'associer une ligne à un fichier uploadé
+COLONNES_FICHIER = ("image_file", "filename")
+
+
+def _convertir_ligne(index: int, ligne: Dict[str, Any]) -> Dict[str, Any]:
+    """Valide et convertit une ligne du tableau"""
+    if not isinstance(ligne, dict):
+        raise ValueError(f"Ligne {index}: objet attendu")
+
+    parametres = {}
+    for champ, conversion in CHAMPS_PARAMETRES.items():
+        valeur = ligne.get(champ)
+        if valeur is None or (isinstance(valeur, str) and not valeur.strip()):
+            raise ValueError(f"Ligne {index}: champ '{champ}' manquant")
+        try:
+            if conversion is int:
+                # Accepte "12" comme "12.0" (exports tableur)
+                parametres[champ] = int(float(valeur))
+            else:
+                parametres[champ] = conversion(valeur.strip() if isinstance(valeur, str) else valeur)
+        except (TypeError, ValueError):
+            raise ValueError(f"Ligne {index}: valeur invalide pour '{champ}': {valeur!r}")
+
+    parametres["commentaire"] = str(ligne.get("commentaire") or "")
+    for colonne in COLONNES_FICHIER:
+        if ligne.get(colonne):
+            parametres["image_file"] = str(ligne[colonne]).strip()
+            break
+
+    return parametres
+
+
+def parser_parametres_lot(contenu: str) -> List[Dict[str, Any]]:
+    """
+    Lit le tableau de paramètres (JSON ou CSV).
+
+    Args:
+        contenu: Texte JSON (liste d'objets) ou CSV avec ligne d'en-tête
+
+    Returns:
+        Liste de paramètres validés, dans l'ordre du tableau
+
+    Raises:
+        ValueError: Si le tableau est vide ou mal formé
+    """
+    texte = (contenu or "").strip()
+    if not texte:
+        raise ValueError("Tableau de paramètres vide")
+
+    if texte.startswith("["):
+        try:
+            lignes = json.loads(texte)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON invalide: {e}")
+    else:
+        lignes = list(csv.DictReader(io.StringIO(texte)))
+
+    if not lignes:
+        raise ValueError("Tableau de paramètres vide")
+
+    return [_convertir_ligne(i, ligne) for i, ligne in enumerate(lignes)]
+
+
+def associer_images(parametres: List[Dict[str, Any]], noms_fichiers: List[str]) -> List[int]:
+    """
+    Associe chaque ligne de paramètres à l'index d'une image uploadée.
+
+    Si toutes les lignes ont une colonne `image_file`/`filename`, l'association
+    se fait par nom de fichier, sinon par position.
+
+    Returns:
+        Pour chaque ligne, l'index de l'image correspondante
+
+    Raises:
+        ValueError: Si les lignes et les images ne correspondent pas
+    """
+    if all("image_file" in ligne for ligne in parametres):
+        index_par_nom = {}
+        for i, nom in enumerate(noms_fichiers):
+            index_par_nom.setdefault(nom, i)
+        correspondances = []
+        for i, ligne in enumerate(parametres):
+            if ligne["image_file"] not in index_par_nom:
+                raise ValueError(f"Ligne {i}: image '{ligne['image_file']}' absente de l'envoi")
+            correspondances.append(index_par_nom[ligne["image_file"]])
+        return correspondances
+
+    if len(parametres) != len(noms_fichiers):
+        raise ValueError(
+            f"{len(parametres)} ligne(s) de paramètres pour {len(noms_fichiers)} image(s)"
+        )
+    return list(range(len(parametres)))
@@ -0,0 +1,208 @@
+"""
+Cache des images de heatmap et d'overlay
+
+La même photo est souvent rendue en heatmap puis en overlay, et redemandée à
+chaque rechargement de page : sans cache, décodage, inférence, rendu et
+encodage sont refaits à chaque fois. La clé combine l'empreinte du contenu
+de l'image, la version du modèle de vision et les paramètres de rendu ; elle
+sert aussi d'ETag, si bien qu'un `If-None-Match` est satisfait (304) sans
+même consulter le cache.
+
+Deux niveaux, bornés en taille : mémoire (LRU) puis disque (évincé par date
+de dernier accès). Une entrée lue sur disque est remontée en mémoire.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Extension des fichiers du cache disque <-> type MIME
+EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+    "image/tiff": ".tiff",
+}
+TYPES_MIME = {extension: media_type for media_type, extension in EXTENSIONS.items()}
+
+
+def cle_heatmap(empreinte: str, version_vision: str, **options) -> str:
+    """
+    Clé (et ETag) d'un rendu : empreinte de l'image, version du modèle de
+    vision et paramètres de rendu (style, format, qualité, taille...)
+    """
+    description = json.dumps([empreinte, version_vision, options], sort_keys=True, default=str)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+class HeatmapCache:
+    """Cache LRU mémoire + disque des images rendues, borné en octets"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Dossier du cache disque (None = mémoire seule)
+            max_memory_bytes: Taille maximale gardée en mémoire
+            max_disk_bytes: Taille maximale gardée sur disque
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self._disk_bytes = 0
+        self._hits = {"memory": 0, "disk": 0}
+        self._misses = 0
+        self._evictions = {"memory": 0, "disk": 0}
+
+        if self.cache_dir is not None:
+            self._indexer_disque()
+
+    def _indexer_disque(self):
+        """Reprend les fichiers d'un démarrage précédent, du plus ancien au plus récent accès"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fichiers = [p for p in self.cache_dir.iterdir() if p.suffix in TYPES_MIME]
+            fichiers.sort(key=lambda p: p.stat().st_mtime)
+        except OSError as e:
+            logger.warning(f"⚠️ Cache disque des heatmaps indisponible ({self.cache_dir}): {e}")
+            self.cache_dir = None
+            return
+
+        for path in fichiers:
+            size = path.stat().st_size
+            self._disk[path.stem] = (path, size)
+            self._disk_bytes += size
+        self._evincer_disque()
+        if self._disk:
+            logger.info(f"🗂️ Cache des heatmaps: {len(self._disk)} fichier(s) repris ({self._disk_bytes // 1024} Ko)")
+
+    def obtenir(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """(contenu, media_type) en cache pour cette clé, ou None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+                return entry
+            disk_entry = self._disk.get(key)
+
+        if disk_entry is not None:
+            path, _ = disk_entry
+            try:
+                content = path.read_bytes()
+                os.utime(path)  # Date de dernier accès, pour l'ordre d'éviction au redémarrage
+            except OSError:
+                content = None
+            if content is not None:
+                media_type = TYPES_MIME[path.suffix]
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._hits["disk"] += 1
+                    self._ajouter_memoire(key, content, media_type)
+                return content, media_type
+            with self._lock:
+                self._retirer_disque(key)
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def enregistrer(self, key: str, content: bytes, media_type: str):
+        """Ajoute un rendu aux deux niveaux (ignoré s'il dépasse une limite)"""
+        with self._lock:
+            self._ajouter_memoire(key, content, media_type)
+
+        extension = EXTENSIONS.get(media_type)
+        if self.cache_dir is None or extension is None or len(content) > self.max_disk_bytes:
+            return
+
+        path = self.cache_dir / f"{key}{extension}"
+        # Fichier temporaire propre à cet écrivain : deux rendus simultanés de la
+        # même image ne peuvent pas mélanger leurs écritures avant os.replace
+        temporaire = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+                temporaire = f.name
+                f.write(content)
+            os.replace(temporaire, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Écriture du cache de heatmap impossible: {e}")
+            if temporaire is not None:
+                try:
+                    os.unlink(temporaire)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            self._retirer_disque(key, supprimer=False)
+            self._disk[key] = (path, len(content))
+            self._disk_bytes += len(content)
+            self._evincer_disque()
+
+    def _ajouter_memoire(self, key: str, content: bytes, media_type: str):
+        """Ajout au niveau mémoire (appelé sous verrou)"""
+        if len(content) > self.max_memory_bytes:
+            return
+        ancien = self._memory.pop(key, None)
+        if ancien is not None:
+            self._memory_bytes -= len(ancien[0])
+        self._memory[key] = (content, media_type)
+        self._memory_bytes += len(content)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (evince, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evince)
+            self._evictions["memory"] += 1
+
+    def _retirer_disque(self, key: str, supprimer: bool = True):
+        """Retire une entrée de l'index disque (appelé sous verrou)"""
+        entry = self._disk.pop(key, None)
+        if entry is None:
+            return
+        path, size = entry
+        self._disk_bytes -= size
+        if supprimer:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _evincer_disque(self):
+        """Supprime les fichiers les moins récemment utilisés au-delà de la limite (sous verrou)"""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key = next(iter(self._disk))
+            self._retirer_disque(key)
+            self._evictions["disk"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Métriques du cache (hits par niveau, taille, évictions)"""
+        with self._lock:
+            hits = self._hits["memory"] + self._hits["disk"]
+            lookups = hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "disk_dir": str(self.cache_dir) if self.cache_dir else None,
+                "hits": dict(self._hits),
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "evictions": dict(self._evictions),
+            }
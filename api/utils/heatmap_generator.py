@@ -8,7 +8,55 @@ import cv2
 from PIL import Image, ImageDraw, ImageFilter
 import io
 import base64
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional
+
+from api.utils.image_io import ImageSource, decoder_image, ouvrir_image
+from api.config import config
+from api.metrics import mesurer_etape
+
+# Formats de sortie : nom PIL et type MIME
+FORMATS_SORTIE = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+def encoder_image(pil_img: Image.Image, format: str = "png", quality: int = 85,
+                  compress_level: int = 6) -> io.BytesIO:
+    """
+    Encode une image PIL dans le format demandé
+    
+    Args:
+        pil_img: Image RGB
+        format: png, jpeg ou webp
+        quality: Qualité JPEG/WebP (1-100)
+        compress_level: Compression PNG (0 = aucune, 1 = rapide, 9 = maximale)
+    
+    Returns:
+        Buffer positionné au début (lire via getbuffer() pour éviter une copie)
+    """
+    nom_pil, _ = FORMATS_SORTIE[format]
+    buffer = io.BytesIO()
+    if format == "png":
+        pil_img.save(buffer, format=nom_pil, compress_level=compress_level)
+    else:
+        pil_img.save(buffer, format=nom_pil, quality=quality)
+    buffer.seek(0)
+    return buffer
+
+
+def limiter_taille(image: ImageSource, max_side: Optional[int]) -> ImageSource:
+    """Réduit l'image (INTER_AREA) si son plus grand côté dépasse max_side"""
+    if not max_side:
+        return image
+    image = decoder_image(image)
+    h, w = image.shape[:2]
+    if max(h, w) <= max_side:
+        return image
+    ratio = max_side / max(h, w)
+    return cv2.resize(image, (max(1, round(w * ratio)), max(1, round(h * ratio))), interpolation=cv2.INTER_AREA)
+
 
 class ContaminationHeatmapGenerator:
     """
@@ -20,39 +68,33 @@ class ContaminationHeatmapGenerator:
         self.colormap = cv2.COLORMAP_JET
         
     def create_contamination_heatmap(self, 
-                                   image_path: str, 
+                                   image: ImageSource, 
                                    detections: List[Dict], 
-                                   output_size: Tuple[int, int] = None) -> np.ndarray:
+                                   output_size: Tuple[int, int] = None,
+                                   render_scale: float = None) -> np.ndarray:
         """
         Crée une heatmap des zones de contamination détectées
         
         Args:
-            image_path: Chemin vers l'image originale
+            image: Image originale (chemin, bytes de l'upload ou tableau RGB déjà décodé)
             detections: Liste des détections avec bounding boxes et scores
             output_size: Taille de sortie (largeur, hauteur), None pour garder l'original
+            render_scale: Résolution de calcul de la heatmap (0.25 = 1/4 de la taille,
+                agrandie avant le mélange), défaut: config.HEATMAP_RENDER_SCALE
             
         Returns:
             Image numpy array avec heatmap overlay
         """
-        # Charger l'image originale
-        original_img = cv2.imread(image_path)
-        if original_img is None:
-            raise ValueError(f"Impossible de charger l'image: {image_path}")
-        
-        original_img = cv2.cvtColor(original_img, cv2.COLOR_BGR2RGB)
-        h, w = original_img.shape[:2]
+        # Charger l'image originale (pas de relecture disque si elle est déjà décodée)
+        try:
+            original_img = decoder_image(image)
+        except Exception as e:
+            raise ValueError(f"Impossible de charger l'image: {e}")
         
         # Redimensionner si nécessaire
         if output_size:
             original_img = cv2.resize(original_img, output_size)
-            scale_x = output_size[0] / w
-            scale_y = output_size[1] / h
-            h, w = output_size[1], output_size[0]
-        else:
-            scale_x = scale_y = 1.0
-        
-        # Créer la heatmap de base (toute noire)
-        heatmap = np.zeros((h, w), dtype=np.float32)
+        h, w = original_img.shape[:2]
         
         # Filtrer seulement les détections de contamination
         contaminated_detections = [d for d in detections if d.get('class_name') == 'contaminated']
@@ -63,15 +105,56 @@ class ContaminationHeatmapGenerator:
         
         print(f"🔥 Génération heatmap pour {len(contaminated_detections)} zone(s) contaminée(s)")
         
+        # Heatmap calculée à résolution réduite si demandé
+        scale = min(1.0, max(0.01, render_scale or config.HEATMAP_RENDER_SCALE))
+        h_r, w_r = max(1, round(h * scale)), max(1, round(w * scale))
+        
+        heatmap, zone = self._accumulate_heatmap(contaminated_detections, h_r, w_r)
+        if zone is None:
+            return original_img
+        y0, x0, y1, x1 = zone
+        
+        # Retour à la taille de l'image
+        if (h_r, w_r) != (h, w):
+            heatmap = cv2.resize(heatmap, (w, h), interpolation=cv2.INTER_LINEAR)
+            # L'interpolation déborde d'au plus un pixel réduit autour de la zone
+            marge_y, marge_x = -(-h // h_r), -(-w // w_r)
+            y0, x0 = max(0, y0 * h // h_r - marge_y), max(0, x0 * w // w_r - marge_x)
+            y1, x1 = min(h, -(-y1 * h // h_r) + marge_y), min(w, -(-x1 * w // w_r) + marge_x)
+        
+        # Mélange limité à la zone : ailleurs alpha = 0, l'image originale est inchangée
+        # Alpha blending: zones sans contamination restent normales
+        zone_heatmap = heatmap[y0:y1, x0:x1]
+        heatmap_colored = cv2.applyColorMap((zone_heatmap * 255).astype(np.uint8), self.colormap)
+        heatmap_colored = cv2.cvtColor(heatmap_colored, cv2.COLOR_BGR2RGB)
+        
+        alpha = zone_heatmap[..., np.newaxis] * np.float32(0.6)  # Intensité de l'overlay
+        zone_img = original_img[y0:y1, x0:x1].astype(np.float32)
+        blended = np.array(original_img, dtype=np.uint8, copy=True)
+        blended[y0:y1, x0:x1] = zone_img * (1 - alpha) + heatmap_colored.astype(np.float32) * alpha
+        
+        return blended
+    
+    def _accumulate_heatmap(self, contaminated_detections: List[Dict], h: int, w: int) -> Tuple[np.ndarray, Any]:
+        """
+        Accumule les gaussiennes des détections contaminées sur une grille (h, w)
+        
+        Returns:
+            (heatmap float32 normalisée sur [0, 1], zone écrite (y0, x0, y1, x1) ou None)
+        """
+        # Accumulateur unique, chaque gaussienne y est écrite en place sur sa zone
+        heatmap = np.zeros((h, w), dtype=np.float32)
+        zone = None  # Rectangle englobant toutes les zones écrites (y0, x0, y1, x1)
+        
         for detection in contaminated_detections:
             score = detection['score']
             box = detection['box']  # [ymin, xmin, ymax, xmax] normalisé
             
             # Convertir les coordonnées normalisées en pixels
-            ymin = int(box[0] * h * scale_y)
-            xmin = int(box[1] * w * scale_x) 
-            ymax = int(box[2] * h * scale_y)
-            xmax = int(box[3] * w * scale_x)
+            ymin = int(box[0] * h)
+            xmin = int(box[1] * w) 
+            ymax = int(box[2] * h)
+            xmax = int(box[3] * w)
             
             # S'assurer que les coordonnées sont dans les limites
             ymin = max(0, min(h-1, ymin))
@@ -79,44 +162,94 @@ class ContaminationHeatmapGenerator:
             xmin = max(0, min(w-1, xmin))
             xmax = max(0, min(w-1, xmax))
             
-            # Créer un masque gaussien pour cette détection
-            mask = self._create_gaussian_mask(h, w, (ymin, xmin, ymax, xmax), score)
-            
-            # Ajouter à la heatmap globale
-            heatmap = np.maximum(heatmap, mask)
-        
-        # Normaliser la heatmap
-        if heatmap.max() > 0:
-            heatmap = heatmap / heatmap.max()
-        
-        # Appliquer la colormap
-        heatmap_colored = cv2.applyColorMap((heatmap * 255).astype(np.uint8), self.colormap)
-        heatmap_colored = cv2.cvtColor(heatmap_colored, cv2.COLOR_BGR2RGB)
+            roi = self._accumulate_gaussian(heatmap, (ymin, xmin, ymax, xmax), score)
+            if roi is not None:
+                zone = roi if zone is None else (min(zone[0], roi[0]), min(zone[1], roi[1]),
+                                                 max(zone[2], roi[2]), max(zone[3], roi[3]))
+        
+        if zone is not None:
+            # Normaliser la heatmap (en place, seule la zone écrite est non nulle)
+            y0, x0, y1, x1 = zone
+            maximum = heatmap[y0:y1, x0:x1].max()
+            if maximum > 0:
+                heatmap[y0:y1, x0:x1] *= np.float32(1.0 / maximum)
+        return heatmap, zone
+    
+    def heatmap_data(self, detections: List[Dict], image_size: Tuple[int, int],
+                     contours: bool = False, grid_size: int = 64,
+                     levels: Tuple[float, ...] = (0.25, 0.5, 0.75)) -> Dict[str, Any]:
+        """
+        Géométrie des détections pour un rendu côté client (sans image)
         
-        # Mélanger avec l'image originale
-        # Alpha blending: zones sans contamination restent normales
-        alpha = heatmap[..., np.newaxis] * 0.6  # Intensité de l'overlay
-        blended = original_img.astype(np.float32) * (1 - alpha) + heatmap_colored.astype(np.float32) * alpha
+        Args:
+            detections: Détections du modèle de vision
+            image_size: (largeur, hauteur) de l'image analysée
+            contours: Ajouter les iso-contours de la heatmap accumulée
+            grid_size: Plus grand côté de la grille des contours (en cellules)
+            levels: Niveaux des iso-contours (heatmap normalisée sur [0, 1])
+            
+        Returns:
+            Dict JSON : boxes normalisées [ymin, xmin, ymax, xmax], scores et,
+            si demandé, polygones [[x, y], ...] normalisés par niveau
+        """
+        width, height = image_size
+        data = {
+            "image": {"width": width, "height": height},
+            "box_format": "ymin,xmin,ymax,xmax",
+            "detections": [
+                {
+                    "class_name": d.get('class_name'),
+                    "score": round(float(d['score']), 4),
+                    "box": [round(min(1.0, max(0.0, float(c))), 4) for c in d['box']]
+                }
+                for d in detections
+            ]
+        }
+        if not contours:
+            return data
         
-        return blended.astype(np.uint8)
+        # Grille au ratio de l'image, plus grand côté = grid_size
+        ratio = grid_size / max(width, height)
+        h_g, w_g = max(1, round(height * ratio)), max(1, round(width * ratio))
+        contaminated_detections = [d for d in detections if d.get('class_name') == 'contaminated']
+        heatmap, zone = self._accumulate_heatmap(contaminated_detections, h_g, w_g)
+        
+        niveaux = []
+        for level in levels:
+            polygones = []
+            if zone is not None:
+                masque = (heatmap >= level).astype(np.uint8)
+                trouves, _ = cv2.findContours(masque, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                for contour in trouves:
+                    if len(contour) < 3:
+                        continue
+                    # Centres des cellules, normalisés sur [0, 1]
+                    points = (contour.reshape(-1, 2).astype(np.float32) + 0.5) / (w_g, h_g)
+                    polygones.append(np.round(points, 4).tolist())
+            niveaux.append({"level": level, "polygons": polygones})
+        
+        data["contours"] = {"grid": [w_g, h_g], "point_format": "x,y", "levels": niveaux}
+        return data
     
-    def _create_gaussian_mask(self, h: int, w: int, bbox: Tuple[int, int, int, int], intensity: float) -> np.ndarray:
+    def _accumulate_gaussian(self, heatmap: np.ndarray, bbox: Tuple[int, int, int, int], intensity: float):
         """
-        Crée un masque gaussien pour une bounding box
+        Ajoute (max) la gaussienne d'une bounding box dans l'accumulateur, en place
+        
+        La gaussienne n'est évaluée que sur la box étendue (seule zone conservée),
+        en float32 ; elle est séparable : exp(-(dx² + dy²)) = exp(-dx²) * exp(-dy²),
+        soit hauteur + largeur exponentielles au lieu de hauteur x largeur.
         
         Args:
-            h, w: Dimensions de l'image
-            bbox: (ymin, xmin, ymax, xmax)
+            heatmap: Accumulateur float32 (h, w)
+            bbox: (ymin, xmin, ymax, xmax) en pixels
             intensity: Intensité basée sur le score de détection
             
         Returns:
-            Masque gaussien 2D
+            Zone écrite (y0, x0, y1, x1), ou None si la box est vide
         """
+        h, w = heatmap.shape
         ymin, xmin, ymax, xmax = bbox
         
-        # Créer une grille de coordonnées
-        y, x = np.ogrid[:h, :w]
-        
         # Centre de la bounding box
         center_y = (ymin + ymax) / 2
         center_x = (xmin + xmax) / 2
@@ -125,38 +258,56 @@ class ContaminationHeatmapGenerator:
         box_height = ymax - ymin
         box_width = xmax - xmin
         
+        # Limiter les valeurs à la région de la bounding box étendue
+        margin = 1.2  # Élargir un peu au-delà de la box
+        y0 = max(0, int(center_y - box_height * margin / 2))
+        y1 = min(h, int(center_y + box_height * margin / 2))
+        x0 = max(0, int(center_x - box_width * margin / 2))
+        x1 = min(w, int(center_x + box_width * margin / 2))
+        if y1 <= y0 or x1 <= x0:
+            return None
+        
         # Écart-type basé sur la taille de la box (plus large = plus diffus)
         sigma_y = box_height / 3.0
         sigma_x = box_width / 3.0
         
-        # Gaussienne 2D
-        gaussian = np.exp(-((x - center_x)**2 / (2 * sigma_x**2) + (y - center_y)**2 / (2 * sigma_y**2)))
+        y = np.arange(y0, y1, dtype=np.float32) - np.float32(center_y)
+        x = np.arange(x0, x1, dtype=np.float32) - np.float32(center_x)
+        gaussian_y = np.exp(-(y * y) / np.float32(2 * sigma_y**2))
+        gaussian_x = np.exp(-(x * x) / np.float32(2 * sigma_x**2))
         
-        # Appliquer l'intensité basée sur le score
-        gaussian *= intensity * 3.0  # Amplifier pour une meilleure visibilité
+        # Appliquer l'intensité basée sur le score (amplifiée pour une meilleure visibilité)
+        gaussian_y *= np.float32(intensity * 3.0)
         
-        # Limiter les valeurs à la région de la bounding box étendue
-        margin = 1.2  # Élargir un peu au-delà de la box
-        extended_ymin = max(0, int(center_y - box_height * margin / 2))
-        extended_ymax = min(h, int(center_y + box_height * margin / 2))
-        extended_xmin = max(0, int(center_x - box_width * margin / 2))
-        extended_xmax = min(w, int(center_x + box_width * margin / 2))
-        
-        # Masquer en dehors de la région étendue
-        mask = np.zeros_like(gaussian)
-        mask[extended_ymin:extended_ymax, extended_xmin:extended_xmax] = gaussian[extended_ymin:extended_ymax, extended_xmin:extended_xmax]
+        zone = heatmap[y0:y1, x0:x1]
+        np.maximum(zone, np.outer(gaussian_y, gaussian_x), out=zone)
+        return y0, x0, y1, x1
+    
+    def _create_gaussian_mask(self, h: int, w: int, bbox: Tuple[int, int, int, int], intensity: float) -> np.ndarray:
+        """
+        Crée un masque gaussien pleine taille pour une bounding box
         
+        Args:
+            h, w: Dimensions de l'image
+            bbox: (ymin, xmin, ymax, xmax)
+            intensity: Intensité basée sur le score de détection
+            
+        Returns:
+            Masque gaussien 2D (float32, nul hors de la box étendue)
+        """
+        mask = np.zeros((h, w), dtype=np.float32)
+        self._accumulate_gaussian(mask, bbox, intensity)
         return mask
     
     def create_contamination_overlay_pil(self, 
-                                       image_path: str, 
+                                       image: ImageSource, 
                                        detections: List[Dict],
                                        alpha: float = 0.5) -> Image.Image:
         """
         Version PIL pour créer un overlay de contamination plus artistique
         
         Args:
-            image_path: Chemin vers l'image
+            image: Image (chemin, bytes de l'upload ou tableau RGB déjà décodé)
             detections: Détections de contamination
             alpha: Transparence de l'overlay
             
@@ -164,7 +315,7 @@ class ContaminationHeatmapGenerator:
             Image PIL avec overlay
         """
         # Charger l'image originale
-        original_img = Image.open(image_path).convert('RGB')
+        original_img = ouvrir_image(image)
         w, h = original_img.size
         
         # Créer un calque pour l'overlay
@@ -203,7 +354,40 @@ class ContaminationHeatmapGenerator:
         # Mélanger avec l'image originale
         result = Image.alpha_composite(original_img.convert('RGBA'), overlay)
         return result.convert('RGB')
-    
+
+    def render(self, image: ImageSource, detections: List[Dict], style: str = "heatmap",
+               format: str = "png", quality: int = 85, max_side: Optional[int] = None,
+               compress_level: int = 6) -> Optional[Tuple[io.BytesIO, str]]:
+        """
+        Rend la heatmap ou l'overlay à partir de détections déjà calculées, encodé
+
+        Args:
+            image: Image (chemin, bytes de l'upload ou tableau RGB déjà décodé)
+            detections: Détections du modèle de vision
+            style: "heatmap" (zones gaussiennes) ou "overlay" (rectangles PIL)
+            format: png, jpeg ou webp
+            quality: Qualité JPEG/WebP
+            max_side: Plus grand côté de l'image rendue (None = taille d'origine) ;
+                appliqué avant le rendu, qui est d'autant moins coûteux
+            compress_level: Compression PNG
+
+        Returns:
+            (buffer encodé, type MIME), ou None si aucune contamination n'est détectée
+        """
+        if not any(d.get('class_name') == 'contaminated' for d in detections):
+            return None
+
+        with mesurer_etape("heatmap_render"):
+            image = limiter_taille(image, max_side)
+            if style == "overlay":
+                pil_img = self.create_contamination_overlay_pil(image, detections)
+            else:
+                pil_img = Image.fromarray(self.create_contamination_heatmap(image, detections))
+
+        with mesurer_etape("png_encode"):
+            buffer = encoder_image(pil_img, format, quality, compress_level)
+        return buffer, FORMATS_SORTIE[format][1]
+
     def save_heatmap_image(self, heatmap_img: np.ndarray, output_path: str):
         """Sauvegarde la heatmap"""
         if heatmap_img.dtype != np.uint8:
@@ -0,0 +1,142 @@
+"""
+Décodage des images en mémoire
+
+Les endpoints reçoivent l'image en bytes : on la décode une seule fois
+directement depuis le buffer d'upload (sans passer par un fichier), et le
+tableau décodé est partagé entre l'inférence et le rendu des heatmaps.
+
+Pour l'entrée du modèle (320x320), `decoder_redimensionne` évite de décoder
+les photos en pleine résolution : le décodeur JPEG réduit l'image dès la
+DCT (mode draft, facteur 1/2 à 1/8), puis OpenCV redimensionne directement
+dans un buffer fourni par l'appelant.
+"""
+import io
+import logging
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from api.config import config
+from api.metrics import mesurer_etape
+
+logger = logging.getLogger(__name__)
+
+# Sources acceptées : chemin, bytes, objet fichier, tableau RGB déjà décodé ou image PIL
+ImageSource = Union[str, Path, bytes, bytearray, memoryview, np.ndarray, Image.Image, Any]
+
+
+def ouvrir_image(source: ImageSource) -> Image.Image:
+    """
+    Ouvre une image en PIL RGB, quelle que soit la source.
+
+    Args:
+        source: Chemin, bytes, buffer, tableau numpy RGB ou image PIL
+
+    Returns:
+        Image PIL en mode RGB
+    """
+    if isinstance(source, Image.Image):
+        img = source
+    elif isinstance(source, np.ndarray):
+        return Image.fromarray(source)
+    else:
+        img = _ouvrir_fichier(source)
+        # Orientation EXIF appliquée : même image pour le modèle et pour les heatmaps
+        img = ImageOps.exif_transpose(img)
+
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def _ouvrir_fichier(source: ImageSource) -> Image.Image:
+    """Ouvre (sans décoder) une image depuis des bytes, un objet fichier ou un chemin"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    elif hasattr(source, "read"):
+        return Image.open(source)
+    return Image.open(str(source))
+
+
+def decoder_image(source: ImageSource) -> np.ndarray:
+    """
+    Décode une image en tableau uint8 (hauteur, largeur, 3) RGB.
+    Un tableau déjà décodé est retourné tel quel.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    with mesurer_etape("image_decode"):
+        return np.asarray(ouvrir_image(source), dtype=np.uint8)
+
+
+def taille_image(source: ImageSource) -> Tuple[int, int]:
+    """
+    (largeur, hauteur) de l'image telle qu'affichée (orientation EXIF appliquée),
+    lue dans l'en-tête sans décoder les pixels
+    """
+    if isinstance(source, np.ndarray):
+        return source.shape[1], source.shape[0]
+    img = source if isinstance(source, Image.Image) else _ouvrir_fichier(source)
+    width, height = img.size
+    if not isinstance(source, Image.Image) and img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def decoder_redimensionne(source: ImageSource, taille: Tuple[int, int],
+                          out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Décode une image directement à la taille d'entrée du modèle
+
+    Args:
+        source: Chemin, bytes, buffer, tableau numpy RGB ou image PIL
+        taille: (largeur, hauteur) de sortie
+        out: Buffer uint8 (hauteur, largeur, 3) à remplir (alloué si None)
+
+    Returns:
+        Tableau uint8 (hauteur, largeur, 3) RGB (`out` s'il est fourni)
+    """
+    width, height = taille
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+
+    if isinstance(source, np.ndarray) and source.shape == (height, width, 3) and source.dtype == np.uint8:
+        # Déjà décodée à la bonne taille (micro-batching) : simple copie
+        out[...] = source
+        return out
+
+    if not config.IMAGE_FAST_DECODE:
+        # Chemin d'origine : décodage complet puis redimensionnement PIL
+        out[...] = np.asarray(ouvrir_image(source).resize(taille), dtype=np.uint8)
+        return out
+
+    if isinstance(source, np.ndarray):
+        pixels = source
+    else:
+        if isinstance(source, Image.Image):
+            img = source
+        else:
+            img = _ouvrir_fichier(source)
+            if img.format == "JPEG":
+                # Orientation lue avant le décodage : une image tournée de 90° doit
+                # rester au moins aussi grande que la cible une fois transposée
+                orientation = img.getexif().get(0x0112, 1)
+                img.draft("RGB", (height, width) if orientation in (5, 6, 7, 8) else (width, height))
+            img = ImageOps.exif_transpose(img)
+        pixels = np.asarray(img if img.mode == "RGB" else img.convert("RGB"), dtype=np.uint8)
+
+    # INTER_AREA pour réduire (moyenne des pixels, vectorisé), INTER_LINEAR pour agrandir
+    interpolation = cv2.INTER_AREA if pixels.shape[1] >= width and pixels.shape[0] >= height else cv2.INTER_LINEAR
+    cv2.resize(pixels, (width, height), dst=out, interpolation=interpolation)
+    return out
+
+
+def sauvegarder_image(file_path: Union[str, Path], content: bytes):
+    """Écrit l'image uploadée sur disque (appelé en tâche de fond)"""
+    try:
+        with mesurer_etape("disk_write"), open(file_path, "wb") as f:
+            f.write(content)
+        logger.info(f"💾 Image sauvegardée: {file_path} ({len(content)} bytes)")
+    except OSError as e:
+        logger.error(f"❌ Impossible de sauvegarder l'image {file_path}: {e}")
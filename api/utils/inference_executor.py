@@ -0,0 +1,168 @@
+"""
+Exécuteur dédié aux inférences des modèles
+
+Les endpoints FastAPI sont en `async def`, mais CatBoost et le SavedModel SSD
+sont des appels bloquants. Tout passe donc par un pool de threads borné pour
+que la boucle asyncio d'uvicorn reste libre (les autres requêtes, même
+`/status`, ne doivent plus attendre derrière une inférence SSD).
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceExecutor:
+    """
+    Pool de threads borné pour les appels aux modèles, avec statistiques
+    de file d'attente (profondeur, temps d'attente, temps d'exécution).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None):
+        """
+        Args:
+            max_workers: Nombre de threads d'inférence (défaut: dérivé du nombre de cœurs)
+            intra_op_threads: Threads TF par opération (défaut: cœurs / workers)
+            inter_op_threads: Threads TF entre opérations (défaut: nombre de workers)
+        """
+        cpu_count = os.cpu_count() or 1
+        self.cpu_count = cpu_count
+        self.max_workers = max_workers or max(1, min(4, cpu_count // 2))
+
+        # Partage des cœurs : chaque worker dispose d'une part du pool intra-op TF
+        self.intra_op_threads = intra_op_threads or max(1, cpu_count // self.max_workers)
+        self.inter_op_threads = inter_op_threads or self.max_workers
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference"
+        )
+
+        # Statistiques (protégées par un verrou, les workers les mettent à jour)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._queued = 0
+        self._running = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+        self._max_run = 0.0
+
+        logger.info(
+            f"Exécuteur d'inférence: {self.max_workers} worker(s), "
+            f"TF intra-op={self.intra_op_threads}, inter-op={self.inter_op_threads}"
+        )
+
+    def configure_tensorflow(self) -> bool:
+        """
+        Applique le partage des threads à TensorFlow.
+        Doit être appelé avant la première opération TF (sinon TF refuse).
+
+        Returns:
+            bool: True si la configuration a été appliquée
+        """
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(self.intra_op_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(self.inter_op_threads)
+            return True
+        except RuntimeError as e:
+            # Runtime TF déjà initialisé : on garde la configuration existante
+            logger.warning(f"Threads TensorFlow non configurés (runtime déjà initialisé): {e}")
+            return False
+        except ImportError:
+            logger.warning("TensorFlow non disponible, configuration des threads ignorée")
+            return False
+
+    def _execute(self, submitted_at: float, fn: Callable, *args, **kwargs) -> Any:
+        """Exécute l'appel dans un worker en mesurant attente et durée"""
+        started_at = time.perf_counter()
+        wait = started_at - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            run = time.perf_counter() - started_at
+            with self._lock:
+                self._running -= 1
+                self._total_run += run
+                self._max_run = max(self._max_run, run)
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Exécute `fn(*args, **kwargs)` dans le pool sans bloquer la boucle asyncio.
+
+        Returns:
+            Le résultat de `fn`
+        """
+        with self._lock:
+            self._submitted += 1
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+
+        call = functools.partial(self._execute, time.perf_counter(), fn, *args, **kwargs)
+        # Le contexte (identifiant de requête pour les logs) suit l'appel dans le worker
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, call)
+        future.add_done_callback(self._sur_annulation)
+        # Annuler l'attente (client déconnecté) annule aussi l'appel s'il n'a pas démarré
+        return await asyncio.wrap_future(future)
+
+    def _sur_annulation(self, future):
+        """Un appel annulé avant son démarrage ne passe jamais par _execute : on le retire de la file"""
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._cancelled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques courantes de l'exécuteur"""
+        with self._lock:
+            started = self._completed + self._failed + self._running
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "tf_intra_op_threads": self.intra_op_threads,
+                "tf_inter_op_threads": self.inter_op_threads,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "queue_depth": self._queued,
+                "max_queue_depth": self._max_queue_depth,
+                "in_flight": self._running,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 3) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_run_ms": round(self._total_run / finished * 1000, 3) if finished else 0.0,
+                "max_run_ms": round(self._max_run * 1000, 3)
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Arrête le pool de threads"""
+        self._executor.shutdown(wait=wait)
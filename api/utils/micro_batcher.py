@@ -0,0 +1,211 @@
+"""
+Micro-batching dynamique devant le modèle SSD
+
+Les requêtes concurrentes arrivent chacune dans un thread de l'exécuteur
+d'inférence. Chaque appelant décode son image dans son propre thread, puis
+dépose le tableau à la taille du modèle ; le thread du batcher regroupe les
+tableaux prêts et lance un seul appel `serving_default`, puis redistribue les
+résultats à chaque appelant.
+
+Un appelant bloque son worker jusqu'au résultat : un lot ne dépasse donc
+jamais le nombre de workers de l'exécuteur (`max_batch_size` est borné par
+l'appelant du constructeur). Le lot part dès qu'aucun autre appelant n'est
+en train de décoder : on n'attend `max_wait_ms` que si une image est sur le
+point d'arriver, jamais pour une requête isolée.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class VisionMicroBatcher:
+    """
+    Regroupe les prédictions vision concurrentes en lots.
+
+    Un thread dédié collecte les images décodées jusqu'à `max_batch_size`,
+    tant que d'autres appelants décodent encore, sans dépasser `max_wait_ms`
+    depuis la première demande du lot.
+    """
+
+    def __init__(self, model_provider: Callable[[], Any],
+                 max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0):
+        """
+        Args:
+            model_provider: Fonction qui retourne le VisionModel courant
+                (appelée à chaque lot, pour suivre les rechargements)
+            max_batch_size: Nombre maximum d'images par appel SSD
+            max_wait_ms: Attente maximale pour compléter un lot (millisecondes)
+        """
+        self.model_provider = model_provider
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        # Images prêtes, et appelants encore en train de décoder la leur
+        self._condition = threading.Condition()
+        self._pending: "Deque[Tuple[Any, Future, float, Any]]" = deque()
+        self._preparing = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # Métriques par lot
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._max_batch_seen = 0
+        self._size_histogram: Dict[int, int] = {}
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._total_batch_latency = 0.0
+        self._max_batch_latency = 0.0
+        self._direct = 0
+
+    def _demarrer(self):
+        """Démarre le thread de collecte au premier appel"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._boucle, name="vision-micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def predict(self, image: Any, model: Any = None) -> Dict[str, Any]:
+        """
+        Prédiction vision via le micro-batching (bloquant pour l'appelant)
+
+        Args:
+            image: Image à analyser (même format que VisionModel.predict)
+            model: VisionModel à utiliser (None = model_provider). Permet à une
+                requête commencée avant un rechargement de finir sur l'ancienne version.
+
+        Returns:
+            Le résultat de prédiction de cette image
+        """
+        if model is None:
+            model = self.model_provider()
+
+        # Modèle sans dimension batch libre (TFLite, Keras...) : rien à regrouper,
+        # l'inférence reste parallèle dans le thread de l'appelant
+        if not getattr(model, "supports_batching", False):
+            with self._stats_lock:
+                self._direct += 1
+            return model.predict(image)
+
+        self._demarrer()
+        with self._condition:
+            self._preparing += 1
+        try:
+            # Décodage dans le thread de l'appelant, en parallèle des autres requêtes
+            entree = model.preparer_image(image)
+        except BaseException:
+            with self._condition:
+                self._preparing -= 1
+                self._condition.notify()
+            raise
+
+        future: Future = Future()
+        with self._condition:
+            self._preparing -= 1
+            self._pending.append((entree, future, time.perf_counter(), model))
+            self._condition.notify()
+        return future.result()
+
+    def _boucle(self):
+        """Collecte les images décodées et lance les lots"""
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = self._pending[0][2] + self.max_wait
+
+                # On n'attend que des images en cours de décodage, et au plus max_wait
+                while len(self._pending) < self.max_batch_size and self._preparing > 0:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))]
+
+            self._traiter_lot(batch)
+
+    def _traiter_lot(self, batch: List[Tuple[Any, Future, float, Any]]):
+        """Exécute un lot et redistribue les résultats aux appelants"""
+        started_at = time.perf_counter()
+
+        # Un sous-lot par version de modèle (pendant un rechargement, les deux peuvent coexister)
+        groups: Dict[int, Tuple[Any, list]] = {}
+        for item in batch:
+            model = item[3] if item[3] is not None else self.model_provider()
+            groups.setdefault(id(model), (model, []))[1].append(item)
+
+        failed = False
+        for model, items in groups.values():
+            failed = not self._executer(model, items) or failed
+
+        latency = time.perf_counter() - started_at
+        size = len(batch)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            if failed:
+                self._failed_batches += 1
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._size_histogram[size] = self._size_histogram.get(size, 0) + 1
+            for _, _, enqueued_at, _ in batch:
+                wait = started_at - enqueued_at
+                self._total_queue_wait += wait
+                self._max_queue_wait = max(self._max_queue_wait, wait)
+            self._total_batch_latency += latency
+            self._max_batch_latency = max(self._max_batch_latency, latency)
+
+        logger.debug("Lot vision: %s image(s) en %.1f ms", size, latency * 1000)
+
+    def _executer(self, model: Any, items: List[Tuple[Any, Future, float, Any]]) -> bool:
+        """Un appel batché sur un modèle ; retourne False si le lot a échoué"""
+        images = [item[0] for item in items]
+        try:
+            results = model.predict_batch(images)
+            for (_, future, _, _), result in zip(items, results):
+                future.set_result(result)
+            return True
+
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+            else:
+                # Une image invalide ne doit pas faire échouer tout le lot
+                logger.warning(f"Échec du lot de {len(items)} images, reprise image par image: {e}")
+                for image, future, _, _ in items:
+                    try:
+                        future.set_result(model.predict(image))
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Métriques de taille et de latence des lots"""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "items": self._items,
+                "failed_batches": self._failed_batches,
+                "pending": len(self._pending),
+                "preparing": self._preparing,
+                "direct_calls": self._direct,
+                "avg_batch_size": round(self._items / self._batches, 3) if self._batches else 0.0,
+                "max_batch_size_seen": self._max_batch_seen,
+                "batch_size_histogram": dict(sorted(self._size_histogram.items())),
+                "avg_queue_wait_ms": round(self._total_queue_wait / self._items * 1000, 3) if self._items else 0.0,
+                "max_queue_wait_ms": round(self._max_queue_wait * 1000, 3),
+                "avg_batch_latency_ms": round(self._total_batch_latency / self._batches * 1000, 3) if self._batches else 0.0,
+                "max_batch_latency_ms": round(self._max_batch_latency * 1000, 3)
+            }
@@ -1,28 +1,98 @@
 import logging
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 
+import numpy as np
+
 from api.models.catboost_model import CatBoostModel
 from api.models.vision_model import VisionModel
 from api.models.model_version_manager import ModelVersionManager
+from api.models.model_registry import model_registry
+from api.utils.micro_batcher import VisionMicroBatcher
+from api.utils.result_cache import PredictionResultCache, empreinte_image, normaliser_parametres
+from api.config import config
+from api.metrics import mesurer_etape, compter_decision
+from api.logging_config import ajouter_au_resume
 
 logger = logging.getLogger(__name__)
 
+
+class ModelBundle:
+    """
+    Modèles servis ensemble, remplacés d'un seul bloc lors d'un rechargement
+    
+    Une requête capture le bundle courant au début et l'utilise jusqu'au bout :
+    pendant un rechargement, elle termine sur l'ancienne version.
+    """
+    __slots__ = ("catboost_model", "vision_model", "versions_cle")
+    
+    def __init__(self, catboost_model: CatBoostModel, vision_model: VisionModel):
+        self.catboost_model = catboost_model
+        self.vision_model = vision_model
+        # Versions chargées (chemins résolus), utilisées dans la clé du cache
+        self.versions_cle = (
+            str(Path(catboost_model.model_path).resolve()) if catboost_model.model_path else None,
+            str(Path(vision_model.model_path).resolve()) if vision_model.model_path else None
+        )
+
+
 class PredictionService:
     
     
-    def __init__(self, catboost_model_path: str = None, vision_model_path: str = None):
+    def __init__(self, catboost_model_path: str = None, vision_model_path: str = None,
+                 max_concurrence: Optional[int] = None):
         """
         Initialise le service de prédiction
         
         Args:
             catboost_model_path: Chemin vers le modèle CatBoost
             vision_model_path: Chemin vers le modèle de vision
+            max_concurrence: Nombre de workers de l'exécuteur d'inférence
+                (borne la taille des lots du micro-batching)
         """
-        self.catboost_model = CatBoostModel(catboost_model_path)
-        self.vision_model = VisionModel(vision_model_path)
+        # Les instances chargées viennent du registre (partagées avec les routes heatmap),
+        # en attendant le chargement on garde des instances vides
+        self.catboost_model_path = catboost_model_path
+        self.vision_model_path = vision_model_path
+        self._bundle = ModelBundle(CatBoostModel(), VisionModel(vision_model_path))
         self._models_loaded = False
         
+        # Rechargement à chaud : un seul à la fois, état consultable via statut_rechargement()
+        self._reload_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self.reload_status: Dict[str, Any] = {"state": "idle"}
+        
+        # Durées du dernier chargement / préchauffage (secondes)
+        self.load_timings: Dict[str, float] = {}
+        
+        # Micro-batching devant le SSD (le provider suit les rechargements de modèle)
+        self.vision_batcher = None
+        if config.VISION_MICRO_BATCHING:
+            self.vision_batcher = VisionMicroBatcher(
+                model_provider=lambda: self.vision_model,
+                # Chaque appelant bloque un worker : un lot plus grand ne peut pas se former
+                max_batch_size=min(config.VISION_BATCH_MAX_SIZE, max_concurrence or config.VISION_BATCH_MAX_SIZE),
+                max_wait_ms=config.VISION_BATCH_MAX_WAIT_MS
+            )
+        
+        # Cache des résultats (image identique + mêmes paramètres + mêmes versions)
+        self.result_cache = None
+        if config.RESULT_CACHE_ENABLED:
+            self.result_cache = PredictionResultCache(
+                max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+                ttl_s=config.RESULT_CACHE_TTL_S,
+                max_bytes=int(config.RESULT_CACHE_MAX_MB * 1024 * 1024)
+            )
+
+        # Versions résolues au chargement ; les liens 'current' ne sont re-vérifiés
+        # (un stat) qu'au plus toutes les VERSION_CHECK_INTERVAL_S secondes
+        self._versions_lock = threading.Lock()
+        self._versions_signature = None
+        self._versions_checked_at = 0.0
+        
         # Initialiser le gestionnaire de versions pour récupérer les infos
         try:
             models_dir = Path(__file__).parent.parent / "models"
@@ -31,10 +101,72 @@ class PredictionService:
             logger.warning(f"Impossible d'initialiser le gestionnaire de versions: {e}")
             self.version_manager = None
     
-    def get_model_versions(self) -> Dict[str, str]:
+    @property
+    def models_loaded(self) -> bool:
+        """True si les deux modèles servis sont chargés"""
+        return self._models_loaded
+    
+    @property
+    def catboost_model(self) -> CatBoostModel:
+        """Modèle CatBoost actuellement servi"""
+        return self._bundle.catboost_model
+    
+    @property
+    def vision_model(self) -> VisionModel:
+        """Modèle de vision actuellement servi"""
+        return self._bundle.vision_model
+    
+    def get_model_versions(self, bundle: Optional[ModelBundle] = None) -> Dict[str, str]:
         """
         Récupère les versions des modèles actuellement chargés
         
+        Les versions sont calculées au chargement et gardées sur les modèles
+        (`version_info`) : pas d'accès disque par prédiction. Elles ne sont
+        recalculées que si la cible d'un lien 'current' a changé (inode/mtime).
+        
+        Args:
+            bundle: Modèles dont on veut les versions (défaut: ceux servis actuellement)
+        
+        Returns:
+            Dict avec les versions des modèles ML et DL
+        """
+        bundle = bundle or self._bundle
+        now = time.monotonic()
+        if now - self._versions_checked_at >= config.VERSION_CHECK_INTERVAL_S:
+            self._versions_checked_at = now
+            signature = self._signature_versions()
+            if signature != self._versions_signature:
+                self._rafraichir_versions(signature)
+        
+        return {
+            "catboost": (getattr(bundle.catboost_model, "version_info", None) or {}).get("version", "v1.0"),
+            "vision": (getattr(bundle.vision_model, "version_info", None) or {}).get("version", "v1.0")
+        }
+    
+    def _signature_versions(self):
+        """Empreinte des liens 'current' (None si pas de gestionnaire de versions)"""
+        if not self.version_manager:
+            return None
+        return self.version_manager.signature_liens_actuels()
+    
+    def _rafraichir_versions(self, signature=None, bundle: Optional[ModelBundle] = None):
+        """Résout les versions et les range sur les modèles (défaut: ceux servis actuellement)"""
+        bundle = bundle or self._bundle
+        with self._versions_lock:
+            versions = self._resoudre_versions(bundle.vision_model)
+            resolved_at = time.time()
+            bundle.catboost_model.version_info = {"version": versions["catboost"], "resolved_at": resolved_at}
+            bundle.vision_model.version_info = {"version": versions["vision"], "resolved_at": resolved_at}
+            self._versions_signature = signature if signature is not None else self._signature_versions()
+            self._versions_checked_at = time.monotonic()
+    
+    def _resoudre_versions(self, vision_model: VisionModel) -> Dict[str, str]:
+        """
+        Résolution complète des versions (symlinks, metadata.json, gestionnaire de versions)
+        
+        Args:
+            vision_model: Modèle de vision dont on lit les métadonnées et le chemin
+        
         Returns:
             Dict avec les versions des modèles ML et DL
         """
@@ -45,8 +177,8 @@ class PredictionService:
         
         try:
             # PRIORITE 1: Lire directement depuis les métadonnées du VisionModel chargé
-            if self.vision_model and hasattr(self.vision_model, 'metadata') and self.vision_model.metadata:
-                metadata_version = self.vision_model.metadata.get('version', None)
+            if vision_model and hasattr(vision_model, 'metadata') and vision_model.metadata:
+                metadata_version = vision_model.metadata.get('version', None)
                 if metadata_version:
                     versions["vision"] = f"v{metadata_version}"
                     logger.info(f"🎯 Version Vision depuis métadonnées chargées: v{metadata_version}")
@@ -95,10 +227,10 @@ class PredictionService:
                     logger.warning(f"Erreur récupération version Vision via manager: {e}")
             
             # PRIORITE 4: Extraire depuis le chemin du modèle vision comme dernier fallback
-            if versions["vision"] == "v1.0" and self.vision_model and self.vision_model.est_charge():
+            if versions["vision"] == "v1.0" and vision_model and vision_model.est_charge():
                 try:
-                    if hasattr(self.vision_model, 'model_path'):
-                        model_path = str(self.vision_model.model_path)
+                    if hasattr(vision_model, 'model_path'):
+                        model_path = str(vision_model.model_path)
                         logger.info(f"📂 Chemin du modèle Vision: {model_path}")
                         
                         # Extraire la version depuis le chemin (ex: v1.6_20250719_200557)
@@ -125,20 +257,58 @@ class PredictionService:
         logger.info(f"🏷️  Versions finales des modèles: {versions}")
         return versions
     
-    def charger_modeles(self) -> bool:
+    def charger_modeles(self, forcer: bool = False, parallele: Optional[bool] = None) -> bool:
         """
-        Charge les deux modèles
+        Charge les deux modèles (via le registre, une seule fois par version)
+        
+        Args:
+            forcer: Recharger depuis le disque même si la version est déjà en mémoire
+            parallele: Charger CatBoost et le SavedModel en même temps
+                (défaut: config.PARALLEL_MODEL_LOADING)
         
         Returns:
             bool: True si tous les modèles sont chargés avec succès
         """
+        if parallele is None:
+            parallele = config.PARALLEL_MODEL_LOADING
         try:
-            logger.info("Chargement des modèles...")
-            
-            catboost_success = self.catboost_model.charger_modele()
-            vision_success = self.vision_model.charger_modele()
-            
-            self._models_loaded = catboost_success and vision_success
+            logger.info("Chargement des modèles%s...", " en parallèle" if parallele else "")
+            
+            started_at = time.perf_counter()
+            timings = {}
+            
+            def charger(nom, obtenir, chemin):
+                debut = time.perf_counter()
+                model = obtenir(chemin, forcer=forcer)
+                timings[f"{nom}_load_s"] = round(time.perf_counter() - debut, 3)
+                return model
+            
+            if parallele:
+                # Le chargement TF et la désérialisation CatBoost relâchent le GIL pour l'essentiel
+                with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load") as pool:
+                    catboost_future = pool.submit(charger, "catboost", model_registry.obtenir_modele_catboost,
+                                                  self.catboost_model_path)
+                    vision_future = pool.submit(charger, "vision", model_registry.obtenir_modele_vision,
+                                                self.vision_model_path)
+                    bundle = ModelBundle(catboost_future.result(), vision_future.result())
+            else:
+                bundle = ModelBundle(
+                    charger("catboost", model_registry.obtenir_modele_catboost, self.catboost_model_path),
+                    charger("vision", model_registry.obtenir_modele_vision, self.vision_model_path)
+                )
+            timings["load_s"] = round(time.perf_counter() - started_at, 3)
+            self.load_timings = timings
+            catboost_success = bundle.catboost_model.est_charge()
+            vision_success = bundle.vision_model.est_charge()
+            
+            # Versions calculées une fois par chargement
+            self._rafraichir_versions(bundle=bundle)
+            
+            if bundle.versions_cle != self._bundle.versions_cle and self.result_cache is not None:
+                self.result_cache.invalider()
+            with self._swap_lock:
+                self._bundle = bundle
+                self._models_loaded = catboost_success and vision_success
             
             if self._models_loaded:
                 logger.info("Tous les modèles sont chargés avec succès")
@@ -151,13 +321,50 @@ class PredictionService:
             logger.error(f"Erreur lors du chargement des modèles: {e}")
             return False
     
+    def evaluer_catboost(self,
+                         race_champignon: str,
+                         type_substrat: str,
+                         jours_inoculation: int,
+                         hygrometrie: float,
+                         co2_ppm: float,
+                         bundle: Optional[ModelBundle] = None) -> Tuple[ModelBundle, Dict[str, Any]]:
+        """
+        Première étape de predict seule : CatBoost sur les paramètres, avant
+        de toucher à l'image (qui n'est utile que si le risque est élevé)
+        
+        Args:
+            bundle: Modèles à utiliser (None = modèles courants)
+        
+        Returns:
+            (modèles utilisés, résultat CatBoost), à repasser à predict via `catboost_prealable`
+        """
+        if bundle is None:
+            if not self._models_loaded:
+                if not self.charger_modeles():
+                    raise RuntimeError("Impossible de charger les modèles")
+            bundle = self._bundle
+        
+        input_data = {
+            "race_champignon": race_champignon,
+            "type_substrat": type_substrat,
+            "jours_inoculation": jours_inoculation,
+            "hygrometrie": hygrometrie,
+            "co2_ppm": co2_ppm
+        }
+        with mesurer_etape("catboost_inference"):
+            return bundle, bundle.catboost_model.predict(input_data)
+    
     def predict(self, 
                 race_champignon: str,
                 type_substrat: str,
                 jours_inoculation: int,
                 hygrometrie: float,
                 co2_ppm: float,
-                image_path: str = None) -> Dict[str, Any]:
+                image_path: str = None,
+                image: Any = None,
+                catboost_prealable: Optional[Tuple[ModelBundle, Dict[str, Any]]] = None,
+                image_ignoree: bool = False,
+                image_hash: Optional[str] = None) -> Dict[str, Any]:
         """
         Effectue une prédiction orchestrée
         
@@ -168,50 +375,64 @@ class PredictionService:
             hygrometrie: Taux d'hygrométrie
             co2_ppm: Taux de CO2 en PPM
             image_path: Chemin vers l'image (optionnel)
+            image: Image en mémoire, bytes de l'upload ou tableau RGB décodé (optionnel,
+                prioritaire sur image_path : pas d'aller-retour disque)
+            catboost_prealable: Résultat de evaluer_catboost pour ces paramètres
+                (CatBoost n'est pas réévalué, les mêmes modèles sont utilisés)
+            image_ignoree: Une image a été envoyée mais pas lue, le risque CatBoost
+                étant faible (la note de la réponse le précise)
+            image_hash: Empreinte des octets de l'image, déjà calculée par l'appelant
+                (None = calculée ici) : une même photo a la même clé de cache, qu'elle
+                arrive en bytes ou déjà décodée
             
         Returns:
             Dict contenant les résultats de prédiction
         """
-        logger.info("=== DÉBUT DE PRÉDICTION SERVICE ===")
-        logger.info(f"Paramètres: race_champignon={race_champignon}, type_substrat={type_substrat}")
-        logger.info(f"Valeurs numériques: jours_inoculation={jours_inoculation}, hygrometrie={hygrometrie}, co2_ppm={co2_ppm}")
-        logger.info(f"Image fournie: {image_path is not None}")
+        logger.debug("=== DÉBUT DE PRÉDICTION SERVICE ===")
+        logger.debug("Paramètres: race_champignon=%s, type_substrat=%s", race_champignon, type_substrat)
+        logger.debug("Valeurs numériques: jours_inoculation=%s, hygrometrie=%s, co2_ppm=%s", jours_inoculation, hygrometrie, co2_ppm)
+        logger.debug("Image fournie: %s", image is not None or image_path is not None)
         
         if not self._models_loaded:
-            logger.info("Modèles non chargés, tentative de chargement...")
+            logger.debug("Modèles non chargés, tentative de chargement...")
             if not self.charger_modeles():
                 logger.error("❌ Impossible de charger les modèles")
                 raise RuntimeError("Impossible de charger les modèles")
-            logger.info("✅ Modèles chargés avec succès")
+            logger.debug("✅ Modèles chargés avec succès")
+        
+        # Modèles utilisés de bout en bout par cette requête (même si un rechargement a lieu)
+        bundle = catboost_prealable[0] if catboost_prealable is not None else self._bundle
+        
+        # Cache : même image, mêmes paramètres et mêmes versions de modèles
+        cache_key = None
+        if self.result_cache is not None:
+            if image_hash is None:
+                image_hash = empreinte_image(image, image_path)
+            if image_hash is not None:
+                cache_key = (
+                    image_hash,
+                    normaliser_parametres(race_champignon, type_substrat, jours_inoculation, hygrometrie, co2_ppm),
+                    bundle.versions_cle
+                )
+                cached = self.result_cache.obtenir(cache_key)
+                if cached is not None:
+                    logger.debug("⚡ Résultat servi depuis le cache: %s", cached['final_decision'])
+                    compter_decision(cached)
+                    self._resumer(cached, cache_hit=True)
+                    return cached
         
         try:
             # Étape 1: Prédiction CatBoost
-            logger.info("=== ÉTAPE 1: Prédiction CatBoost ===")
-            
-            # Préparation des données pour CatBoost
-            input_data = {
-                "race_champignon": race_champignon,
-                "type_substrat": type_substrat,
-                "jours_inoculation": jours_inoculation,
-                "hygrometrie": hygrometrie,
-                "co2_ppm": co2_ppm
-            }
-            logger.info(f"Données préparées pour CatBoost: {input_data}")
-            
-            catboost_result = self.catboost_model.predict(input_data)
-            logger.info(f"✅ Résultat CatBoost: {catboost_result}")
+            logger.debug("=== ÉTAPE 1: Prédiction CatBoost ===")
+            if catboost_prealable is None:
+                catboost_prealable = self.evaluer_catboost(
+                    race_champignon, type_substrat, jours_inoculation, hygrometrie, co2_ppm, bundle=bundle
+                )
+            catboost_result = catboost_prealable[1]
+            logger.debug("✅ Résultat CatBoost: %s", catboost_result)
             
             # Structure de réponse de base
-            response = {
-                "catboost_prediction": catboost_result,
-                "vision_prediction": None,
-                "final_decision": None,
-                "confidence_score": catboost_result["confidence"],  # CORRIGÉ: Utiliser confidence (float) au lieu de probability (list)
-                "confidence_source": "catboost",  # Nouvelle information sur la source de confiance
-                "models_used": ["catboost"],
-                "analysis_steps": ["catboost_analysis"],
-                "multi_sac_count": None  # Nouvelle information sur le nombre de sacs
-            }
+            response = self._reponse_de_base(catboost_result)
             
             # Étape 2: Décision d'utiliser la vision
             catboost_prediction = catboost_result["prediction"]
@@ -221,33 +442,22 @@ class PredictionService:
             
             if catboost_result["risk_level"] == "high":  # Risque élevé (probabilité > 0.49)
                 use_vision = True
-                logger.info(f"CatBoost détecte un risque élevé (confiance={catboost_confidence:.3f}), passage au modèle de vision")
+                logger.debug("CatBoost détecte un risque élevé (confiance=%.3f), passage au modèle de vision", catboost_confidence)
             else:
-                logger.info(f"CatBoost détecte un risque faible (confiance={catboost_confidence:.3f}), pas de passage au modèle de vision")
+                logger.debug("CatBoost détecte un risque faible (confiance=%.3f), pas de passage au modèle de vision", catboost_confidence)
             
             # Étape 3: Prédiction Vision si nécessaire
-            if use_vision and image_path:
-                if not Path(image_path).exists():
+            has_image = image is not None or bool(image_path)
+            if use_vision and has_image:
+                if image is None and not Path(image_path).exists():
                     logger.warning(f"Image non trouvée: {image_path}")
                     response["final_decision"] = catboost_prediction
                     response["warning"] = "Image non trouvée, utilisation du résultat CatBoost uniquement"
                 else:
                     try:
-                        logger.info("Étape 2: Prédiction Vision")
-                        vision_result = self.vision_model.predict(image_path)
-                        response["vision_prediction"] = vision_result
-                        response["models_used"].append("vision")
-                        response["analysis_steps"].append("vision_analysis")
-                        
-                        # Ajouter les informations de Vision
-                        response["multi_sac_count"] = vision_result.get("multi_sac_value", None)
-                        response["confidence_source"] = "vision"  # La confiance vient maintenant de Vision
-                        
-                        # Combinaison des résultats
-                        response["final_decision"] = self._combine_predictions(
-                            catboost_result, vision_result
-                        )
-                        response["confidence_score"] = vision_result.get("confidence", 0.5)  # Utiliser directement la confiance de Vision
+                        logger.debug("Étape 2: Prédiction Vision")
+                        vision_result = self._predict_vision(image if image is not None else image_path, bundle.vision_model)
+                        self._appliquer_vision(response, catboost_result, vision_result)
                         
                     except Exception as e:
                         logger.error(f"Erreur lors de la prédiction vision: {e}")
@@ -256,26 +466,153 @@ class PredictionService:
             else:
                 # Utilisation du résultat CatBoost uniquement
                 response["final_decision"] = catboost_prediction
-                if not image_path:
+                if image_ignoree:
+                    response["note"] = "Risque CatBoost faible, image non analysée, utilisation du modèle CatBoost uniquement"
+                elif not has_image:
                     response["note"] = "Aucune image fournie, utilisation du modèle CatBoost uniquement"
             
             # Ajouter les versions des modèles
-            response["model_versions"] = self.get_model_versions()
+            with mesurer_etape("version_lookup"):
+                response["model_versions"] = self.get_model_versions(bundle)
+            compter_decision(response)
+            self._resumer(response, cache_hit=False if cache_key is not None else None)
+            
+            # Les résultats dégradés (image absente, erreur vision) ne sont pas mis en cache
+            if cache_key is not None and "error" not in response and "warning" not in response:
+                self.result_cache.enregistrer(cache_key, response)
             
-            logger.info(f"✅ Prédiction finale: {response['final_decision']}")
-            logger.info("=== FIN DE PRÉDICTION SERVICE ===")
+            logger.debug("✅ Prédiction finale: %s", response['final_decision'])
+            logger.debug("=== FIN DE PRÉDICTION SERVICE ===")
             return response
             
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            logger.error(f"❌ ERREUR CRITIQUE dans prediction_service:")
-            logger.error(f"Type d'erreur: {type(e).__name__}")
-            logger.error(f"Message: {str(e)}")
-            logger.error(f"Traceback complet:\n{error_details}")
-            logger.error("=== FIN DE PRÉDICTION SERVICE (ERREUR) ===")
+            logger.exception("❌ ERREUR CRITIQUE dans prediction_service: %s: %s", type(e).__name__, e)
             raise
     
+    def predict_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Prédiction orchestrée sur un lot (plusieurs sacs en une requête)
+        
+        CatBoost est évalué sur toutes les lignes en un seul appel, puis la
+        vision ne tourne que sur les lignes à risque élevé, par lots SSD.
+        
+        Args:
+            items: Liste de dicts avec les paramètres de predict et `image`
+                (bytes/tableau en mémoire) ou `image_path`
+            
+        Returns:
+            Liste de réponses (même structure que predict), dans l'ordre des items
+        """
+        if not self._models_loaded:
+            if not self.charger_modeles():
+                raise RuntimeError("Impossible de charger les modèles")
+        
+        bundle = self._bundle
+        
+        # Étape 1: CatBoost vectorisé sur tout le lot
+        with mesurer_etape("catboost_inference"):
+            catboost_results = bundle.catboost_model.predict_many(items)
+        responses = [self._reponse_de_base(result) for result in catboost_results]
+        
+        # Étape 2: Sélection des lignes qui nécessitent la vision
+        vision_indices = []
+        for i, (item, catboost_result) in enumerate(zip(items, catboost_results)):
+            image_path = item.get("image_path")
+            responses[i]["final_decision"] = catboost_result["prediction"]
+            if item.get("image") is None and not image_path:
+                # Comme predict : la note est donnée quel que soit le risque
+                responses[i]["note"] = "Aucune image fournie, utilisation du modèle CatBoost uniquement"
+                continue
+            if catboost_result["risk_level"] != "high":
+                continue
+            if item.get("image") is not None:
+                vision_indices.append(i)
+            elif not Path(image_path).exists():
+                responses[i]["warning"] = "Image non trouvée, utilisation du résultat CatBoost uniquement"
+            else:
+                vision_indices.append(i)
+        
+        logger.debug("Lot de %s ligne(s): %s analyse(s) vision nécessaire(s)", len(items), len(vision_indices))
+        
+        # Étape 3: Vision par paquets de la taille d'un lot SSD
+        chunk_size = max(1, config.VISION_BATCH_MAX_SIZE)
+        for start in range(0, len(vision_indices), chunk_size):
+            chunk = vision_indices[start:start + chunk_size]
+            images = [
+                items[i]["image"] if items[i].get("image") is not None else items[i]["image_path"]
+                for i in chunk
+            ]
+            try:
+                vision_results = bundle.vision_model.predict_batch(images)
+            except Exception as e:
+                # Reprise image par image pour isoler l'image en erreur
+                logger.warning(f"Échec du lot vision, reprise image par image: {e}")
+                vision_results = []
+                for image in images:
+                    try:
+                        vision_results.append(bundle.vision_model.predict(image))
+                    except Exception as item_error:
+                        vision_results.append(item_error)
+            
+            for i, vision_result in zip(chunk, vision_results):
+                if isinstance(vision_result, Exception):
+                    responses[i]["error"] = f"Erreur vision: {str(vision_result)}"
+                else:
+                    self._appliquer_vision(responses[i], catboost_results[i], vision_result)
+        
+        with mesurer_etape("version_lookup"):
+            versions = self.get_model_versions(bundle)
+        for response in responses:
+            response["model_versions"] = versions
+            compter_decision(response)
+        
+        return responses
+    
+    def _resumer(self, response: Dict[str, Any], **champs):
+        """Reporte la décision dans la ligne de résumé de la requête"""
+        ajouter_au_resume(
+            decision=response.get("final_decision"),
+            models_used="+".join(response.get("models_used", [])),
+            confidence=round(float(response.get("confidence_score") or 0.0), 3),
+            **{cle: valeur for cle, valeur in champs.items() if valeur is not None}
+        )
+    
+    def _reponse_de_base(self, catboost_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Structure de réponse initiale à partir du résultat CatBoost"""
+        return {
+            "catboost_prediction": catboost_result,
+            "vision_prediction": None,
+            "final_decision": None,
+            "confidence_score": catboost_result["confidence"],  # CORRIGÉ: Utiliser confidence (float) au lieu de probability (list)
+            "confidence_source": "catboost",  # Nouvelle information sur la source de confiance
+            "models_used": ["catboost"],
+            "analysis_steps": ["catboost_analysis"],
+            "multi_sac_count": None  # Nouvelle information sur le nombre de sacs
+        }
+    
+    def _appliquer_vision(self, response: Dict[str, Any], catboost_result: Dict[str, Any],
+                          vision_result: Dict[str, Any]):
+        """Complète la réponse avec le résultat vision et la décision combinée"""
+        response["vision_prediction"] = vision_result
+        response["models_used"].append("vision")
+        response["analysis_steps"].append("vision_analysis")
+        
+        # Ajouter les informations de Vision
+        response["multi_sac_count"] = vision_result.get("multi_sac_value", None)
+        response["confidence_source"] = "vision"  # La confiance vient maintenant de Vision
+        
+        # Combinaison des résultats
+        response["final_decision"] = self._combine_predictions(
+            catboost_result, vision_result
+        )
+        response["confidence_score"] = vision_result.get("confidence", 0.5)  # Utiliser directement la confiance de Vision
+    
+    def _predict_vision(self, image: Any, vision_model: VisionModel) -> Dict[str, Any]:
+        """Prédiction vision (chemin, bytes ou tableau), via le micro-batching si activé"""
+        if self.vision_batcher is not None:
+            return self.vision_batcher.predict(image, vision_model)
+        return vision_model.predict(image)
+    
     def _combine_predictions(self, catboost_result: Dict, vision_result: Dict) -> str:
         """
         Combine les prédictions des deux modèles
@@ -293,13 +630,13 @@ class PredictionService:
         vision_pred = vision_result["prediction"]
         vision_confidence = vision_result.get("confidence", 0.5)
         
-        logger.info(f"Combinaison des prédictions:")
-        logger.info(f"  - CatBoost: {catboost_pred} (risque: {catboost_risk})")
-        logger.info(f"  - Vision: {vision_pred} (confiance: {vision_confidence:.3f})")
+        logger.debug("Combinaison des prédictions:")
+        logger.debug("  - CatBoost: %s (risque: %s)", catboost_pred, catboost_risk)
+        logger.debug("  - Vision: %s (confiance: %.3f)", vision_pred, vision_confidence)
         
         # NOUVEAU: Gestion du cas "incertain" de Vision
         if vision_pred == "incertain":
-            logger.info("Vision incertain -> utilisation de CatBoost avec prudence")
+            logger.debug("Vision incertain -> utilisation de CatBoost avec prudence")
             # Si CatBoost est très confiant, on peut s'y fier
             catboost_prob = max(catboost_result["probability"])
             if catboost_risk == "high" and catboost_prob > 0.9:
@@ -309,37 +646,37 @@ class PredictionService:
         
         # NOUVEAU: Gestion des scores modérés de Vision (0.3-0.6)
         if 0.3 <= vision_confidence <= 0.6:
-            logger.info(f"Vision avec confiance modérée ({vision_confidence:.3f})")
+            logger.debug("Vision avec confiance modérée (%.3f)", vision_confidence)
             # Dans ce cas, on fait plus confiance à la cohérence entre les deux modèles
             if catboost_risk == "high" and vision_pred == "contamine":
-                logger.info("Accord CatBoost (risque élevé) + Vision (contaminé) -> contaminé")
+                logger.debug("Accord CatBoost (risque élevé) + Vision (contaminé) -> contaminé")
                 return "contamine"
             elif catboost_risk == "low" and vision_pred == "sain":
-                logger.info("Accord CatBoost (risque faible) + Vision (sain) -> sain")
+                logger.debug("Accord CatBoost (risque faible) + Vision (sain) -> sain")
                 return "sain"
             else:
                 # Désaccord avec confiance modérée -> être conservateur
-                logger.info("Désaccord avec confiance modérée -> sain par précaution")
+                logger.debug("Désaccord avec confiance modérée -> sain par précaution")
                 return "sain"
         
         # Si Vision est confiant (>60%), on suit sa décision
         elif vision_confidence > 0.60:
-            logger.info(f"Vision confiant ({vision_confidence:.3f}), décision: {vision_pred}")
+            logger.debug("Vision confiant (%.3f), décision: %s", vision_confidence, vision_pred)
             return vision_pred
         
         # Si Vision est moyennement confiant (>40%), on considère les deux modèles
         elif vision_confidence > 0.40:
             if catboost_risk == "high" and vision_pred == "contamine":
                 # Les deux modèles s'accordent sur la contamination
-                logger.info("Accord entre CatBoost (risque élevé) et Vision (contaminé)")
+                logger.debug("Accord entre CatBoost (risque élevé) et Vision (contaminé)")
                 return "contamine"
             elif catboost_risk == "low" and vision_pred == "sain":
                 # Les deux modèles s'accordent sur la propreté
-                logger.info("Accord entre CatBoost (risque faible) et Vision (sain)")
+                logger.debug("Accord entre CatBoost (risque faible) et Vision (sain)")
                 return "sain"
             else:
                 # Désaccord : on privilégie Vision car il voit l'image réelle
-                logger.info(f"Désaccord - CatBoost: {catboost_risk}, Vision: {vision_pred}. Priorité à Vision.")
+                logger.debug("Désaccord - CatBoost: %s, Vision: %s. Priorité à Vision.", catboost_risk, vision_pred)
                 return vision_pred
         
         # Si Vision n'est pas confiant (<40%), on utilise CatBoost en backup AVEC PRUDENCE
@@ -348,7 +685,7 @@ class PredictionService:
             
             # NOUVEAU: Si Vision dit clairement "sain", même avec faible confiance, on le respecte
             if vision_pred == "sain":
-                logger.info("Vision dit 'sain' même avec faible confiance -> respecter cette décision")
+                logger.debug("Vision dit 'sain' même avec faible confiance -> respecter cette décision")
                 return "sain"
             
             # NOUVEAU: Si CatBoost dit "risque élevé" mais Vision n'est pas sûr, 
@@ -357,13 +694,13 @@ class PredictionService:
                 # Vérifier la probabilité exacte de CatBoost
                 catboost_prob = max(catboost_result["probability"])
                 if catboost_prob > 0.95:  # CatBoost TRÈS sûr (95%+)
-                    logger.info("CatBoost extrêmement confiant sur risque élevé, décision: contaminé")
+                    logger.debug("CatBoost extrêmement confiant sur risque élevé, décision: contaminé")
                     return "contamine"
                 else:
-                    logger.info("CatBoost moyennement confiant, Vision incertain -> sain par précaution")
+                    logger.debug("CatBoost moyennement confiant, Vision incertain -> sain par précaution")
                     return "sain"
             else:
-                logger.info("CatBoost indique risque faible, décision: sain")
+                logger.debug("CatBoost indique risque faible, décision: sain")
                 return "sain"
     
     def _calculate_combined_confidence(self, catboost_result: Dict, vision_result: Dict) -> float:
@@ -417,63 +754,126 @@ class PredictionService:
         return {
             "catboost_loaded": self.catboost_model.est_charge(),
             "vision_loaded": self.vision_model.est_charge(),
-            "all_models_ready": self._models_loaded
+            "all_models_ready": self._models_loaded,
+            "load_timings": dict(self.load_timings),
+            "vision_batching": self.vision_batcher.stats() if self.vision_batcher else None,
+            "result_cache": self.result_cache.stats() if self.result_cache else None
         }
     
     def recharger_modeles(self) -> bool:
         """
-        Recharge forcément tous les modèles (utile après une mise à jour)
+        Recharge à chaud tous les modèles (utile après une mise à jour)
+        
+        Les nouvelles versions sont chargées et préchauffées à côté des modèles
+        servis, puis échangées d'un bloc : les requêtes en cours terminent sur
+        l'ancienne version, aucune n'échoue pendant le rechargement. En cas
+        d'échec, l'ancienne version reste servie.
         
         Returns:
-            bool: True si le rechargement a réussi
+            bool: True si le rechargement a réussi (False s'il a échoué ou si
+                un rechargement est déjà en cours)
         """
+        if not self._reload_lock.acquire(blocking=False):
+            logger.warning("⚠️ Rechargement déjà en cours, demande ignorée")
+            return False
+        
+        status = self.reload_status = {"state": "loading", "started_at": time.time()}
         try:
-            logger.info("🔄 Rechargement forcé des modèles...")
-            
-            # Décharger les modèles actuels
-            self._models_loaded = False
-            
-            # FORCER LA REINSTANCE COMPLETE DU VISION MODEL
-            logger.info("🔄 Réinstanciation complète du VisionModel...")
-            
-            # Détruire complètement l'ancienne instance
-            self.vision_model = None
-            
-            # Créer une nouvelle instance qui va redétecter le chemin automatiquement
-            from ..models.vision_model import VisionModel
-            self.vision_model = VisionModel()  # Sans chemin pour forcer l'auto-détection
-            
-            # Forcer le rechargement du modèle CatBoost aussi
-            self.catboost_model._model = None
-            self.catboost_model._model_loaded = False
-            
-            # Recharger les modèles
-            result = self.charger_modeles()
-            
-            if result:
-                logger.info("✅ Rechargement des modèles réussi")
-                
-                # Log des nouvelles versions détectées
-                versions = self.get_model_versions()
-                logger.info(f"📋 Nouvelles versions détectées: {versions}")
-                
-                # Vérifier spécifiquement la version du modèle Vision
-                if hasattr(self.vision_model, 'metadata') and self.vision_model.metadata:
-                    vision_meta_version = self.vision_model.metadata.get('version', 'unknown')
-                    logger.info(f"🎯 Version Vision depuis métadonnées: {vision_meta_version}")
-                
-                if hasattr(self.vision_model, 'model_path'):
-                    logger.info(f"📁 Chemin Vision Model: {self.vision_model.model_path}")
-                
-                return True
-            else:
-                logger.error("❌ Échec du rechargement des modèles")
-                return False
+            logger.info("🔄 Rechargement à chaud des modèles...")
+            
+            # Sans chemin pour forcer l'auto-détection de la version Vision
+            self.vision_model_path = None
+            started_at = time.perf_counter()
+            catboost_model = model_registry.obtenir_modele_catboost(self.catboost_model_path, forcer=True)
+            vision_model = model_registry.obtenir_modele_vision(self.vision_model_path, forcer=True)
+            status["load_s"] = round(time.perf_counter() - started_at, 3)
+            if not (catboost_model.est_charge() and vision_model.est_charge()):
+                raise RuntimeError("Chargement des nouveaux modèles incomplet")
+            
+            # Premier appel (allocation, graphe TF) avant de recevoir du trafic
+            status["state"] = "warming"
+            started_at = time.perf_counter()
+            self._prechauffer(catboost_model, vision_model, max(1, config.MODEL_WARMUP_RUNS))
+            status["warmup_s"] = round(time.perf_counter() - started_at, 3)
+            
+            # Versions résolues avant l'échange : get_model_versions n'a rien à recalculer
+            bundle = ModelBundle(catboost_model, vision_model)
+            self._rafraichir_versions(bundle=bundle)
+            
+            status["state"] = "swapping"
+            started_at = time.perf_counter()
+            with self._swap_lock:
+                ancien = self._bundle
+                self._bundle = bundle
+                self._models_loaded = True
+            status["swap_ms"] = round((time.perf_counter() - started_at) * 1000, 3)
+            
+            # Les résultats en cache appartiennent aux anciennes versions
+            if self.result_cache is not None:
+                self.result_cache.invalider()
+            
+            # Les requêtes en cours gardent leur référence à l'ancien bundle
+            if ancien.vision_model is not vision_model:
+                model_registry.liberer(ancien.vision_model)
+            if ancien.catboost_model is not catboost_model:
+                model_registry.liberer(ancien.catboost_model)
+            
+            status["versions"] = self.get_model_versions(bundle)
+            status["state"] = "done"
+            logger.info(f"✅ Rechargement à chaud réussi: {status['versions']} "
+                        f"(chargement {status['load_s']}s, préchauffage {status['warmup_s']}s, "
+                        f"échange {status['swap_ms']}ms)")
+            return True
                 
         except Exception as e:
-            logger.error(f"❌ Erreur critique lors du rechargement: {e}")
-            self._models_loaded = False
+            status["state"] = "failed"
+            status["error"] = str(e)
+            logger.exception("❌ Échec du rechargement, l'ancienne version reste servie: %s", e)
             return False
+        finally:
+            status["finished_at"] = time.time()
+            self._reload_lock.release()
+    
+    def prechauffer(self, runs: Optional[int] = None) -> float:
+        """
+        Préchauffe les modèles servis (traçage du graphe, allocation des kernels)
+        
+        Args:
+            runs: Nombre d'inférences factices (défaut: config.MODEL_WARMUP_RUNS, 0 = aucune)
+        
+        Returns:
+            float: Durée du préchauffage (secondes)
+        """
+        runs = config.MODEL_WARMUP_RUNS if runs is None else runs
+        if runs <= 0 or not self._models_loaded:
+            return 0.0
+        
+        bundle = self._bundle
+        started_at = time.perf_counter()
+        self._prechauffer(bundle.catboost_model, bundle.vision_model, runs)
+        duration = time.perf_counter() - started_at
+        self.load_timings["warmup_s"] = round(duration, 3)
+        logger.info(f"🔥 Modèles préchauffés en {duration:.2f}s ({runs} inférence(s))")
+        return duration
+    
+    def _prechauffer(self, catboost_model: CatBoostModel, vision_model: VisionModel, runs: int = 1):
+        """Exécute quelques prédictions factices pour que la première vraie requête ne paie pas l'initialisation"""
+        # Forme de production : image RGB à la taille d'entrée du modèle
+        width, height = vision_model.input_size
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        for _ in range(max(1, runs)):
+            catboost_model.predict_many([{}])
+            vision_model.predict(image)
+        
+        # Taille de lot maximale du micro-batching, pour l'allocation des tenseurs de lot
+        if self.vision_batcher is not None and getattr(vision_model, "supports_batching", False):
+            vision_model.predict_batch([image] * self.vision_batcher.max_batch_size)
+    
+    def statut_rechargement(self) -> Dict[str, Any]:
+        """État du dernier rechargement (idle, loading, warming, swapping, done, failed)"""
+        status = dict(self.reload_status)
+        status["in_progress"] = self._reload_lock.locked()
+        return status
 
     def check_models_version_sync(self) -> bool:
         """
@@ -0,0 +1,161 @@
+"""
+Cache des résultats de prédiction
+
+Les agriculteurs renvoient souvent la même photo, et le frontend relance la
+prédiction sur des images déjà analysées. La clé combine l'empreinte du
+contenu de l'image, les paramètres normalisés et les versions des modèles
+chargés : un résultat n'est jamais servi pour une autre version de modèle.
+Éviction LRU + TTL, avec une limite de mémoire approximative.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def empreinte_image(image: Any = None, image_path: Optional[str] = None) -> Optional[str]:
+    """
+    Empreinte SHA-256 du contenu de l'image (None si pas d'image exploitable)
+
+    Args:
+        image: Bytes de l'upload ou tableau RGB décodé
+        image_path: Chemin de l'image, lu si `image` n'est pas fourni
+    """
+    if image is not None:
+        if isinstance(image, np.ndarray):
+            h = hashlib.sha256(str(image.shape).encode())
+            h.update(np.ascontiguousarray(image).data)
+            return h.hexdigest()
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(image).hexdigest()
+        return None  # Source non hachable (objet fichier...) : pas de cache
+
+    if image_path:
+        path = Path(image_path)
+        if not path.is_file():
+            return None
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for bloc in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloc)
+        return h.hexdigest()
+
+    return ""  # Pas d'image : prédiction CatBoost seule, cachable aussi
+
+
+def normaliser_parametres(race_champignon: str, type_substrat: str, jours_inoculation: int,
+                          hygrometrie: float, co2_ppm: float) -> Tuple:
+    """Paramètres sous une forme canonique (espaces et types des formulaires)"""
+    return (
+        str(race_champignon).strip(),
+        str(type_substrat).strip(),
+        int(jours_inoculation),
+        float(hygrometrie),
+        float(co2_ppm),
+    )
+
+
+class PredictionResultCache:
+    """Cache LRU + TTL des réponses de PredictionService.predict"""
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 3600.0, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Nombre maximal de réponses gardées
+            ttl_s: Durée de vie d'une réponse (secondes)
+            max_bytes: Mémoire maximale approximative (taille JSON des réponses)
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = {"lru": 0, "ttl": 0, "memory": 0}
+        self._invalidations = 0
+
+    def obtenir(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Réponse en cache pour cette clé (copie), ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, size, response = entry
+            if expires_at < time.monotonic():
+                self._retirer(key, size)
+                self._evictions["ttl"] += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+        # Copie : l'appelant peut modifier la réponse sans altérer le cache
+        return copy.deepcopy(response)
+
+    def enregistrer(self, key: Tuple, response: Dict[str, Any]):
+        """Ajoute une réponse au cache (ignorée si plus grosse que la limite mémoire)"""
+        size = len(json.dumps(response, default=str))
+        if size > self.max_bytes:
+            return
+
+        stored = copy.deepcopy(response)
+        with self._lock:
+            if key in self._entries:
+                self._retirer(key, self._entries[key][1])
+            self._entries[key] = (time.monotonic() + self.ttl_s, size, stored)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries:
+                self._evincer_plus_ancien("lru")
+            while self._bytes > self.max_bytes and self._entries:
+                self._evincer_plus_ancien("memory")
+
+    def invalider(self):
+        """Vide le cache (appelé quand les modèles changent de version)"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+        logger.info(f"🧹 Cache des prédictions invalidé ({count} entrée(s))")
+
+    def _retirer(self, key: Tuple, size: int):
+        del self._entries[key]
+        self._bytes -= size
+
+    def _evincer_plus_ancien(self, raison: str):
+        _, (_, size, _) = self._entries.popitem(last=False)
+        self._bytes -= size
+        self._evictions[raison] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Métriques du cache (hits/misses, taille, évictions)"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": dict(self._evictions),
+                "invalidations": self._invalidations,
+            }
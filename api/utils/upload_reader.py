@@ -0,0 +1,230 @@
+"""
+Lecture bornée des uploads d'images
+
+- `lire_upload` lit le fichier par morceaux : le type réel est reconnu aux
+  premiers octets (signature), et la lecture s'arrête dès que la taille
+  dépasse Config.MAX_FILE_SIZE, sans jamais garder plus en mémoire. Un
+  `BudgetUpload` partagé borne en plus le total des fichiers d'une requête.
+- `verifier_upload` applique les mêmes contrôles sans garder le contenu
+  (image reçue mais inutile à la prédiction).
+- `LimiteTailleRequete` (middleware ASGI) refuse les corps de requête trop
+  gros avant le parsing multipart : via Content-Length quand il est fourni,
+  sinon en comptant les octets reçus.
+"""
+import json
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+# Signatures (magic bytes) des formats acceptés -> extension canonique
+SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tiff"),
+    (b"MM\x00*", ".tiff"),
+)
+
+# Extensions équivalentes pour la comparaison avec Config.ALLOWED_EXTENSIONS
+EXTENSIONS_EQUIVALENTES = {".jpg": {".jpg", ".jpeg"}, ".tiff": {".tiff", ".tif"}}
+
+# Type MIME de chaque format reconnu (renvoi de l'image d'origine)
+TYPES_MIME = {".jpg": "image/jpeg", ".png": "image/png", ".bmp": "image/bmp", ".tiff": "image/tiff"}
+
+TAILLE_PREMIER_MORCEAU = 64 * 1024
+TAILLE_MORCEAU = 1024 * 1024
+
+
+class CorpsTropGros(HTTPException):
+    """Corps de requête au-delà de la limite (413)"""
+
+    def __init__(self, limite: int):
+        super().__init__(status_code=413, detail=f"Requête trop volumineuse (max {limite // (1024 * 1024)} MB)")
+
+
+class BudgetUpload:
+    """Taille totale restante pour les fichiers d'une même requête (lot)"""
+
+    def __init__(self, max_total: int):
+        """
+        Args:
+            max_total: Taille cumulée maximale des fichiers (octets)
+        """
+        self.max_total = max_total
+        self.restant = max_total
+
+    def verifier(self, taille: int):
+        """413 si `taille` octets de plus dépassent le budget"""
+        if taille > self.restant:
+            raise HTTPException(status_code=413, detail=f"Lot trop volumineux (max {self.max_total // (1024 * 1024)} MB d'images au total)")
+
+    def consommer(self, taille: int):
+        """Décompte `taille` octets lus"""
+        self.verifier(taille)
+        self.restant -= taille
+
+
+def detecter_format(debut: bytes) -> Optional[str]:
+    """Extension correspondant à la signature du fichier, ou None si non reconnue"""
+    for signature, extension in SIGNATURES:
+        if debut.startswith(signature):
+            return extension
+    return None
+
+
+def _trop_volumineux(max_size: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Image trop volumineuse (max {max_size // (1024 * 1024)} MB)")
+
+
+def _verifier_format(premier: bytes, allowed_extensions=None) -> str:
+    """Extension reconnue sur les premiers octets, ou 415"""
+    extension = detecter_format(premier)
+    if extension is None:
+        raise HTTPException(status_code=415, detail="Le fichier n'est pas une image reconnue (JPEG, PNG, BMP, TIFF)")
+    if allowed_extensions is not None and not (EXTENSIONS_EQUIVALENTES.get(extension, {extension}) & set(allowed_extensions)):
+        raise HTTPException(status_code=415, detail=f"Format d'image non autorisé: {extension}")
+    return extension
+
+
+async def verifier_upload(upload: UploadFile, max_size: int, allowed_extensions=None) -> str:
+    """
+    Vérifie format et taille d'un upload sans garder son contenu (image
+    reçue mais non analysée) : mêmes refus 415/413 que `lire_upload`
+
+    Returns:
+        Extension détectée
+    """
+    if upload.size is not None and upload.size > max_size:
+        raise _trop_volumineux(max_size)
+
+    premier = await upload.read(TAILLE_PREMIER_MORCEAU)
+    extension = _verifier_format(premier, allowed_extensions)
+
+    # Taille inconnue d'avance : comptée sans rien garder
+    if upload.size is None:
+        taille = len(premier)
+        while taille <= max_size:
+            morceau = await upload.read(TAILLE_MORCEAU)
+            if not morceau:
+                break
+            taille += len(morceau)
+        if taille > max_size:
+            raise _trop_volumineux(max_size)
+    return extension
+
+
+async def lire_upload(upload: UploadFile, max_size: int, allowed_extensions=None,
+                      budget: Optional[BudgetUpload] = None) -> Tuple[bytes, str]:
+    """
+    Lit un upload d'image en vérifiant format et taille au fil de la lecture
+
+    Args:
+        upload: Fichier reçu par FastAPI
+        max_size: Taille maximale acceptée (octets)
+        allowed_extensions: Extensions autorisées (None = tous les formats reconnus)
+        budget: Budget partagé entre les fichiers de la requête (None = pas de limite globale)
+
+    Returns:
+        (contenu, extension détectée)
+
+    Raises:
+        HTTPException: 415 si ce n'est pas une image acceptée, 413 si trop gros
+    """
+    # Taille connue d'avance (multipart déjà spoolé par Starlette) : refus immédiat
+    if upload.size is not None and upload.size > max_size:
+        raise _trop_volumineux(max_size)
+    if budget is not None and upload.size is not None:
+        budget.verifier(upload.size)
+
+    premier = await upload.read(TAILLE_PREMIER_MORCEAU)
+    extension = _verifier_format(premier, allowed_extensions)
+
+    if budget is not None:
+        budget.consommer(len(premier))
+
+    contenu = bytearray(premier)
+    while True:
+        morceau = await upload.read(TAILLE_MORCEAU)
+        if not morceau:
+            break
+        if len(contenu) + len(morceau) > max_size:
+            raise _trop_volumineux(max_size)
+        if budget is not None:
+            budget.consommer(len(morceau))
+        contenu += morceau
+
+    if len(contenu) > max_size:
+        raise _trop_volumineux(max_size)
+
+    return bytes(contenu), extension
+
+
+class LimiteTailleRequete:
+    """
+    Middleware ASGI : taille maximale du corps par route
+
+    Le parsing multipart de Starlette lit tout le corps avant l'endpoint ;
+    ce middleware l'interrompt dès que la limite de la route est dépassée.
+    """
+
+    def __init__(self, app, limites: Dict[str, int]):
+        """
+        Args:
+            app: Application ASGI
+            limites: Taille maximale du corps (octets) par chemin
+        """
+        self.app = app
+        self.limites = limites
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limites.get(scope.get("path")) if scope["type"] == "http" else None
+        if limite is None:
+            await self.app(scope, receive, send)
+            return
+
+        for nom, valeur in scope.get("headers", []):
+            if nom == b"content-length":
+                try:
+                    if int(valeur) > limite:
+                        await self._refuser(send, limite)
+                        return
+                except ValueError:
+                    pass
+                break
+
+        recu = 0
+        reponse_commencee = False
+
+        async def receive_borne():
+            nonlocal recu
+            message = await receive()
+            if message["type"] == "http.request":
+                recu += len(message.get("body", b""))
+                if recu > limite:
+                    # HTTPException : FastAPI la laisse remonter telle quelle pendant le parsing du corps
+                    raise CorpsTropGros(limite)
+            return message
+
+        async def send_suivi(message):
+            nonlocal reponse_commencee
+            if message["type"] == "http.response.start":
+                reponse_commencee = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_borne, send_suivi)
+        except CorpsTropGros:
+            if reponse_commencee:
+                raise
+            await self._refuser(send, limite)
+
+    @staticmethod
+    async def _refuser(send, limite: int):
+        """Réponse 413 JSON, au format des HTTPException FastAPI"""
+        corps = json.dumps({"detail": CorpsTropGros(limite).detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corps)).encode())],
+        })
+        await send({"type": "http.response.body", "body": corps})
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Conversion du SSD déployé (SavedModel) en TFLite FP16 et INT8
+
+- FP16 : poids en float16, calcul en float32 (XNNPACK), ~2x plus petit
+- INT8 : quantification calibrée sur un jeu d'images représentatif,
+  avec repli float pour les opérations non quantifiables
+
+Les fichiers model_fp16.tflite et model_int8.tflite sont écrits dans le
+dossier de version, à côté de saved_model/ ; l'API les utilise avec
+VISION_BACKEND=tflite et VISION_TFLITE_VARIANT=fp16|int8.
+
+Le rapport compare chaque variante au SavedModel sur les mêmes images
+(accord des décisions, écarts de probabilité et de score, IoU de la meilleure
+détection) et met les latences côte à côte. Il est aussi enregistré dans
+tflite_report.json.
+
+Usage: python convert_tflite.py [--version-dir dossier_de_version] [--images dossier_images]
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from api.config import config
+from api.models.vision_model import VisionModel
+
+VERSIONS_DIR = ROOT_DIR / "api" / "models" / "dl_model" / "versions"
+IMAGES_DIR = ROOT_DIR / "api" / "images_traitees"
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+VARIANTES = ("fp16", "int8")
+
+
+def lister_images(dossier: Path, limite: int, graine: int = 42) -> list:
+    """Échantillon reproductible d'images du dossier"""
+    images = sorted(p for p in dossier.rglob("*") if p.suffix.lower() in EXTENSIONS)
+    random.Random(graine).shuffle(images)
+    return images[:limite]
+
+
+def charger_pixels(chemin: Path, taille) -> np.ndarray:
+    """Image RGB uint8 (1, h, w, 3) à la taille d'entrée du SSD"""
+    img = Image.open(chemin).convert("RGB").resize(taille)
+    return np.expand_dims(np.array(img, dtype=np.uint8), 0)
+
+
+def fonction_serving(saved_model_dir: Path, taille):
+    """Signature serving_default avec une entrée de forme fixe (1, h, w, 3)"""
+    model = tf.saved_model.load(str(saved_model_dir))
+    infer = model.signatures["serving_default"]
+    width, height = taille
+
+    @tf.function(input_signature=[tf.TensorSpec([1, height, width, 3], tf.uint8, name="input_tensor")])
+    def serving_default(input_tensor):
+        outputs = infer(input_tensor=input_tensor)
+        return {name: outputs[name] for name in
+                ("detection_boxes", "detection_classes", "detection_scores", "num_detections")}
+
+    return model, serving_default
+
+
+def convertir(saved_model_dir: Path, variante: str, taille, calibration: list, select_tf_ops: bool) -> bytes:
+    """Convertit le SavedModel dans la variante demandée"""
+    model, serving_default = fonction_serving(saved_model_dir, taille)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions(
+        [serving_default.get_concrete_function()], model
+    )
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variante == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        def representative_dataset():
+            for chemin in calibration:
+                yield [charger_pixels(chemin, taille)]
+        converter.representative_dataset = representative_dataset
+
+    ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+    if select_tf_ops:
+        # Nécessaire pour un graphe non exporté avec export_tflite_graph_tf2 (délégué Flex requis)
+        ops.append(tf.lite.OpsSet.SELECT_TF_OPS)
+    converter.target_spec.supported_ops = ops
+    return converter.convert()
+
+
+def iou(a, b) -> float:
+    """IoU de deux boîtes [ymin, xmin, ymax, xmax] normalisées"""
+    inter_h = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_w = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_h * inter_w
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def evaluer(model: VisionModel, images: list, repetitions: int) -> dict:
+    """Prédictions et latences (ms) par image"""
+    model.predict(str(images[0]))  # Préchauffage
+    resultats, latences = [], []
+    for chemin in images:
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            resultat = model.predict(str(chemin))
+            latences.append((time.perf_counter() - debut) * 1000)
+        resultats.append(resultat)
+    return {"results": resultats, "latencies_ms": latences}
+
+
+def comparer(reference: list, variante: list) -> dict:
+    """Écarts d'une variante par rapport au SavedModel, image par image"""
+    accords, ecarts_proba, ecarts_score, ious = [], [], [], []
+    for ref, res in zip(reference, variante):
+        accords.append(ref["prediction"] == res["prediction"])
+        ecarts_proba.append(abs(ref["contamination_probability"] - res["contamination_probability"]))
+        ecarts_score.append(max(
+            abs(ref["detection_summary"]["max_contaminated_score"] - res["detection_summary"]["max_contaminated_score"]),
+            abs(ref["detection_summary"]["max_healthy_score"] - res["detection_summary"]["max_healthy_score"]),
+        ))
+        if ref["detections"] and res["detections"]:
+            meilleure_ref = max(ref["detections"], key=lambda d: d["score"])
+            meilleure_res = max(res["detections"], key=lambda d: d["score"])
+            ious.append(iou(meilleure_ref["box"], meilleure_res["box"]))
+    return {
+        "decision_agreement": round(float(np.mean(accords)), 4),
+        "mean_abs_delta_contamination_probability": round(float(np.mean(ecarts_proba)), 4),
+        "max_abs_delta_contamination_probability": round(float(np.max(ecarts_proba)), 4),
+        "mean_abs_delta_max_score": round(float(np.mean(ecarts_score)), 4),
+        "mean_top_box_iou": round(float(np.mean(ious)), 4) if ious else None,
+    }
+
+
+def resumer_latences(latences: list) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(latences, 50)), 2),
+        "p95_ms": round(float(np.percentile(latences, 95)), 2),
+        "mean_ms": round(float(np.mean(latences)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion TFLite FP16/INT8 du SSD déployé")
+    parser.add_argument("--version-dir", default=str(VERSIONS_DIR / "current"),
+                        help="Dossier de version contenant saved_model/ (défaut: version courante)")
+    parser.add_argument("--images", default=str(IMAGES_DIR), help="Images de calibration et d'évaluation")
+    parser.add_argument("--calibration", type=int, default=200, help="Nombre d'images de calibration INT8")
+    parser.add_argument("--eval", type=int, default=100, help="Nombre d'images d'évaluation")
+    parser.add_argument("--repetitions", type=int, default=3, help="Mesures de latence par image")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTES), choices=VARIANTES)
+    parser.add_argument("--select-tf-ops", action="store_true",
+                        help="Autoriser les opérations TF (Flex) non supportées nativement par TFLite")
+    args = parser.parse_args()
+
+    version_dir = Path(args.version_dir).resolve()
+    saved_model_dir = version_dir / "saved_model"
+    if not (saved_model_dir / "saved_model.pb").exists():
+        print(f"❌ SavedModel introuvable: {saved_model_dir}")
+        return 1
+
+    images = lister_images(Path(args.images), args.calibration + args.eval)
+    if len(images) < 2:
+        print(f"❌ Pas assez d'images dans {args.images}")
+        return 1
+    evaluation = images[:args.eval]
+    calibration = images[args.eval:] or evaluation  # Jeu distinct si assez d'images
+
+    print(f"📦 Version: {version_dir.name}")
+    print(f"🖼️  {len(calibration)} image(s) de calibration, {len(evaluation)} d'évaluation")
+
+    # La référence est toujours le SavedModel, quel que soit VISION_BACKEND
+    config.VISION_BACKEND = "savedmodel"
+    reference_model = VisionModel(str(saved_model_dir))
+    if not reference_model.charger_modele():
+        print("❌ Impossible de charger le SavedModel")
+        return 1
+    taille = reference_model.input_size
+
+    rapport = {
+        "version_dir": str(version_dir),
+        "eval_images": len(evaluation),
+        "calibration_images": len(calibration),
+        "variants": {},
+    }
+
+    print("⏱️  Référence SavedModel...")
+    reference = evaluer(reference_model, evaluation, args.repetitions)
+    taille_saved_model = sum(f.stat().st_size for f in saved_model_dir.rglob("*") if f.is_file())
+    rapport["variants"]["savedmodel"] = {
+        "size_mb": round(taille_saved_model / 1024 / 1024, 2),
+        **resumer_latences(reference["latencies_ms"]),
+    }
+
+    for variante in args.variants:
+        print(f"🔄 Conversion {variante.upper()}...")
+        debut = time.perf_counter()
+        contenu = convertir(saved_model_dir, variante, taille, calibration, args.select_tf_ops)
+        fichier = version_dir / f"model_{variante}.tflite"
+        fichier.write_bytes(contenu)
+        duree_conversion = time.perf_counter() - debut
+
+        model = VisionModel(str(fichier))
+        if not model.charger_modele():
+            print(f"❌ Impossible de charger {fichier.name}")
+            continue
+        mesures = evaluer(model, evaluation, args.repetitions)
+        rapport["variants"][variante] = {
+            "file": fichier.name,
+            "size_mb": round(len(contenu) / 1024 / 1024, 2),
+            "conversion_s": round(duree_conversion, 1),
+            **resumer_latences(mesures["latencies_ms"]),
+            **comparer(reference["results"], mesures["results"]),
+        }
+
+    # Tableau côte à côte
+    print(f"\n{'variante':>10} | {'taille MB':>9} | {'p50 ms':>8} | {'p95 ms':>8} | "
+          f"{'accord':>7} | {'Δproba moy':>10} | {'Δscore moy':>10} | {'IoU top':>7}")
+    for nom, stats in rapport["variants"].items():
+        accord = f"{stats['decision_agreement']:.1%}" if "decision_agreement" in stats else "-"
+        delta_proba = stats.get("mean_abs_delta_contamination_probability", "-")
+        delta_score = stats.get("mean_abs_delta_max_score", "-")
+        iou_top = stats.get("mean_top_box_iou", "-")
+        print(f"{nom:>10} | {stats['size_mb']:>9} | {stats['p50_ms']:>8} | {stats['p95_ms']:>8} | "
+              f"{accord:>7} | {str(delta_proba):>10} | {str(delta_score):>10} | {str(iou_top):>7}")
+
+    rapport_path = version_dir / "tflite_report.json"
+    with open(rapport_path, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Rapport: {rapport_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,45 @@ import subprocess
 import time
 import webbrowser
 import os
+import json
+import urllib.request
+import urllib.error
 from pathlib import Path
 
+API_READY_URL = "http://localhost:8000/readyz"
+API_READY_TIMEOUT = int(os.getenv("API_READY_TIMEOUT", 180))
+
+
+def wait_api_ready(api_process, url=API_READY_URL, timeout=API_READY_TIMEOUT):
+    """Attend que /readyz réponde 200 (modèles chargés et préchauffés)"""
+    started_at = time.time()
+    phase = "starting"
+    while time.time() - started_at < timeout:
+        if api_process.poll() is not None:
+            print(f"\n❌ L'API s'est arrêtée pendant le démarrage (code {api_process.returncode})")
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                status = json.loads(response.read().decode())
+                print(f"\n✅ API prête en {time.time() - started_at:.1f}s: {status['startup']['phases']}")
+                return True
+        except urllib.error.HTTPError as e:
+            # 503 : API vivante, modèles en cours de chargement ou de préchauffage
+            try:
+                status = json.loads(e.read().decode())
+                phase = status["startup"]["phase"]
+                if phase == "failed":
+                    print(f"\n❌ Échec du chargement des modèles: {status['startup'].get('error')}")
+                    return False
+            except (ValueError, KeyError):
+                pass
+        except (urllib.error.URLError, ConnectionError, OSError):
+            phase = "starting"
+        print(f"   API: {phase}... {time.time() - started_at:.0f}s", end="\r")
+        time.sleep(1)
+    print(f"\n⚠️ API non prête après {timeout}s")
+    return False
+
 def quick_start():
     print("DÉMARRAGE COMPLET DE GAIA VISION")
     
@@ -82,18 +119,16 @@ def quick_start():
     else:
         print(f"❌ Script TensorBoard non trouvé: {tensorboard_script}")
     
-    # Attendre que les services démarrent
+    # Attendre que l'API soit prête (readiness) plutôt qu'un délai fixe
     print("\nAttente du démarrage des services...")
-    for i in range(15):
-        print(f"   {i+1}/15 secondes...", end="\r")
-        time.sleep(1)
+    api_ready = wait_api_ready(api_process)
     
     print("\n")
     
     # Vérifier les processus
     print("🔍 Vérification des services...")
     services_status = {
-        "API": api_process.poll() is None,
+        "API": api_process.poll() is None and api_ready,
         "Frontend": frontend_process.poll() is None, 
         "TensorBoard": tensorboard_process.poll() is None if tensorboard_process else False
     }
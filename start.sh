@@ -44,9 +44,19 @@ else
     echo "tensorboard.sh non trouvé"
 fi
 
-# Attendre
+# Attendre que l'API soit prête (modèles chargés et préchauffés)
 echo "⏳ Attente du démarrage..."
-sleep 10
+for i in $(seq 1 180); do
+    if curl -sf http://localhost:8000/readyz > /dev/null 2>&1; then
+        echo "✅ API prête (${i}s)"
+        break
+    fi
+    if ! kill -0 $API_PID 2>/dev/null; then
+        echo "❌ L'API s'est arrêtée pendant le démarrage"
+        break
+    fi
+    sleep 1
+done
 
 echo ""
 echo " SERVICES DISPONIBLES:"
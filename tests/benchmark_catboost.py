@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark du scoring CatBoost : chemin vectorisé (predict_many) vs une ligne à la fois
+Usage: python tests/benchmark_catboost.py [--model chemin/vers/model.joblib]
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "api"))
+
+import numpy as np
+import pandas as pd
+
+from api.models.catboost_model import CatBoostModel, API_TO_MODEL_COLUMNS
+
+TAILLES = [1, 100, 100_000]
+MAX_LIGNES_UNITAIRES = 1_000  # Au-delà, la boucle ligne par ligne est trop lente
+
+
+def charger_valeurs(nom_fichier: str, cle: str) -> list:
+    """Charge les valeurs possibles d'une catégorie depuis jsons/"""
+    with open(ROOT_DIR / "jsons" / nom_fichier, "r", encoding="utf-8") as f:
+        return [item["value"] for item in json.load(f)[cle]]
+
+
+def generer_lignes(n: int) -> list:
+    """Génère n lignes de paramètres réalistes"""
+    champignons = charger_valeurs("champignon_types.json", "champignon_types")
+    substrats = charger_valeurs("substrat_types.json", "substrat_types")
+    return [
+        {
+            "race_champignon": random.choice(champignons),
+            "type_substrat": random.choice(substrats),
+            "jours_inoculation": random.randint(0, 60),
+            "hygrometrie": round(random.uniform(50, 99), 1),
+            "co2_ppm": float(random.randint(400, 5000)),
+        }
+        for _ in range(n)
+    ]
+
+
+def mesurer(fonction, repetitions: int = 3) -> float:
+    """Meilleur temps sur plusieurs répétitions (secondes)"""
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur
+
+
+def benchmark(model_path: str):
+    model = CatBoostModel(model_path)
+    if not model.est_charge():
+        print(f"❌ Modèle non chargé: {model_path}")
+        return
+
+    print("📊 BENCHMARK CATBOOST (lignes/seconde)")
+    print(f"{'lignes':>10} | {'predict_many':>14} | {'colonnes':>14} | {'predict unitaire':>17}")
+
+    for n in TAILLES:
+        lignes = generer_lignes(n)
+        colonnes = {champ: [ligne[champ] for ligne in lignes] for champ in lignes[0]}
+
+        t_lot = mesurer(lambda: model.predict_many(lignes))
+        t_colonnes = mesurer(lambda: model.predict_many_arrays(colonnes))
+
+        if n <= MAX_LIGNES_UNITAIRES:
+            t_unitaire = mesurer(lambda: [model.predict(ligne) for ligne in lignes], repetitions=1)
+            unitaire = f"{n / t_unitaire:>17,.0f}"
+        else:
+            unitaire = f"{'(ignoré)':>17}"
+
+        print(f"{n:>10,} | {n / t_lot:>14,.0f} | {n / t_colonnes:>14,.0f} | {unitaire}")
+
+    # Vérification : le Pool donne les mêmes probabilités que l'ancien chemin DataFrame
+    lignes = generer_lignes(100)
+    lot = model.predict_many_arrays(lignes)
+    reference = model.model.predict_proba(pd.DataFrame([
+        {colonne: ligne[champ] for champ, (colonne, _) in API_TO_MODEL_COLUMNS.items()}
+        for ligne in lignes
+    ]))
+    ecart_max = float(np.abs(lot["probability"] - reference).max())
+    print(f"\n✅ Écart max de probabilité Pool vs DataFrame: {ecart_max:.2e}")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Benchmark du scoring CatBoost")
+    parser.add_argument("--model", default=str(ROOT_DIR / "api" / "models" / "ml_model" / "current"))
+    args = parser.parse_args()
+    benchmark(args.model)
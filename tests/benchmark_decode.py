@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark du décodage de l'entrée du modèle : décodage complet + resize PIL
+(chemin d'origine) vs décodage JPEG réduit (draft) + resize OpenCV dans un buffer
+Usage: python tests/benchmark_decode.py [--images dossier] [--size 320]
+"""
+import io
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import numpy as np
+from PIL import Image
+
+from api.config import config
+from api.utils.image_io import decoder_redimensionne
+
+# Photos de téléphone typiques (12 MP, 48 MP) et une image déjà petite
+RESOLUTIONS = [(4032, 3024), (8064, 6048), (1280, 960)]
+
+
+def generer_jpeg(largeur: int, hauteur: int, qualite: int = 90) -> bytes:
+    """JPEG synthétique (dégradés + bruit) qui se compresse comme une photo"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, largeur, dtype=np.float32)
+    y = np.linspace(0, 255, hauteur, dtype=np.float32)[:, None]
+    pixels = np.stack([np.broadcast_to(x, (hauteur, largeur)),
+                       np.broadcast_to(y, (hauteur, largeur)),
+                       (x + y) / 2], axis=-1)
+    pixels = np.clip(pixels + rng.normal(0, 12, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=qualite)
+    return buffer.getvalue()
+
+
+def chemin_origine(contenu: bytes, taille) -> np.ndarray:
+    """Chemin d'origine : Image.open().convert('RGB') puis resize PIL"""
+    return np.array(Image.open(io.BytesIO(contenu)).convert("RGB").resize(taille), dtype=np.uint8)
+
+
+def mesurer(fonction, repetitions: int) -> float:
+    """Temps médian (ms)"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return float(np.median(durees))
+
+
+def benchmark(images: list, taille, repetitions: int):
+    buffer = np.empty((taille[1], taille[0], 3), dtype=np.uint8)
+    config.IMAGE_FAST_DECODE = True
+
+    print(f"📊 BENCHMARK DÉCODAGE -> {taille[0]}x{taille[1]} (médiane sur {repetitions} essais)")
+    print(f"{'image':>24} | {'Mo':>6} | {'origine ms':>10} | {'rapide ms':>9} | {'gain':>6} | {'écart moyen':>11} | {'écart max':>9}")
+
+    for nom, contenu in images:
+        t_origine = mesurer(lambda: chemin_origine(contenu, taille), repetitions)
+        t_rapide = mesurer(lambda: decoder_redimensionne(contenu, taille, buffer), repetitions)
+
+        # Écart de pixels entre les deux chemins (filtres de réduction différents)
+        reference = chemin_origine(contenu, taille).astype(np.int16)
+        rapide = decoder_redimensionne(contenu, taille).astype(np.int16)
+        ecart = np.abs(reference - rapide)
+
+        print(f"{nom:>24} | {len(contenu) / 1e6:>6.1f} | {t_origine:>10.1f} | {t_rapide:>9.1f} | "
+              f"{t_origine / t_rapide:>5.1f}x | {ecart.mean():>11.2f} | {ecart.max():>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du décodage réduit des JPEG")
+    parser.add_argument("--images", help="Dossier de vraies photos (sinon JPEG synthétiques)")
+    parser.add_argument("--size", type=int, default=320, help="Côté de l'entrée du modèle (SSD: 320)")
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.images:
+        fichiers = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in {".jpg", ".jpeg"})[:10]
+        images = [(p.name[-24:], p.read_bytes()) for p in fichiers]
+    else:
+        images = [(f"synthétique {l}x{h}", generer_jpeg(l, h)) for l, h in RESOLUTIONS]
+
+    if not images:
+        print("❌ Aucune image JPEG trouvée")
+        return
+    benchmark(images, (args.size, args.size), args.repetitions)
+
+
+if __name__ == "__main__":
+    main()
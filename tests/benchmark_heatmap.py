@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark du rendu de heatmap : masques gaussiens pleine image (version
+d'origine) vs accumulation bornée à chaque box, et rendu à résolution réduite
+Usage: python tests/benchmark_heatmap.py [--largeur 4000 --hauteur 3000]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import cv2
+import numpy as np
+
+from api.utils.heatmap_generator import ContaminationHeatmapGenerator
+
+NB_BOXES = [1, 10, 50]
+ECHELLES = [1.0, 0.25]
+
+
+def heatmap_origine(image: np.ndarray, detections: list) -> np.ndarray:
+    """Rendu d'origine : une gaussienne float64 pleine image par détection"""
+    h, w = image.shape[:2]
+    heatmap = np.zeros((h, w), dtype=np.float32)
+    for detection in detections:
+        box = detection['box']
+        ymin = max(0, min(h - 1, int(box[0] * h)))
+        xmin = max(0, min(w - 1, int(box[1] * w)))
+        ymax = max(0, min(h - 1, int(box[2] * h)))
+        xmax = max(0, min(w - 1, int(box[3] * w)))
+
+        y, x = np.ogrid[:h, :w]
+        center_y, center_x = (ymin + ymax) / 2, (xmin + xmax) / 2
+        box_height, box_width = ymax - ymin, xmax - xmin
+        sigma_y, sigma_x = box_height / 3.0, box_width / 3.0
+        gaussian = np.exp(-((x - center_x)**2 / (2 * sigma_x**2) + (y - center_y)**2 / (2 * sigma_y**2)))
+        gaussian *= detection['score'] * 3.0
+
+        margin = 1.2
+        extended_ymin = max(0, int(center_y - box_height * margin / 2))
+        extended_ymax = min(h, int(center_y + box_height * margin / 2))
+        extended_xmin = max(0, int(center_x - box_width * margin / 2))
+        extended_xmax = min(w, int(center_x + box_width * margin / 2))
+        mask = np.zeros_like(gaussian)
+        mask[extended_ymin:extended_ymax, extended_xmin:extended_xmax] = \
+            gaussian[extended_ymin:extended_ymax, extended_xmin:extended_xmax]
+        heatmap = np.maximum(heatmap, mask)
+
+    if heatmap.max() > 0:
+        heatmap = heatmap / heatmap.max()
+    heatmap_colored = cv2.cvtColor(cv2.applyColorMap((heatmap * 255).astype(np.uint8), cv2.COLORMAP_JET),
+                                   cv2.COLOR_BGR2RGB)
+    alpha = heatmap[..., np.newaxis] * 0.6
+    blended = image.astype(np.float32) * (1 - alpha) + heatmap_colored.astype(np.float32) * alpha
+    return blended.astype(np.uint8)
+
+
+def generer_detections(rng, n: int) -> list:
+    """Boxes contaminées aléatoires, de 2 % à 30 % du côté de l'image"""
+    detections = []
+    for _ in range(n):
+        cote_y, cote_x = rng.uniform(0.02, 0.3, size=2)
+        ymin, xmin = rng.uniform(0, 1 - cote_y), rng.uniform(0, 1 - cote_x)
+        detections.append({
+            'class_name': 'contaminated',
+            'score': float(rng.uniform(0.1, 0.9)),
+            'box': [ymin, xmin, ymin + cote_y, xmin + cote_x],
+        })
+    return detections
+
+
+def mesurer(fonction, repetitions: int) -> float:
+    """Temps médian (ms)"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return float(np.median(durees))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du rendu de heatmap")
+    parser.add_argument("--largeur", type=int, default=4000)
+    parser.add_argument("--hauteur", type=int, default=3000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(args.hauteur, args.largeur, 3), dtype=np.uint8)
+    generator = ContaminationHeatmapGenerator()
+
+    print(f"📊 BENCHMARK HEATMAP {args.largeur}x{args.hauteur} (médiane sur {args.repetitions} essais)")
+    entete = f"{'boxes':>6} | {'origine ms':>10}"
+    for echelle in ECHELLES:
+        entete += f" | {f'x{echelle} ms':>10} | {'gain':>6} | {'écart max':>9}"
+    print(entete)
+
+    for n in NB_BOXES:
+        detections = generer_detections(rng, n)
+        reference = heatmap_origine(image, detections)
+        t_origine = mesurer(lambda: heatmap_origine(image, detections), args.repetitions)
+        ligne = f"{n:>6} | {t_origine:>10.1f}"
+
+        for echelle in ECHELLES:
+            rendu = lambda: generator.create_contamination_heatmap(image, detections, render_scale=echelle)
+            t_rendu = mesurer(rendu, args.repetitions)
+            ecart = np.abs(rendu().astype(np.int16) - reference.astype(np.int16)).max()
+            ligne += f" | {t_rendu:>10.1f} | {t_origine / t_rendu:>5.1f}x | {ecart:>9}"
+        print(ligne)
+
+
+if __name__ == "__main__":
+    main()
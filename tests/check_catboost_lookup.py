@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Vérifie que la table de décision CatBoost précalculée donne exactement les
+mêmes probabilités et niveaux de risque que le modèle
+Usage: python tests/check_catboost_lookup.py [--model api/models/ml_model/current] [--lignes 100000]
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "api"))
+
+import numpy as np
+
+from api.models.catboost_model import CatBoostModel, API_TO_MODEL_COLUMNS
+from api.models.catboost_lookup import CatBoostLookupTable, LOOKUP_FILENAME
+
+
+def charger_valeurs(nom_fichier: str, cle: str) -> list:
+    """Charge les valeurs possibles d'une catégorie depuis jsons/"""
+    with open(ROOT_DIR / "jsons" / nom_fichier, "r", encoding="utf-8") as f:
+        return [item["value"] for item in json.load(f)[cle]]
+
+
+def generer_colonnes(rng, n: int, table: CatBoostLookupTable) -> dict:
+    """
+    Lignes aléatoires réalistes, plus des valeurs exactement sur les bordures
+    et juste à côté (bornes des intervalles), et quelques lignes hors grille
+    """
+    champignons = charger_valeurs("champignon_types.json", "champignon_types")
+    substrats = charger_valeurs("substrat_types.json", "substrat_types")
+    colonnes = {
+        "race_champignon": rng.choice(champignons, n).astype(object),
+        "type_substrat": rng.choice(substrats, n).astype(object),
+        "jours_inoculation": rng.integers(0, 61, n).astype(np.float64),
+        "hygrometrie": np.round(rng.uniform(50, 99, n), 1),
+        "co2_ppm": rng.integers(400, 5001, n).astype(np.float64),
+    }
+
+    # Valeurs sur les bordures et à un ulp de part et d'autre
+    for champ, (colonne, _) in API_TO_MODEL_COLUMNS.items():
+        bordures = table.bordures.get(colonne)
+        if bordures is None or not len(bordures):
+            continue
+        bords = np.concatenate([bordures, np.nextafter(bordures, -np.inf), np.nextafter(bordures, np.inf)])
+        k = min(n // 4, len(bords))
+        positions = rng.choice(n, k, replace=False)
+        colonnes[champ][positions] = rng.choice(bords, k).astype(np.float64)
+
+    # Hors grille : catégorie inconnue, valeur non finie
+    colonnes["race_champignon"][:5] = "espece_inconnue"
+    colonnes["co2_ppm"][5:10] = np.nan
+    return colonnes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exactitude de la table de décision CatBoost")
+    parser.add_argument("--model", default=str(ROOT_DIR / "api" / "models" / "ml_model" / "current"))
+    parser.add_argument("--lignes", type=int, default=100_000)
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+
+    model = CatBoostModel(args.model)
+    if not model.est_charge():
+        print(f"❌ Modèle non chargé: {args.model}")
+        return 1
+    table = model.lookup
+    if table is None:
+        print(f"❌ Pas de {LOOKUP_FILENAME} dans {Path(args.model).resolve().parent} (ou CATBOOST_LOOKUP_ENABLED=false)")
+        return 1
+    print(f"📋 Table: {table.stats()}")
+
+    colonnes = generer_colonnes(np.random.default_rng(args.graine), args.lignes, table)
+
+    # Référence : le modèle seul
+    model.lookup = None
+    debut = time.perf_counter()
+    attendu = model.predict_many_arrays(colonnes)
+    t_modele = time.perf_counter() - debut
+
+    model.lookup = table
+    debut = time.perf_counter()
+    obtenu = model.predict_many_arrays(colonnes)
+    t_table = time.perf_counter() - debut
+
+    _, sur_grille = table.chercher(model._colonnes_entree(colonnes))
+    ecart = np.abs(attendu["probability"] - obtenu["probability"])
+    differences = int((ecart.max(axis=1) > 0).sum())
+    risques = int((attendu["risk_level"] != obtenu["risk_level"]).sum())
+
+    print(f"📊 {args.lignes} lignes, {int(sur_grille.sum())} sur la grille, {int((~sur_grille).sum())} hors grille (modèle)")
+    print(f"⏱️  modèle: {t_modele * 1e6 / args.lignes:.2f} µs/ligne, table: {t_table * 1e6 / args.lignes:.2f} µs/ligne")
+    print(f"   écart de probabilité max: {ecart.max():.3g}, niveaux de risque différents: {risques}")
+    if differences or risques:
+        print(f"❌ {differences} ligne(s) avec des probabilités différentes")
+        return 1
+    print("✅ Probabilités identiques")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
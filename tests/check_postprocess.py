@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Vérifie que le post-traitement SSD vectorisé (tables de décision) donne
+exactement les mêmes réponses que l'ancienne version en boucles Python
+(lots aléatoires, puis grille de scores autour de chaque seuil)
+Usage: python tests/check_postprocess.py [--lots 200] [--taille-lot 8]
+"""
+import sys
+import time
+import logging
+import argparse
+from typing import Any, Dict
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "api"))
+
+import numpy as np
+
+from api.models.vision_model import VisionModel
+
+logger = logging.getLogger("check_postprocess")
+
+# Valeurs exactement sur les seuils des règles, pour tester les bornes
+SEUILS = [0.05, 0.08, 0.1, 0.15, 0.2, 0.25, 0.3, 0.65, 0.7]
+
+
+class ReferenceBoucles:
+    """Post-traitement d'origine (boucles Python), conservé comme référence"""
+
+    def __init__(self, model: VisionModel):
+        self.class_names = model.class_names
+        self.metadata = model.metadata
+        self.input_size = model.input_size
+        self.model_type = model.model_type
+        self.tflite_variant = model.tflite_variant
+
+    def _analyze_contamination_score(self, score: float, class_type: str) -> tuple:
+        """Analyse un score de contamination et retourne prediction et confidence"""
+        if class_type == "contaminated":
+            if score >= 0.30:
+                return "contamine", score * 1.3
+            elif score >= 0.20:
+                return "contamine", score * 1.5
+            elif score >= 0.15:
+                return "incertain", score * 1.2
+            else:
+                return "sain", 0.6
+        else:  # healthy
+            if score >= 0.7:
+                return "sain", score * 1.1
+            elif score < 0.15:
+                return "sain", score * 4.0
+            elif score < 0.3:
+                return "sain", score * 3.0
+            else:
+                return "sain", score * 2.0
+
+    def _analyze_mixed_detection(self, max_contaminated_score: float, max_healthy_score: float) -> dict:
+        """Analyse le cas mixte contamination + sain"""
+        if max_contaminated_score >= 0.25:
+            return {
+                "prediction": "contamine",
+                "confidence": min(max_contaminated_score * 1.5, 0.90),
+                "contamination_probability": min(max_contaminated_score * 1.3, 0.95)
+            }
+        elif max_contaminated_score >= 0.15:
+            logger.warning(f"Contamination possible detectee: score={max_contaminated_score:.3f}")
+            return {
+                "prediction": "incertain", 
+                "confidence": max_contaminated_score * 1.2,
+                "contamination_probability": max_contaminated_score * 1.5
+            }
+        else:
+            if max_healthy_score > max_contaminated_score:
+                confidence = max_healthy_score * (2.5 if max_healthy_score < 0.2 else 1.5)
+                return {
+                    "prediction": "sain",
+                    "confidence": min(confidence, 0.75),
+                    "contamination_probability": max_contaminated_score
+                }
+            else:
+                return {
+                    "prediction": "incertain",
+                    "confidence": 0.3,
+                    "contamination_probability": 0.4
+                }
+
+    def _analyze_detections(self,
+                            detection_boxes: np.ndarray,
+                            detection_classes: np.ndarray,
+                            detection_scores: np.ndarray,
+                            num_detections: int) -> Dict[str, Any]:
+        """Transforme les sorties SSD d'une image en prediction finale"""
+        try:
+            # Analyser les detections valides
+            valid_detections = []
+            contaminated_count = 0
+            healthy_count = 0
+            max_contaminated_score = 0.0
+            max_healthy_score = 0.0
+            
+            for i in range(min(num_detections, len(detection_scores))):
+                score = float(detection_scores[i])
+                if score > 0.08:
+                    class_id = int(detection_classes[i])
+                    box = detection_boxes[i].tolist()
+                    
+                    valid_detections.append({
+                        "class_id": class_id,
+                        "class_name": self.class_names[class_id] if class_id < len(self.class_names) else "unknown",
+                        "score": score,
+                        "box": box
+                    })
+                    
+                    # Compter par type
+                    if class_id == 2:  # contaminated
+                        contaminated_count += 1
+                        max_contaminated_score = max(max_contaminated_score, score)
+                    elif class_id == 1:  # healthy
+                        healthy_count += 1
+                        max_healthy_score = max(max_healthy_score, score)
+            
+            # Determiner la prediction finale
+            if contaminated_count > 0 and healthy_count > 0:
+                # Cas mixte
+                contaminated_ratio = contaminated_count / (contaminated_count + healthy_count)
+                logger.debug("Analyse mixte: %s contamine(s), %s sain(s)", contaminated_count, healthy_count)
+                logger.debug("Ratio contamination: %.3f", contaminated_ratio)
+                logger.debug("Meilleur score contamine: %.3f", max_contaminated_score)
+                logger.debug("Meilleur score sain: %.3f", max_healthy_score)
+                
+                result = self._analyze_mixed_detection(max_contaminated_score, max_healthy_score)
+                prediction = result["prediction"]
+                confidence = result["confidence"]
+                contamination_probability = result["contamination_probability"]
+                        
+            elif contaminated_count > 0:
+                # Seulement contamination
+                logger.debug("Contamination pure detectee: score max %.3f", max_contaminated_score)
+                prediction, confidence = self._analyze_contamination_score(max_contaminated_score, "contaminated")
+                confidence = min(confidence, 0.85)
+                contamination_probability = min(max_contaminated_score * 1.8, 0.90)
+                
+            elif healthy_count > 0:
+                # Seulement sain - verification supplementaire
+                if max_healthy_score < 0.7:
+                    # Chercher contamination faible
+                    low_contaminated_scores = [
+                        float(detection_scores[i]) for i in range(min(num_detections, len(detection_scores)))
+                        if int(detection_classes[i]) == 2 and float(detection_scores[i]) > 0.1
+                    ]
+                    
+                    if low_contaminated_scores:
+                        max_low_contaminated = max(low_contaminated_scores)
+                        logger.debug("Detections contamination faibles trouvees: max=%.3f", max_low_contaminated)
+                        
+                        if healthy_count >= 3 and max_healthy_score < 0.65 and max_low_contaminated > 0.15:
+                            prediction = "incertain"
+                            confidence = max_healthy_score * 0.6
+                            contamination_probability = 0.4
+                            logger.warning("Detection ambigue: objets classes 'sains' mais scores moderes avec traces de contamination")
+                        else:
+                            prediction = "sain"
+                            confidence = max_healthy_score * 0.85
+                            contamination_probability = 1.0 - max_healthy_score
+                    else:
+                        prediction, confidence = self._analyze_contamination_score(max_healthy_score, "healthy")
+                        confidence = min(confidence, 0.75)
+                        contamination_probability = 1.0 - max_healthy_score
+                else:
+                    prediction, confidence = self._analyze_contamination_score(max_healthy_score, "healthy")
+                    confidence = min(confidence, 0.85)
+                    contamination_probability = 1.0 - max_healthy_score
+                
+            else:
+                # Aucune detection valide - analyser les faibles
+                weak_detections = []
+                very_weak_detections = []
+                
+                logger.debug("=== ANALYSE DES DETECTIONS FAIBLES ===")
+                for i in range(min(num_detections, len(detection_scores))):
+                    score = float(detection_scores[i])
+                    class_id = int(detection_classes[i])
+                    class_name = self.class_names[class_id] if class_id < len(self.class_names) else "unknown"
+                    
+                    if score > 0.15:
+                        weak_detections.append((class_id, score, class_name))
+                        logger.debug("  Detection faible: %s score=%.4f", class_name, score)
+                    elif score > 0.05:
+                        very_weak_detections.append((class_id, score, class_name))
+                
+                contaminated_weak = [d for d in weak_detections if d[0] == 2]
+                healthy_weak = [d for d in weak_detections if d[0] == 1]
+                
+                if contaminated_weak:
+                    best_contaminated = max(contaminated_weak, key=lambda x: x[1])
+                    prediction = "incertain"
+                    confidence = best_contaminated[1] * 0.5
+                    contamination_probability = best_contaminated[1] * 1.2
+                    logger.debug("Contamination faible detectee: score=%.4f", best_contaminated[1])
+                elif healthy_weak:
+                    best_healthy = max(healthy_weak, key=lambda x: x[1])
+                    prediction = "sain"
+                    confidence = best_healthy[1] * 0.7
+                    contamination_probability = 1.0 - best_healthy[1]
+                elif very_weak_detections and any(d[0] == 2 for d in very_weak_detections):
+                    logger.warning("Traces tres faibles de contamination detectees")
+                    prediction = "incertain"
+                    confidence = 0.25
+                    contamination_probability = 0.6
+                else:
+                    prediction = "incertain"
+                    confidence = 0.2
+                    contamination_probability = 0.5
+            
+            logger.debug("SSD Prediction: %s (confiance: %.3f)", prediction, confidence)
+            logger.debug("Detections: %s contamine(s), %s sain(s)", contaminated_count, healthy_count)
+            
+            return {
+                "prediction": prediction,
+                "confidence": float(confidence),
+                "model_type": "ssd_object_detection",
+                "contamination_probability": float(contamination_probability),
+                "detection_summary": {
+                    "total_detections": len(valid_detections),
+                    "contaminated_count": contaminated_count,
+                    "healthy_count": healthy_count,
+                    "max_contaminated_score": float(max_contaminated_score),
+                    "max_healthy_score": float(max_healthy_score)
+                },
+                "detections": valid_detections,
+                "model_info": {
+                    "architecture": self.metadata.get('architecture', 'SSD_MobileNet_V2') if self.metadata else 'SSD_MobileNet_V2',
+                    "version": self.metadata.get('version', 'unknown') if self.metadata else 'unknown',
+                    "input_size": self.input_size,
+                    "backend": f"tflite_{self.tflite_variant}" if self.model_type == 'tflite' else self.model_type
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse des detections SSD: {e}")
+            raise
+
+
+def generer_lot(rng, taille_lot: int, k: int = 100):
+    """Sorties SSD synthétiques couvrant tous les cas (mixte, contaminé, sain, faibles)"""
+    # Scores décroissants comme le SSD, avec une part de valeurs pile sur les seuils
+    scores = rng.beta(0.6, 3.0, size=(taille_lot, k))
+    sur_seuil = rng.random((taille_lot, k)) < 0.1
+    scores[sur_seuil] = rng.choice(SEUILS, size=sur_seuil.sum())
+    scores = -np.sort(-scores, axis=1).astype(np.float32)
+    classes = rng.choice([0.0, 1.0, 2.0, 3.0], p=[0.05, 0.45, 0.45, 0.05], size=(taille_lot, k)).astype(np.float32)
+    # Images « saines » et « contaminées » uniquement, pour les branches à une seule classe
+    for i in range(taille_lot):
+        tirage = rng.random()
+        if tirage < 0.2:
+            classes[i][classes[i] == 2.0] = 1.0
+        elif tirage < 0.4:
+            classes[i][classes[i] == 1.0] = 2.0
+        elif tirage < 0.5:
+            scores[i] *= 0.12  # Aucune détection valide
+    boxes = np.sort(rng.random((taille_lot, k, 4)).astype(np.float32), axis=2)
+    num_detections = rng.integers(0, k + 1, size=taille_lot).astype(np.float32)
+    return boxes, classes, scores, num_detections
+
+
+def generer_grille():
+    """
+    Grille de scores (pas de 0.005, seuils et leurs voisins float32) pour chaque
+    cas : paire contaminé + sain (mixte), contaminé seul, sain seul
+    """
+    seuils = np.array(SEUILS, dtype=np.float32)
+    valeurs = np.unique(np.concatenate([
+        np.arange(0, 1.0001, 0.005, dtype=np.float32), seuils,
+        np.nextafter(seuils, np.float32(-1)), np.nextafter(seuils, np.float32(2)),
+    ]))
+    contamine, sain = (grille.ravel() for grille in np.meshgrid(valeurs, valeurs))
+    n_paires, n_seuls = len(contamine), len(valeurs)
+    n = n_paires + 2 * n_seuls
+
+    scores = np.zeros((n, 2), dtype=np.float32)
+    classes = np.ones((n, 2), dtype=np.float32)
+    num_detections = np.full(n, 2, dtype=np.float32)
+    # Mixte : une détection de chaque classe, triées par score décroissant
+    premier_contamine = contamine >= sain
+    scores[:n_paires, 0] = np.maximum(contamine, sain)
+    scores[:n_paires, 1] = np.minimum(contamine, sain)
+    classes[:n_paires, 0] = np.where(premier_contamine, 2.0, 1.0)
+    classes[:n_paires, 1] = np.where(premier_contamine, 1.0, 2.0)
+    # Une seule détection, contaminée puis saine
+    scores[n_paires:, 0] = np.tile(valeurs, 2)
+    classes[n_paires:n_paires + n_seuls, 0] = 2.0
+    num_detections[n_paires:] = 1
+    boxes = np.tile(np.array([0.1, 0.1, 0.5, 0.5], dtype=np.float32), (n, 2, 1))
+    return boxes, classes, scores, num_detections
+
+
+def analyser_reference(reference: "ReferenceBoucles", boxes, classes, scores, num_detections) -> list:
+    """Réponses de la version en boucles, image par image"""
+    return [
+        reference._analyze_detections(boxes[i], classes[i], scores[i], int(num_detections[i]))
+        for i in range(len(scores))
+    ]
+
+
+def comparer(attendus: list, obtenus: list, decisions: Dict[str, int]) -> int:
+    """Compare les réponses des deux post-traitements ; retourne le nombre de différences"""
+    differences = 0
+    for attendu, obtenu in zip(attendus, obtenus):
+        decisions[attendu["prediction"]] = decisions.get(attendu["prediction"], 0) + 1
+        if attendu != obtenu:
+            differences += 1
+            if differences <= 5:
+                print("❌ Différence:")
+                for cle in attendu:
+                    if attendu[cle] != obtenu.get(cle):
+                        print(f"   {cle}: attendu={attendu[cle]!r} obtenu={obtenu.get(cle)!r}")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Équivalence du post-traitement SSD vectorisé")
+    parser.add_argument("--lots", type=int, default=200)
+    parser.add_argument("--taille-lot", type=int, default=8)
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # Les alertes des règles ne sont pas l'objet du test
+
+    model = VisionModel("inutilise")
+    model.model_type = "savedmodel"
+    model.input_size = (320, 320)
+    model.class_names = ["background", "healthy", "contaminated"]
+    reference = ReferenceBoucles(model)
+
+    rng = np.random.default_rng(args.graine)
+    differences = 0
+    decisions = {}
+    t_reference = t_vectorise = 0.0
+
+    for _ in range(args.lots):
+        lot = generer_lot(rng, args.taille_lot)
+
+        debut = time.perf_counter()
+        attendus = analyser_reference(reference, *lot)
+        t_reference += time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        obtenus = model._analyze_detections_batch(*lot)
+        t_vectorise += time.perf_counter() - debut
+
+        differences += comparer(attendus, obtenus, decisions)
+
+    total = args.lots * args.taille_lot
+    print(f"📊 {total} images, décisions de référence: {decisions}")
+    print(f"⏱️  boucles: {t_reference * 1000 / total:.3f} ms/image, "
+          f"vectorisé: {t_vectorise * 1000 / total:.3f} ms/image")
+
+    grille = generer_grille()
+    decisions_grille = {}
+    differences += comparer(analyser_reference(reference, *grille),
+                            model._analyze_detections_batch(*grille), decisions_grille)
+    print(f"📊 grille: {len(grille[2])} images, décisions de référence: {decisions_grille}")
+    if differences:
+        print(f"❌ {differences} réponse(s) différente(s)")
+        return 1
+    print("✅ Réponses identiques")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())